@@ -0,0 +1,102 @@
+"""Tally and render functions for the admin reports.
+
+They run in the analytics worker processes and only see the snapshot rows they are given.
+This module imports nothing from main.py, so workers can be spawned without re-running the
+bot's startup.
+"""
+import heapq
+
+def tally_tracking(chunk):
+    """Engagements, users, per-section counts and top tasks for a slice of task_tracking"""
+    engagements = 0
+    users = set()
+    sections = {}
+    tasks = []
+    for task_id, tracks in chunk:
+        engagements += len(tracks)
+        users.update(track['user_id'] for track in tracks)
+        section = tracks[0]['section'] if tracks else 'unknown'
+        sections[section] = sections.get(section, 0) + len(tracks)
+        tasks.append((task_id, tracks[0]['section'] if tracks else None, len(tracks)))
+    return engagements, users, sections, heapq.nlargest(10, tasks, key=lambda task: task[2])
+
+def render_task_overview(partials, task_count):
+    """Merge tally_tracking results into the /taskstats overview"""
+    total_engagements = 0
+    unique_users = set()
+    section_stats = {}
+    top_tasks = []
+    for engagements, users, sections, tasks in partials:
+        total_engagements += engagements
+        unique_users |= users
+        for section, count in sections.items():
+            section_stats[section] = section_stats.get(section, 0) + count
+        top_tasks.extend(tasks)
+
+    stats = "📊 **Complete Task Tracking Overview:**\n\n"
+    stats += f"🔍 **Global Statistics:**\n"
+    stats += f"• Total Tasks with Tracking: {task_count}\n"
+    stats += f"• Total Engagements: {total_engagements}\n"
+    stats += f"• Unique Users Tracked: {len(unique_users)}\n\n"
+
+    stats += "📱 **By Section:**\n"
+    for section, count in section_stats.items():
+        section_name = section.replace('_', ' ').title()
+        stats += f"📱 {section_name}: {count} engagements\n"
+
+    stats += f"\n🎯 **Task Breakdown:**\n"
+    # nlargest keeps ties in input order, so chunk-wise top lists merge to the same result as one sort
+    for task_id, section, count in heapq.nlargest(10, top_tasks, key=lambda task: task[2]):
+        section_name = section.replace('_', ' ').title() if section else 'Unknown'
+        stats += f"🎯 **{task_id}** ({section_name}): {count} engagements\n"
+
+    if task_count > 10:
+        stats += f"... and {task_count - 10} more tasks\n"
+
+    stats += f"\n💡 Use `/taskstats task_id` for detailed analysis"
+    return stats
+
+def tally_referrals(chunk):
+    """Referral counts per referrer for a slice of referral_data"""
+    counts = {}
+    for referred_user, referrer in chunk:
+        counts[referrer] = counts.get(referrer, 0) + 1
+    return counts
+
+def merge_counts(partials):
+    counts = {}
+    for partial in partials:
+        for key, count in partial.items():
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+def render_referral_stats(partials, total):
+    """The /referralstats report"""
+    referrer_counts = merge_counts(partials)
+    stats = "👥 **All Referral Statistics:**\n\n"
+    stats += "📊 **Referrers (Top performers):**\n"
+    for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True):
+        earnings = count * 5
+        stats += f"👤 **User {referrer}:** {count} referrals (₹{earnings} earned)\n"
+
+    stats += f"\n📈 **Total Referrals:** {total}\n"
+    stats += f"💰 **Total Bonus Paid:** ₹{total * 10} (₹5 each to referrer & new user)\n"
+    stats += f"\n💡 **Commands:**\n"
+    stats += f"• `/resetreferral user_id` - Reset user's referral status\n"
+    stats += f"• `/referralstats` - View this statistics"
+    return stats
+
+def render_referral_panel(partials, total):
+    """The referral management panel's detailed statistics"""
+    referrer_counts = merge_counts(partials)
+    stats = "👥 **Detailed Referral Statistics:**\n\n"
+    stats += "📊 **All Referrers:**\n"
+    for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True):
+        earnings = count * 5
+        stats += f"👤 **User {referrer}:** {count} referrals (₹{earnings} earned)\n"
+
+    stats += f"\n📈 **Summary:**\n"
+    stats += f"• Total Referrals: {total}\n"
+    stats += f"• Unique Referrers: {len(referrer_counts)}\n"
+    stats += f"• Total Bonus Paid: ₹{total * 10}\n"
+    return stats
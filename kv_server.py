@@ -0,0 +1,177 @@
+"""Local stand-in for the bot's shared-state store.
+
+One JSON request per line, one JSON response per line:
+    {"op": "incr", "key": "balance:42", "by": -500, "floor": 0}
+    {"ok": true, "result": {"ok": true, "value": 1500}}
+
+Run it next to the bot processes and point them at it with SHARED_STATE_URL:
+    python kv_server.py --listen tcp://127.0.0.1:7878 --snapshot kv_snapshot.json
+    python kv_server.py --listen unix:///tmp/eran-kv.sock
+
+One process polls Telegram and holds the lease (BOT_ROLE=poller). Any others run with
+BOT_ROLE=worker and a distinct WORKER_ID: they take no lease, accept updates POSTed by a
+dispatcher on WORKER_LISTEN, and journal balance changes to their own file.
+
+The store is not the durable copy. If it restarts empty or from an older snapshot, the bot
+stops saving until it is restarted, and the first process to start reseeds the store from
+bot_data.json and every ledger journal.
+"""
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("kv_server")
+
+class KVStore:
+    """Thread-safe key-value map with per-key TTL, sets and atomic integer increments"""
+
+    def __init__(self):
+        self.data = {}  # key -> [value, expires_at or None]
+        self.lock = threading.Lock()
+
+    def _live(self, key, now):
+        item = self.data.get(key)
+        if item is not None and item[1] is not None and item[1] < now:
+            del self.data[key]
+            return None
+        return item
+
+    @staticmethod
+    def _expiry(ttl, now):
+        return now + ttl if ttl else None
+
+    def execute(self, request):
+        op = request.get('op')
+        key = request.get('key')
+        now = time.time()
+        with self.lock:
+            if op == 'ping':
+                return 'pong'
+            if op == 'get':
+                item = self._live(key, now)
+                return item[0] if item else None
+            if op == 'set':
+                self.data[key] = [request.get('value'), self._expiry(request.get('ttl'), now)]
+                return True
+            if op == 'setnx':
+                if self._live(key, now):
+                    return False
+                self.data[key] = [request.get('value'), self._expiry(request.get('ttl'), now)]
+                return True
+            if op == 'delete':
+                return self.data.pop(key, None) is not None
+            if op == 'incr':
+                item = self._live(key, now)
+                current = item[0] if item else 0
+                value = current + int(request.get('by', 1))
+                floor = request.get('floor')
+                if floor is not None and value < floor:
+                    return {'ok': False, 'value': current}
+                self.data[key] = [value, item[1] if item else None]
+                return {'ok': True, 'value': value}
+            if op == 'scan':
+                prefix = request.get('prefix', '')
+                return [[k, item[0]] for k, item in list(self.data.items())
+                        if k.startswith(prefix) and self._live(k, now)]
+            if op in ('sadd', 'srem', 'sismember', 'smembers'):
+                item = self._live(key, now)
+                members = set(item[0]) if item else set()
+                member = request.get('member')
+                if op == 'sismember':
+                    return member in members
+                if op == 'smembers':
+                    return sorted(members, key=str)
+                if op == 'sadd':
+                    changed = member not in members
+                    members.add(member)
+                else:
+                    changed = member in members
+                    members.discard(member)
+                self.data[key] = [list(members), None]
+                return changed
+        raise ValueError(f"Unknown op {op!r}")
+
+    def dump(self, path):
+        now = time.time()
+        with self.lock:
+            data = {k: item for k, item in self.data.items() if item[1] is None or item[1] >= now}
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, path)
+
+    def load(self, path):
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            logger.info(f"Loaded {len(self.data)} keys from {path}")
+
+class KVRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = {'ok': True, 'result': self.server.store.execute(json.loads(line))}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+class ThreadingTCPKVServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class ThreadingUnixKVServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def make_server(listen, store):
+    """Build a server for tcp://host:port or unix:///path"""
+    if listen.startswith('unix://'):
+        path = listen[len('unix://'):]
+        if os.path.exists(path):
+            os.remove(path)
+        server = ThreadingUnixKVServer(path, KVRequestHandler)
+    else:
+        host, port = listen[len('tcp://'):].rsplit(':', 1)
+        server = ThreadingTCPKVServer((host, int(port)), KVRequestHandler)
+    server.store = store
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local shared-state server for the bot's worker processes")
+    parser.add_argument('--listen', default=os.getenv('SHARED_STATE_URL', 'tcp://127.0.0.1:7878'))
+    parser.add_argument('--snapshot', default='', help="file to load at start and save periodically")
+    parser.add_argument('--snapshot-interval', type=float, default=10.0)
+    args = parser.parse_args()
+
+    store = KVStore()
+    if args.snapshot:
+        store.load(args.snapshot)
+
+        def snapshot_loop():
+            while True:
+                time.sleep(args.snapshot_interval)
+                try:
+                    store.dump(args.snapshot)
+                except Exception as e:
+                    logger.error(f"Snapshot failed: {e}")
+        threading.Thread(target=snapshot_loop, daemon=True).start()
+
+    server = make_server(args.listen, store)
+    logger.info(f"KV server listening on {args.listen}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.snapshot:
+            store.dump(args.snapshot)
+        logger.info("KV server stopped")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,41 @@
 
 import telebot
-from telebot import types
+from telebot import types, apihelper, formatting
+import requests
+from requests.adapters import HTTPAdapter
 import re
 import time
 import uuid
+import random
 import threading
+import queue
+import asyncio
 import json
 import os
+import sys
+import tempfile
+import csv
+import gzip
+import io
+import math
+import multiprocessing
+import shutil
+import fcntl
+import signal
+import socket
+import abc
+import glob
+import http.server
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping, MutableSet
+from itertools import islice
 from datetime import datetime
 import pytz
+import analytics
 import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,12 +45,624 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = os.getenv('BOT_TOKEN', '7999151899:AAFnMohiNBtlCdOv6OQ_9wvJTWPu_dBkWJ0')
 ADMIN_ID = int(os.getenv('ADMIN_ID', '7929115529'))
 
+UPDATE_LANES = int(os.getenv('UPDATE_LANES', '4'))
+BOT_ENGINE = os.getenv('BOT_ENGINE', 'threaded')  # 'threaded' or 'async'
+ASYNC_CONNECTION_LIMIT = int(os.getenv('ASYNC_CONNECTION_LIMIT', '100'))
+ASYNC_HANDLER_THREADS = int(os.getenv('ASYNC_HANDLER_THREADS', '8'))  # threads running the blocking handlers for the async engine
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '3600'))  # seconds
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '16'))
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '15'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+BREAKER_FAILURE_RATIO = float(os.getenv('BREAKER_FAILURE_RATIO', '0.5'))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '30'))  # seconds before a half-open probe
+POLLING_BACKOFF_CAP = float(os.getenv('POLLING_BACKOFF_CAP', '300'))  # seconds
+CONVERSATION_MAX_STATES = int(os.getenv('CONVERSATION_MAX_STATES', '50000'))
+CONVERSATION_TTL = int(os.getenv('CONVERSATION_TTL', '900'))  # seconds, for states without their own TTL
+TASKS_PER_PAGE = int(os.getenv('TASKS_PER_PAGE', '8'))
+REPORT_PAGE_SIZE = int(os.getenv('REPORT_PAGE_SIZE', '10'))
+BULK_NOTIFY_RATE = float(os.getenv('BULK_NOTIFY_RATE', '20'))  # messages per second
+PROOF_PAGE_SIZE = min(10, int(os.getenv('PROOF_PAGE_SIZE', '10')))  # send_media_group takes at most 10
+WITHDRAWAL_PAGE_SIZE = int(os.getenv('WITHDRAWAL_PAGE_SIZE', '10'))
+USER_LOCK_STRIPES = int(os.getenv('USER_LOCK_STRIPES', '64'))
+LEDGER_FILE = os.getenv('LEDGER_FILE', 'balance_ledger.jsonl')  # the polling instance's journal
+WORKER_LEDGER_FILE = os.getenv('WORKER_LEDGER_FILE', 'balance_ledger.worker-{}.jsonl')  # one journal per WORKER_ID
+LEDGER_KEY_WINDOW = int(os.getenv('LEDGER_KEY_WINDOW', '100000'))  # idempotency keys remembered
+LEDGER_COMPACT_BYTES = int(os.getenv('LEDGER_COMPACT_BYTES', str(8 * 1024 * 1024)))  # journal size that triggers archiving
+FLOOD_RATE = float(os.getenv('FLOOD_RATE', '1'))  # updates per second each user may sustain
+FLOOD_BURST = int(os.getenv('FLOOD_BURST', '5'))
+FLOOD_COALESCE_WINDOW = float(os.getenv('FLOOD_COALESCE_WINDOW', '1.5'))  # seconds; repeated identical presses fold into one
+FLOOD_MAX_USERS = int(os.getenv('FLOOD_MAX_USERS', '20000'))  # buckets kept in memory
+FLOOD_NOTICE_INTERVAL = 30  # seconds between "slow down" notices to the same user
+UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', '5000'))  # recent update_ids remembered
+LEASE_FILE = os.getenv('LEASE_FILE', 'bot.lease')
+LEASE_TTL = float(os.getenv('LEASE_TTL', '10'))  # seconds without a heartbeat before the lease counts as abandoned
+LEASE_HEARTBEAT = 1.0   # seconds between heartbeats
+LEASE_POLL = 0.2        # seconds between standby attempts
+SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', '')  # tcp://host:port or unix:///path of kv_server.py; empty keeps state in-process
+SHARED_STATE_TIMEOUT = float(os.getenv('SHARED_STATE_TIMEOUT', '5'))
+SHARED_KEY_TTL = int(os.getenv('SHARED_KEY_TTL', '604800'))  # seconds an idempotency key is remembered on the shared store
+SEED_CLAIM_TTL = 120  # seconds one process may take to seed the shared store before another can try
+BOT_ROLE = os.getenv('BOT_ROLE', 'poller')  # 'poller' holds the lease and polls Telegram; 'worker' serves updates a dispatcher posts to it
+WORKER_ID = os.getenv('WORKER_ID', '1')
+WORKER_LISTEN = os.getenv('WORKER_LISTEN', '127.0.0.1:8081')  # host:port a worker accepts update JSON on
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', '2'))  # processes for admin reports
+ANALYTICS_CHUNK_SIZE = int(os.getenv('ANALYTICS_CHUNK_SIZE', '5000'))  # snapshot rows per worker task
+ANALYTICS_PROGRESS_INTERVAL = 2  # seconds between progress edits
+
+# ✅ UPDATE OFFSETS
+class UpdateTracker:
+    """Tracks which update_ids are fully processed so polling resumes exactly where it stopped"""
+
+    def __init__(self, window):
+        self.window = window
+        self.processed_id = 0   # every update up to here has finished
+        self.highest_id = 0
+        self.in_flight = {}     # update_id -> outstanding handler tasks (+1 while dispatching)
+        self.recent = OrderedDict()
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    def resume(self, processed_id, recent_ids=()):
+        with self.lock:
+            self.processed_id = self.highest_id = processed_id
+            for update_id in recent_ids:
+                self.recent[update_id] = None
+                self.highest_id = max(self.highest_id, update_id)
+
+    def admit(self, updates):
+        """Drop updates already seen; the rest are in flight until released"""
+        fresh = []
+        with self.lock:
+            for update in updates:
+                update_id = update.update_id
+                if update_id <= self.processed_id or update_id in self.recent:
+                    self.duplicates += 1
+                    continue
+                self.recent[update_id] = None
+                self.in_flight[update_id] = 1
+                if len(self.recent) > self.window:
+                    # In-flight ids stay pinned: they are above processed_id, so only this set catches a redelivery
+                    for old_id in self.recent:
+                        if old_id not in self.in_flight:
+                            del self.recent[old_id]
+                            break
+                self.highest_id = max(self.highest_id, update_id)
+                fresh.append(update)
+        return fresh
+
+    def hold(self, update_id):
+        if update_id is not None:
+            with self.lock:
+                self.in_flight[update_id] += 1
+
+    def release(self, update_id):
+        if update_id is None:
+            return
+        with self.lock:
+            self.in_flight[update_id] -= 1
+            if self.in_flight[update_id] == 0:
+                del self.in_flight[update_id]
+                self.processed_id = min(self.in_flight) - 1 if self.in_flight else self.highest_id
+
+    def snapshot(self):
+        """(processed_id, finished ids above it) for save_data; in-flight ids must be redelivered after a restart"""
+        with self.lock:
+            return self.processed_id, [update_id for update_id in self.recent
+                                       if update_id > self.processed_id and update_id not in self.in_flight]
+
+update_tracker = UpdateTracker(UPDATE_DEDUP_WINDOW)
+
+# ✅ PER-USER UPDATE LANES
+class LanedTeleBot(telebot.TeleBot):
+    """TeleBot that runs each user's updates in order on a fixed worker lane
+
+    With lanes=0 it only makes API calls; the async engine dispatches updates itself.
+    """
+
+    def __init__(self, token, lanes=4, **kwargs):
+        # Updates are dispatched by our own lanes instead of telebot's shared pool
+        super().__init__(token, threaded=False, **kwargs)
+        self.lane_queues = [queue.Queue() for _ in range(max(0, lanes))]
+        self.lane_threads = []
+        for i, lane_queue in enumerate(self.lane_queues):
+            lane_thread = threading.Thread(target=self._lane_worker, args=(lane_queue,), name=f"UpdateLane-{i}", daemon=True)
+            lane_thread.start()
+            self.lane_threads.append(lane_thread)
+
+    def _lane_for(self, update_object):
+        """Pick the lane for a message/callback by hashing its sender"""
+        from_user = getattr(update_object, 'from_user', None)
+        if from_user is not None:
+            key = from_user.id
+        else:
+            chat = getattr(update_object, 'chat', None)
+            key = chat.id if chat is not None else 0
+        return self.lane_queues[hash(key) % len(self.lane_queues)]
+
+    def process_new_updates(self, updates):
+        fresh = update_tracker.admit(updates)
+        for update in fresh:
+            for payload in (update.message, update.callback_query):
+                if payload is not None:
+                    payload.update_id = update.update_id
+        try:
+            super().process_new_updates(fresh)
+        finally:
+            for update in fresh:
+                update_tracker.release(update.update_id)
+            # Confirm to Telegram only what has finished; in-flight updates are re-sent and, pinned in recent, dropped as duplicates
+            self.last_update_id = update_tracker.processed_id
+
+    def _exec_task(self, task, *args, **kwargs):
+        lane_queue = self._lane_for(args[0] if args else None)
+        update_id = None
+        if args:
+            # Throttled updates are dropped here, before they take a lane worker
+            verdict = flood_guard.check(args[0])
+            if verdict != FloodGuard.ADMIT:
+                if verdict == FloodGuard.NOTIFY or hasattr(args[0], 'data'):
+                    lane_queue.put((flood_reply(verdict), args, {}, None))
+                return
+            remember_sender(args[0])
+            args[0].received_at = time.monotonic()
+            if hasattr(args[0], 'data'):
+                # Answered now, not after this user's queued updates have run on the lane
+                acknowledge_callback(args[0])
+            update_id = getattr(args[0], 'update_id', None)
+            update_tracker.hold(update_id)
+        lane_queue.put((task, args, kwargs, update_id))
+
+    def _lane_worker(self, lane_queue):
+        while True:
+            task, args, kwargs, update_id = lane_queue.get()
+            try:
+                task(*args, **kwargs)
+            except Exception as e:
+                handled = self.exception_handler.handle(e) if self.exception_handler is not None else False
+                if not handled:
+                    logger.error(f"❌ Update lane error: {e}")
+            finally:
+                update_tracker.release(update_id)
+                lane_queue.task_done()
+
+    def lane_backlog(self):
+        """Number of queued updates per lane"""
+        return [lane_queue.qsize() for lane_queue in self.lane_queues]
+
+# ✅ ANTI-FLOOD
+class FloodGuard:
+    """Per-user token buckets with lazy refill, checked before an update is dispatched"""
+
+    ADMIT, DROP, NOTIFY = "admit", "drop", "notify"
+
+    def __init__(self, rate, burst, coalesce_window, max_users):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_users = max_users
+        self.buckets = OrderedDict()  # user_id -> [tokens, refilled_at, last_payload, last_seen, last_notice]
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.banned_dropped = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _payload(update_object):
+        text = getattr(update_object, 'text', None)
+        return text if text is not None else getattr(update_object, 'data', None)
+
+    def check(self, update_object):
+        """ADMIT, DROP, or NOTIFY (drop and tell the user to slow down)"""
+        from_user = getattr(update_object, 'from_user', None)
+        if from_user is None or from_user.id == ADMIN_ID:
+            return self.ADMIT
+        user_id = from_user.id
+        # Lock-free ban check: banned users only keep the Support flow, which never uses buttons
+        if hasattr(update_object, 'data') and is_banned(user_id):
+            self.banned_dropped += 1
+            return self.DROP
+
+        payload = self._payload(update_object)
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(user_id)
+            if bucket is None:
+                bucket = self.buckets[user_id] = [float(self.burst), now, None, 0.0, 0.0]
+                if len(self.buckets) > self.max_users:
+                    # Idle users go first; coming back just means starting with a full bucket
+                    self.buckets.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.buckets.move_to_end(user_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            repeat = payload is not None and payload == bucket[2] and now - bucket[3] < self.coalesce_window
+
+        # Inside a conversation a repeated answer (the same amount, the same button) is a real reply, not a double tap
+        if repeat and get_state(user_id)[0] is None:
+            with self.lock:
+                bucket[3] = now
+                self.coalesced += 1
+            return self.DROP
+
+        with self.lock:
+            bucket[2], bucket[3] = payload, now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.admitted += 1
+                return self.ADMIT
+
+            self.dropped += 1
+            if now - bucket[4] >= FLOOD_NOTICE_INTERVAL:
+                bucket[4] = now
+                return self.NOTIFY
+            return self.DROP
+
+    def summary(self):
+        return f"admitted {self.admitted}, dropped {self.dropped}, coalesced {self.coalesced}, banned {self.banned_dropped}, tracking {len(self.buckets)}"
+
+flood_guard = FloodGuard(FLOOD_RATE, FLOOD_BURST, FLOOD_COALESCE_WINDOW, FLOOD_MAX_USERS)
+
+def send_flood_notice(update_object):
+    """Tell a throttled user to slow down, at most once per notice interval"""
+    text = "⏳ Too many requests. Please wait a few seconds and try again."
+    if hasattr(update_object, 'data'):
+        bot.answer_callback_query(update_object.id, text)
+    else:
+        send_noncritical(update_object.chat.id, text)
+
+def answer_dropped(update_object):
+    """Answer a dropped callback query with an empty ack so the button stops spinning"""
+    if hasattr(update_object, 'data'):
+        try:
+            bot.answer_callback_query(update_object.id)
+        except Exception as e:
+            logger.warning(f"Could not answer dropped callback: {e}")
+
+def flood_reply(verdict):
+    """What to send back for an update the flood guard did not admit"""
+    return send_flood_notice if verdict == FloodGuard.NOTIFY else answer_dropped
+
+# ✅ USER PROFILE CACHE
+class ProfileCache:
+    """Bounded LRU cache of user display names with TTL expiry"""
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # user_id -> (expires_at, username, first_name)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, user_id, username, first_name):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, username, first_name)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def remember(self, user):
+        """Store the profile carried by a telebot User object"""
+        if user is not None and getattr(user, 'id', None) is not None:
+            self.put(user.id, user.username, user.first_name)
+
+    def get(self, user_id):
+        """Return (username, first_name) or None if missing/expired"""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[user_id]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return (self.hits / total * 100) if total else 0.0
+
+user_profiles = ProfileCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
+def remember_sender(update_object):
+    """Cache the sender profile of every incoming message/callback"""
+    user_profiles.remember(getattr(update_object, 'from_user', None))
+
+def get_user_profile(user_id):
+    """Get (username, first_name) from cache, calling get_chat only on a miss"""
+    cached = user_profiles.get(user_id)
+    if cached is not None:
+        username, first_name = cached
+        return username or "No Username", first_name or "Unknown"
+
+    try:
+        user_chat = bot.get_chat(user_id)
+        if isinstance(user_chat, asyncio.Future):
+            # Async engine: don't wait, fill the cache when the lookup lands
+            user_chat.add_done_callback(
+                lambda done: user_profiles.put(user_id, done.result().username, done.result().first_name)
+                if not done.cancelled() and done.exception() is None else None
+            )
+            return "No Username", "Unknown"
+        user_profiles.put(user_id, user_chat.username, user_chat.first_name)
+        return user_chat.username or "No Username", user_chat.first_name or "Unknown"
+    except Exception as e:
+        logger.warning(f"Profile lookup failed for {user_id}: {e}")
+        return "No Username", "Unknown"
+
 try:
-    bot = telebot.TeleBot(BOT_TOKEN)
+    bot = LanedTeleBot(BOT_TOKEN, lanes=0 if BOT_ENGINE == 'async' and BOT_ROLE != 'worker' else UPDATE_LANES)
 except Exception as e:
     logger.error(f"Failed to initialize bot: {e}")
     raise
 
+# ✅ CIRCUIT BREAKER
+class CircuitOpenError(Exception):
+    """Raised instead of calling Telegram while the circuit is open"""
+
+class CircuitBreaker:
+    """Trips on sustained 5xx/timeout rates and recovers through half-open probes"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    PROBE = 'probe'  # allow() result for the one call whose outcome decides a half-open circuit
+
+    def __init__(self, window=20, min_calls=10, failure_ratio=0.5, cooldown=30):
+        self.outcomes = deque(maxlen=window)  # True = success, False = transient failure
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+        self.on_close = []  # callbacks run after recovery
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self, probe=True):
+        """Whether a call may go out now; returns PROBE when it claimed the half-open probe slot
+
+        Calls with probe=False (the getUpdates long poll) pass a half-open circuit without
+        claiming the slot: a poll that sits idle for a minute says nothing about recovery.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if not probe:
+                return True
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+            return self.PROBE
+
+    def record(self, success, ticket=True):
+        """Report the outcome of a call allowed with the given allow() result; call it on every path"""
+        recovered = False
+        with self.lock:
+            if ticket == self.PROBE:
+                self.probe_in_flight = False
+                if self.state == self.HALF_OPEN:
+                    if success:
+                        self.state = self.CLOSED
+                        self.outcomes.clear()
+                        recovered = True
+                    else:
+                        self._trip()
+            elif self.state == self.CLOSED:
+                self.outcomes.append(success)
+                failures = self.outcomes.count(False)
+                if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_ratio:
+                    self._trip()
+
+        if recovered:
+            logger.info("✅ Telegram API recovered, circuit closed")
+            for callback in self.on_close:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Circuit close callback error: {e}")
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.error(f"🔌 Telegram API degraded, circuit open for {self.cooldown:.0f}s")
+
+    def report(self):
+        return f"🛡️ Circuit: {self.state} (trips {self.trips}, rejected {self.rejected})"
+
+circuit_breaker = CircuitBreaker(failure_ratio=BREAKER_FAILURE_RATIO, cooldown=BREAKER_COOLDOWN)
+
+# ✅ TELEGRAM HTTP TRANSPORT
+class TelegramTransport:
+    """Shared keep-alive session for all Telegram API calls with retries and metrics"""
+
+    RETRY_BASE_DELAY = 0.5  # seconds, doubled per attempt with jitter
+
+    def __init__(self, pool_size=16, max_retries=3):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.calls = {}  # api method -> [count, total_seconds, max_seconds, failures]
+        self.retries = 0
+
+    @staticmethod
+    def is_idempotent(api_method):
+        """Reads, edits and deletes can be repeated safely, sends cannot"""
+        return api_method.startswith(('get', 'edit', 'delete'))
+
+    def request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Drop-in for apihelper.CUSTOM_REQUEST_SENDER"""
+        api_method = url.rsplit('/', 1)[-1]
+        ticket = circuit_breaker.allow(probe=api_method != 'getUpdates')
+        if not ticket:
+            raise CircuitOpenError(f"Telegram API unavailable, {api_method} skipped")
+        attempts = self.max_retries + 1 if self.is_idempotent(api_method) and not files else 1
+        started = time.monotonic()
+
+        healthy = False
+        try:
+            for attempt in range(attempts):
+                try:
+                    response = self.session.request(method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == attempts - 1:
+                        self._record(api_method, started, failed=True)
+                        raise
+                    self._backoff(attempt)
+                    continue
+
+                if response.status_code >= 500 and attempt < attempts - 1:
+                    self._backoff(attempt)
+                    continue
+                healthy = response.status_code < 500
+                self._record(api_method, started, failed=not healthy)
+                return response
+        finally:
+            # Any other exception (e.g. a truncated body) counts as a failure and still frees the probe slot
+            circuit_breaker.record(healthy, ticket)
+
+    def _backoff(self, attempt):
+        with self.lock:
+            self.retries += 1
+        time.sleep(self.RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _record(self, api_method, started, failed=False):
+        elapsed = time.monotonic() - started
+        with self.lock:
+            stats = self.calls.setdefault(api_method, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            if failed:
+                stats[3] += 1
+
+    def reuse_ratio(self):
+        """Share of HTTP requests that went over an already open connection"""
+        requests_made = connections_opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests_made += pool.num_requests
+                connections_opened += pool.num_connections
+        if not requests_made:
+            return 0.0
+        return max(0.0, (requests_made - connections_opened) / requests_made * 100)
+
+    def report(self):
+        """Text summary of connection reuse and per-method latency"""
+        with self.lock:
+            calls = sorted(self.calls.items(), key=lambda x: x[1][0], reverse=True)
+            retries = self.retries
+        lines = [
+            f"🔌 Connection reuse: {self.reuse_ratio():.0f}% (pool {self.adapter._pool_maxsize}, retries {retries})",
+            f"{circuit_breaker.report()}, deferred sends {len(deferred_sends)}",
+        ]
+        for api_method, (count, total, longest, failures) in calls:
+            if api_method == 'getUpdates':
+                continue  # long polling would skew latency
+            lines.append(f"• {api_method}: {count} calls, avg {total / count * 1000:.0f}ms, max {longest * 1000:.0f}ms, failed {failures}")
+        return "\n".join(lines)
+
+telegram_transport = TelegramTransport(TELEGRAM_POOL_SIZE, TELEGRAM_MAX_RETRIES)
+apihelper.CUSTOM_REQUEST_SENDER = telegram_transport.request
+apihelper.CONNECT_TIMEOUT = TELEGRAM_CONNECT_TIMEOUT
+apihelper.READ_TIMEOUT = TELEGRAM_READ_TIMEOUT
+
+# ✅ NON-CRITICAL SENDS
+deferred_sends = deque(maxlen=500)  # (chat_id, text, kwargs) held while the circuit is open
+
+def send_noncritical(chat_id, text, **kwargs):
+    """Send a message that may wait, queueing it while Telegram is degraded"""
+    if circuit_breaker.state != CircuitBreaker.CLOSED:
+        deferred_sends.append((chat_id, text, kwargs))
+        return None
+    try:
+        return bot.send_message(chat_id, text, **kwargs)
+    except CircuitOpenError:
+        deferred_sends.append((chat_id, text, kwargs))
+        return None
+
+def flush_deferred_sends():
+    """Deliver queued non-critical messages once the circuit closes"""
+    while deferred_sends:
+        if circuit_breaker.state != CircuitBreaker.CLOSED:
+            return
+        chat_id, text, kwargs = deferred_sends.popleft()
+        try:
+            bot.send_message(chat_id, text, **kwargs)
+        except CircuitOpenError:
+            deferred_sends.appendleft((chat_id, text, kwargs))
+            return
+        except Exception as e:
+            logger.warning(f"Deferred send to {chat_id} failed: {e}")
+
+circuit_breaker.on_close.append(lambda: threading.Thread(target=flush_deferred_sends, daemon=True).start())
+
+class RateLimitedSender:
+    """Background sender that paces bulk notifications under Telegram's flood limits"""
+
+    def __init__(self, rate=20):
+        self.interval = 1.0 / max(rate, 0.1)
+        self.outbox = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    def submit(self, chat_id, text, **kwargs):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="RateLimitedSender", daemon=True)
+                self.thread.start()
+        self.outbox.put((chat_id, text, kwargs))
+
+    def backlog(self):
+        return self.outbox.qsize()
+
+    def _run(self):
+        while True:
+            chat_id, text, kwargs = self.outbox.get()
+            try:
+                while True:
+                    try:
+                        bot.send_message(chat_id, text, **kwargs)
+                        self.sent += 1
+                        break
+                    except CircuitOpenError:
+                        # Hold the queue until Telegram recovers instead of dropping messages
+                        time.sleep(BREAKER_COOLDOWN)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Bulk notification to {chat_id} failed: {e}")
+            finally:
+                self.outbox.task_done()
+            time.sleep(self.interval)
+
+notification_sender = RateLimitedSender(BULK_NOTIFY_RATE)
+
 # ✅ BOT USERNAME CACHE
 BOT_USERNAME = None
 
@@ -47,16 +685,548 @@ def get_local_time():
     local_time = datetime.now(indian_tz)
     return local_time.strftime("%Y-%m-%d %H:%M:%S")
 
-# ✅ DATA PERSISTENCE
+# ✅ CONVERSATION STATE STORE
+# Seconds a user may stay in each flow before it is dropped
+CONVERSATION_STATE_TTLS = {
+    'withdraw': 1800,
+    'proof': 86400,
+    'client_data': 1800,
+    'support_message': 900,
+    'promotion_message': 900,
+    'admin_message': 600,
+    'notice': 600,
+    'referral_reset': 600,
+    'task_add': 600,
+}
+# Flows written to bot_data.json so users are not stranded by a restart
+PERSISTENT_STATES = {'withdraw'}
+
+class ConversationStore:
+    """One active conversation per user with per-state TTL and a size bound"""
+
+    def __init__(self, max_size=50000, default_ttl=900, ttls=None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.entries = OrderedDict()  # user_id -> (state, payload, expires_at), oldest first
+        self.by_state = {}            # state -> OrderedDict(user_id -> expires_at), soonest expiry first
+        self.lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _drop(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            self.by_state[entry[0]].pop(user_id, None)
+        return entry
+
+    def set(self, user_id, state, payload=True, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttls.get(state, self.default_ttl)
+        with self.lock:
+            self._drop(user_id)
+            self.entries[user_id] = (state, payload, expires_at)
+            # Every entry of a state shares one TTL, so appending keeps each queue sorted by expiry
+            self.by_state.setdefault(state, OrderedDict())[user_id] = expires_at
+            while len(self.entries) > self.max_size:
+                self._drop(next(iter(self.entries)))
+                self.evicted += 1
+
+    def get(self, user_id):
+        """Return (state, payload), or (None, None) if missing/expired"""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None, None
+            if entry[2] < time.time():
+                self._drop(user_id)
+                self.expired += 1
+                return None, None
+            return entry[0], entry[1]
+
+    def clear(self, user_id):
+        with self.lock:
+            self._drop(user_id)
+
+    def sweep(self):
+        """Drop expired conversations; only looks at the head of each state queue"""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for queue_by_expiry in self.by_state.values():
+                while queue_by_expiry:
+                    user_id, expires_at = next(iter(queue_by_expiry.items()))
+                    if expires_at >= now:
+                        break
+                    queue_by_expiry.popitem(last=False)
+                    self.entries.pop(user_id, None)
+                    removed += 1
+            self.expired += removed
+        return removed
+
+    def count_by_state(self):
+        with self.lock:
+            return {state: len(users) for state, users in self.by_state.items() if users}
+
+    def snapshot(self, states):
+        """Serializable copy of live conversations in the given states"""
+        now = time.time()
+        with self.lock:
+            return {
+                str(user_id): [state, payload, expires_at]
+                for user_id, (state, payload, expires_at) in self.entries.items()
+                if state in states and expires_at >= now
+            }
+
+    def restore(self, saved):
+        """Load conversations written by snapshot(), skipping expired ones"""
+        now = time.time()
+        restored = 0
+        for user_id, entry in saved.items():
+            try:
+                state, payload, expires_at = entry
+                if expires_at >= now:
+                    self.set(int(user_id), state, payload, expires_at)
+                    restored += 1
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Invalid conversation state: {user_id}={entry}, error: {e}")
+        return restored
+
+# ✅ SHARED STATE
+class SharedStateError(Exception):
+    pass
+
+class KVClient:
+    """Client for kv_server.py: one JSON request and reply per line, one connection per thread"""
+
+    # Safe to resend after a dropped connection; incr and setnx are not
+    RETRYABLE = {'ping', 'get', 'set', 'delete', 'scan', 'sadd', 'srem', 'sismember', 'smembers'}
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        if self.url.startswith('unix://'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.url[len('unix://'):])
+        else:
+            host, port = self.url[len('tcp://'):].rsplit(':', 1)
+            sock = socket.create_connection((host, int(port)), timeout=self.timeout)
+        self.local.conn = (sock, sock.makefile('rb'))
+        return self.local.conn
+
+    def _close(self):
+        conn = getattr(self.local, 'conn', None)
+        self.local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def call(self, op, **fields):
+        line = (json.dumps(dict(fields, op=op), ensure_ascii=False) + "\n").encode('utf-8')
+        attempts = 2 if op in self.RETRYABLE else 1
+        for attempt in range(attempts):
+            try:
+                sock, reader = getattr(self.local, 'conn', None) or self._connect()
+                sock.sendall(line)
+                reply = reader.readline()
+                if not reply:
+                    raise ConnectionError("shared state server closed the connection")
+                break
+            except OSError as e:
+                self._close()
+                if attempt + 1 == attempts:
+                    raise SharedStateError(f"{op} failed: {e}") from e
+        response = json.loads(reply)
+        if not response.get('ok'):
+            raise SharedStateError(f"{op} failed: {response.get('error')}")
+        return response['result']
+
+def to_paise(amount):
+    return int(round(amount * 100))
+
+class SharedBalances(MutableMapping):
+    """user_id -> rupees, kept on the shared store as integer paise under balance:<user_id>"""
+
+    PREFIX = 'balance:'
+
+    def __init__(self, kv):
+        self.kv = kv
+
+    def paise(self, user_id):
+        return self.kv.call('get', key=f"{self.PREFIX}{user_id}") or 0
+
+    def incr(self, user_id, paise, floor=None):
+        """Atomically add paise; refused (returns False) if the result would drop below floor"""
+        return self.kv.call('incr', key=f"{self.PREFIX}{user_id}", by=paise, floor=floor)['ok']
+
+    def __getitem__(self, user_id):
+        value = self.kv.call('get', key=f"{self.PREFIX}{user_id}")
+        if value is None:
+            raise KeyError(user_id)
+        return value / 100
+
+    def __setitem__(self, user_id, amount):
+        self.kv.call('set', key=f"{self.PREFIX}{user_id}", value=to_paise(amount))
+
+    def __delitem__(self, user_id):
+        if not self.kv.call('delete', key=f"{self.PREFIX}{user_id}"):
+            raise KeyError(user_id)
+
+    def items(self):
+        """One scan instead of a round trip per user"""
+        return [(int(key[len(self.PREFIX):]), value / 100) for key, value in self.kv.call('scan', prefix=self.PREFIX)]
+
+    def keys(self):
+        return [user_id for user_id, _ in self.items()]
+
+    def values(self):
+        return [amount for _, amount in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.kv.call('scan', prefix=self.PREFIX))
+
+    def clear(self):
+        for user_id in self.keys():
+            self.kv.call('delete', key=f"{self.PREFIX}{user_id}")
+
+class SharedSet(MutableSet):
+    """Set of ids on the shared store, e.g. banned users"""
+
+    def __init__(self, kv, name):
+        self.kv = kv
+        self.key = f"set:{name}"
+
+    def __contains__(self, member):
+        return self.kv.call('sismember', key=self.key, member=member)
+
+    def __iter__(self):
+        return iter(self.kv.call('smembers', key=self.key))
+
+    def __len__(self):
+        return len(self.kv.call('smembers', key=self.key))
+
+    def add(self, member):
+        self.kv.call('sadd', key=self.key, member=member)
+
+    def discard(self, member):
+        self.kv.call('srem', key=self.key, member=member)
+
+    def clear(self):
+        self.kv.call('delete', key=self.key)
+
+class SharedConversationStore(ConversationStore):
+    """Conversations under <prefix><user_id> on the shared store; the server's TTL does the sweeping"""
+
+    def __init__(self, kv, default_ttl=900, ttls=None, prefix='conv:'):
+        self.kv = kv
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def entries(self):
+        return {int(key[len(self.prefix):]): tuple(entry) for key, entry in self.kv.call('scan', prefix=self.prefix)}
+
+    def set(self, user_id, state, payload=True, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttls.get(state, self.default_ttl)
+        ttl = max(expires_at - time.time(), 0.001)
+        self.kv.call('set', key=f"{self.prefix}{user_id}", value=[state, payload, expires_at], ttl=ttl)
+
+    def get(self, user_id):
+        entry = self.kv.call('get', key=f"{self.prefix}{user_id}")
+        if entry is None or entry[2] < time.time():
+            return None, None
+        return entry[0], entry[1]
+
+    def clear(self, user_id):
+        self.kv.call('delete', key=f"{self.prefix}{user_id}")
+
+    def sweep(self):
+        return 0
+
+    def count_by_state(self):
+        counts = {}
+        for state, _, _ in self.entries.values():
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def snapshot(self, states):
+        now = time.time()
+        return {str(user_id): list(entry) for user_id, entry in self.entries.items() if entry[0] in states and entry[2] >= now}
+
+shared_state = KVClient(SHARED_STATE_URL, SHARED_STATE_TIMEOUT) if SHARED_STATE_URL else None
+
+# A pending proof upload waits in its own store, so starting another flow doesn't discard it
+if shared_state:
+    conversation_store = SharedConversationStore(shared_state, CONVERSATION_TTL, CONVERSATION_STATE_TTLS)
+    proof_waiters = SharedConversationStore(shared_state, CONVERSATION_TTL, CONVERSATION_STATE_TTLS, prefix='proof:')
+else:
+    conversation_store = ConversationStore(CONVERSATION_MAX_STATES, CONVERSATION_TTL, CONVERSATION_STATE_TTLS)
+    proof_waiters = ConversationStore(CONVERSATION_MAX_STATES, CONVERSATION_TTL, CONVERSATION_STATE_TTLS)
+
+# ✅ STORAGE
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'file')  # 'file' or 'memory'
 DATA_FILE = "bot_data.json"
 BACKUP_FILE = "bot_data_backup.json"
 
+# collection -> (key type, value type, ordered by key); a value type of None keeps values as stored
+STORAGE_SCHEMA = {
+    'user_balances': (int, float, False),
+    'pending_tasks': (int, None, False),
+    'proof_submissions': (int, None, True),
+    'referral_data': (int, int, False),
+    'completed_tasks': (int, set, False),
+    'task_sections': (str, list, False),
+    'client_tasks': (str, None, False),
+    'client_referrals': (str, None, False),
+    'withdrawal_requests': (int, None, False),
+    'task_tracking': (str, None, False),
+}
+
+class Storage(abc.ABC):
+    """Repository over the bot's keyed collections; backends differ only in how snapshots persist
+
+    Backends are snapshot-only: put/delete/clear change the live collection and save() persists all of it.
+    Handlers add and remove entries through them; values mutated in place (appending to a referral
+    list, for example) are likewise picked up by the next snapshot.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.collections = {name: OrderedDict() if ordered else {} for name, (_, _, ordered) in schema.items()}
+
+    def _key(self, name, key):
+        return self.schema[name][0](key)
+
+    def get(self, name, key, default=None):
+        return self.collections[name].get(self._key(name, key), default)
+
+    def put(self, name, key, value):
+        self.collections[name][self._key(name, key)] = value
+
+    def delete(self, name, key):
+        return self.collections[name].pop(self._key(name, key), None)
+
+    def clear(self, name):
+        self.collections[name].clear()
+
+    def scan(self, name):
+        """(key, value) pairs from a point-in-time copy, so writers aren't blocked while we iterate"""
+        return list(self.collections[name].items())
+
+    def fill(self, name, stored):
+        """Replace a collection in place from its stored form, skipping malformed entries"""
+        key_type, value_type, ordered = self.schema[name]
+        rows = []
+        for k, v in (stored or {}).items():
+            try:
+                rows.append((key_type(k), v if value_type is None else value_type(v)))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Invalid {name} entry: {k}={v}, error: {e}")
+        if ordered:
+            rows.sort(key=lambda row: row[0])
+        collection = self.collections[name]
+        collection.clear()
+        collection.update(rows)
+
+    def seeds(self, name):
+        """Whether load_state should overwrite this collection from the snapshot"""
+        return True
+
+    @abc.abstractmethod
+    def load(self):
+        """The last saved snapshot, or None if nothing was saved yet"""
+
+    @abc.abstractmethod
+    def save(self, data):
+        """Persist a snapshot; returns whether it was stored"""
+
+class MemoryStorage(Storage):
+    """Snapshots kept in RAM, for tests and for benchmarking handlers without disk I/O"""
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        self.saved = None
+        self.saves = 0
+
+    def load(self):
+        return json.loads(self.saved) if self.saved is not None else None
+
+    def save(self, data):
+        # Serialize anyway so the cost and the JSON-compatibility checks match the file backend
+        self.saved = json.dumps(data, ensure_ascii=False)
+        self.saves += 1
+        return True
+
+class FileStorage(Storage):
+    """JSON snapshot file with a backup copy, atomic replace and read-back verification"""
+
+    def __init__(self, schema, path, backup_path):
+        super().__init__(schema)
+        self.path = path
+        self.backup_path = backup_path
+
+    def _read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self):
+        """Load data from file with backup recovery"""
+        try:
+            if os.path.exists(self.path):
+                data = self._read(self.path)
+                logger.info("Data loaded successfully from main file")
+                return data
+            elif os.path.exists(self.backup_path):
+                logger.info("Loading from backup file...")
+                data = self._read(self.backup_path)
+                logger.info("Data loaded successfully from backup")
+                return data
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e}")
+            if os.path.exists(self.backup_path):
+                try:
+                    data = self._read(self.backup_path)
+                    logger.info("Successfully loaded from backup after JSON error")
+                    return data
+                except Exception as backup_error:
+                    logger.error(f"Backup loading failed: {backup_error}")
+        except Exception as e:
+            logger.error(f"Error loading data: {e}")
+            if os.path.exists(self.backup_path):
+                try:
+                    data = self._read(self.backup_path)
+                    logger.info("Successfully loaded from backup")
+                    return data
+                except Exception as backup_error:
+                    logger.error(f"Backup loading failed: {backup_error}")
+        return None
+
+    def save(self, data):
+        """Save data to file with enhanced backup and verification"""
+        temp_file = self.path + '.tmp'
+        try:
+            # Create backup before saving
+            if os.path.exists(self.path):
+                try:
+                    shutil.copy2(self.path, self.backup_path)
+                except Exception as backup_error:
+                    logger.warning(f"Failed to create backup: {backup_error}")
+
+            # Atomic write with verification
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+            # Verify written data
+            if self._read(temp_file).get('data_integrity_check') != data.get('data_integrity_check'):
+                raise Exception("Data integrity check failed")
+
+            os.replace(temp_file, self.path)
+            logger.debug("Data saved successfully")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving data: {e}")
+            # Clean up temp file if it exists
+            if os.path.exists(temp_file):
+                try:
+                    os.remove(temp_file)
+                except:
+                    pass
+
+            # Try to restore from backup if save fails
+            if os.path.exists(self.backup_path):
+                try:
+                    shutil.copy2(self.backup_path, self.path)
+                    logger.info("Restored from backup after save failure")
+                except Exception as restore_error:
+                    logger.error(f"Failed to restore from backup: {restore_error}")
+            return False
+
+class SharedStateStorage(FileStorage):
+    """File snapshots for process-local collections; balances, bans and conversations live on the shared store
+
+    The first process to load against an unseeded shared store claims it and seeds it from its snapshot and
+    the ledger journals; the `seeded` marker is set only once that has finished. The others wait for it.
+    """
+
+    SHARED = {'user_balances', 'banned_users', 'conversation_states'}
+
+    def __init__(self, schema, path, backup_path, kv):
+        super().__init__(schema, path, backup_path)
+        self.kv = kv
+        self.collections['user_balances'] = SharedBalances(kv)
+        self.seeding = False
+
+    def seeds(self, name):
+        return name not in self.SHARED or self.seeding
+
+    def load(self):
+        data = super().load()
+        self.seeding = not self.seeded() and self.kv.call('setnx', key='seeding', value=os.getpid(), ttl=SEED_CLAIM_TTL)
+        if self.seeding:
+            logger.info("Seeding the shared state store from the local snapshot")
+        return data
+
+    def seeded(self):
+        return self.kv.call('get', key='seeded') is not None
+
+    def finish_seeding(self):
+        """Mark the store seeded once the snapshot and every journal are in, or wait for the process doing it"""
+        if self.seeding:
+            self.kv.call('set', key='seeded', value=get_local_time())
+            self.kv.call('delete', key='seeding')
+            self.seeding = False
+            return
+        deadline = time.time() + SEED_CLAIM_TTL
+        while not self.seeded():
+            if time.time() > deadline:
+                raise RuntimeError("Shared state store was not seeded; restart to claim it")
+            time.sleep(0.5)
+
+if shared_state:
+    storage = SharedStateStorage(STORAGE_SCHEMA, DATA_FILE, BACKUP_FILE, shared_state)
+elif STORAGE_BACKEND == 'memory':
+    storage = MemoryStorage(STORAGE_SCHEMA)
+else:
+    storage = FileStorage(STORAGE_SCHEMA, DATA_FILE, BACKUP_FILE)
+
+# Handlers use these names directly; they are the repository's live collections
+user_balances = storage.collections['user_balances']
+pending_tasks = storage.collections['pending_tasks']
+proof_submissions = storage.collections['proof_submissions']
+referral_data = storage.collections['referral_data']
+completed_tasks = storage.collections['completed_tasks']
+task_sections = storage.collections['task_sections']
+client_tasks = storage.collections['client_tasks']
+client_referrals = storage.collections['client_referrals']
+withdrawal_requests = storage.collections['withdrawal_requests']
+task_tracking = storage.collections['task_tracking']
+banned_users = SharedSet(shared_state, 'banned_users') if shared_state else set()
+
+# ✅ DATA PERSISTENCE
 def load_data():
-    """Load data from file with backup recovery"""
+    """Load the stored snapshot, filling in any keys it is missing"""
     default_data = {
         'user_balances': {},
-        'worked_users': {},
+        'conversation_states': {},
+        'proof_waiters': {},
         'pending_tasks': {},
+        'proof_submissions': {},
+        'proof_id_counter': 1,
         'referral_data': {},
         'banned_users': [],
         'completed_tasks': {},
@@ -71,204 +1241,189 @@ def load_data():
         'withdrawal_requests': {},
         'task_tracking': {}
     }
-    
-    try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Ensure all required keys exist
-                for key in default_data:
-                    if key not in data:
-                        data[key] = default_data[key]
-                logger.info("Data loaded successfully from main file")
-                return data
-        elif os.path.exists(BACKUP_FILE):
-            logger.info("Loading from backup file...")
-            with open(BACKUP_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Ensure all required keys exist
-                for key in default_data:
-                    if key not in data:
-                        data[key] = default_data[key]
-                logger.info("Data loaded successfully from backup")
-                return data
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
-        if os.path.exists(BACKUP_FILE):
-            try:
-                with open(BACKUP_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for key in default_data:
-                        if key not in data:
-                            data[key] = default_data[key]
-                    logger.info("Successfully loaded from backup after JSON error")
-                    return data
-            except Exception as backup_error:
-                logger.error(f"Backup loading failed: {backup_error}")
-    except Exception as e:
-        logger.error(f"Error loading data: {e}")
-        if os.path.exists(BACKUP_FILE):
-            try:
-                with open(BACKUP_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for key in default_data:
-                        if key not in data:
-                            data[key] = default_data[key]
-                    logger.info("Successfully loaded from backup")
-                    return data
-            except Exception as backup_error:
-                logger.error(f"Backup loading failed: {backup_error}")
 
-    logger.warning("Using default data structure")
-    return default_data
+    data = storage.load()
+    if data is None:
+        logger.warning("Using default data structure")
+        return default_data
+    # Ensure all required keys exist
+    for key in default_data:
+        if key not in data:
+            data[key] = default_data[key]
+    return data
 
 def save_data():
-    """Save data to file with enhanced backup and verification"""
+    """Snapshot every collection and hand it to the storage backend"""
+    if BOT_ROLE == 'worker':
+        # Workers persist through the shared store and their own journal; bot_data.json is the poller's
+        return False
+    if not instance_lease.holds():
+        # A fenced or standby instance must never overwrite the active one's data
+        logger.error("❌ Save skipped: this instance does not hold the lease")
+        return False
+    if shared_state and not storage.seeded():
+        # The store restarted empty or from an old dump; the journals, not the store, hold the balances now
+        logger.error("❌ Save skipped: the shared state store lost its seed; restart to reseed it from the journals")
+        return False
     try:
-        # Create backup before saving
-        if os.path.exists(DATA_FILE):
-            import shutil
-            try:
-                shutil.copy2(DATA_FILE, BACKUP_FILE)
-            except Exception as backup_error:
-                logger.warning(f"Failed to create backup: {backup_error}")
+        # Balances and the ledger position are copied together so replay never double-applies
+        snapshot_seq, balance_snapshot, journaled = ledger.snapshot()
+        last_update_id, recent_update_ids = update_tracker.snapshot()
 
         data = {
-            'user_balances': user_balances,
-            'worked_users': worked_users,
+            'user_balances': balance_snapshot,
+            'ledger_seq': snapshot_seq,
+            'last_update_id': last_update_id,
+            'recent_update_ids': recent_update_ids,
+            'conversation_states': conversation_store.snapshot(PERSISTENT_STATES),
+            'proof_waiters': proof_waiters.snapshot({'proof'}),
             'pending_tasks': pending_tasks,
-            'referral_data': referral_data,
+            'proof_submissions': {str(k): v for k, v in list(proof_submissions.items())},
+            'proof_id_counter': proof_id_counter,
+            'referral_data': journaled['referral_data'],
             'banned_users': list(banned_users),
-            'completed_tasks': {str(k): list(v) if isinstance(v, set) else v for k, v in completed_tasks.items()},
+            'completed_tasks': journaled['completed_tasks'],
             'task_sections': task_sections,
             'client_tasks': client_tasks,
             'client_referrals': client_referrals,
             'client_id_counter': client_id_counter,
-            'withdrawal_requests': withdrawal_requests,
-            'task_tracking': task_tracking if 'task_tracking' in globals() else {},
+            'withdrawal_requests': journaled['withdrawal_requests'],
+            'task_tracking': task_tracking,
             'save_timestamp': get_local_time(),
-            'data_integrity_check': len(user_balances)
+            'data_integrity_check': len(balance_snapshot)
         }
-
-        # Atomic write with verification
-        temp_file = DATA_FILE + '.tmp'
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-        # Verify written data
-        with open(temp_file, 'r', encoding='utf-8') as f:
-            verification_data = json.load(f)
-            if verification_data.get('data_integrity_check') != len(user_balances):
-                raise Exception("Data integrity check failed")
-
-        os.replace(temp_file, DATA_FILE)
-        logger.debug("Data saved successfully")
+        if not storage.save(data):
+            return False
+        try:
+            # Replay after this snapshot starts at snapshot_seq, so older records can move to the archive once
+            # the journal is big enough to be worth rewriting (each compaction also writes a full key checkpoint)
+            if os.path.getsize(ledger.path) >= LEDGER_COMPACT_BYTES:
+                ledger.compact(snapshot_seq)
+        except Exception as e:
+            logger.error(f"Ledger compaction failed: {e}")
         return True
 
     except Exception as e:
         logger.error(f"Error saving data: {e}")
-        # Clean up temp file if it exists
-        temp_file = DATA_FILE + '.tmp'
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-        
-        # Try to restore from backup if save fails
-        if os.path.exists(BACKUP_FILE):
-            try:
-                import shutil
-                shutil.copy2(BACKUP_FILE, DATA_FILE)
-                logger.info("Restored from backup after save failure")
-            except Exception as restore_error:
-                logger.error(f"Failed to restore from backup: {restore_error}")
         return False
 
 # Load initial data
-try:
-    initial_data = load_data()
-    
-    # Safe data conversion with error handling
-    user_balances = {}
-    for k, v in initial_data.get('user_balances', {}).items():
-        try:
-            user_balances[int(k)] = float(v)
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid user balance data: {k}={v}, error: {e}")
-    
-    worked_users = initial_data.get('worked_users', {})
-    pending_tasks = initial_data.get('pending_tasks', {})
-    
-    referral_data = {}
-    for k, v in initial_data.get('referral_data', {}).items():
-        try:
-            referral_data[int(k)] = int(v)
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid referral data: {k}={v}, error: {e}")
-    
-    banned_users = set()
-    for x in initial_data.get('banned_users', []):
-        try:
-            banned_users.add(int(x))
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid banned user ID: {x}, error: {e}")
-    
-    completed_tasks = {}
-    for k, v in initial_data.get('completed_tasks', {}).items():
-        try:
-            completed_tasks[int(k)] = set(v) if isinstance(v, list) else v
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid completed task data: {k}={v}, error: {e}")
-    
-    task_sections = initial_data.get('task_sections', {
-        'watch_ads': [],
-        'app_downloads': [],
-        'promotional': []
-    })
-    
-    # Ensure all required sections exist
-    for section in ['watch_ads', 'app_downloads', 'promotional']:
-        if section not in task_sections:
-            task_sections[section] = []
-    
-    client_tasks = initial_data.get('client_tasks', {})
-    client_referrals = initial_data.get('client_referrals', {})
-    client_id_counter = initial_data.get('client_id_counter', 1)
-    withdrawal_requests = initial_data.get('withdrawal_requests', {})
-    task_tracking = initial_data.get('task_tracking', {})
-    
-    logger.info("Data initialization completed successfully")
-    
-except Exception as e:
-    logger.error(f"Critical error during data initialization: {e}")
-    # Initialize with defaults
-    user_balances = {}
-    worked_users = {}
-    pending_tasks = {}
-    referral_data = {}
-    banned_users = set()
-    completed_tasks = {}
-    task_sections = {'watch_ads': [], 'app_downloads': [], 'promotional': []}
-    client_tasks = {}
-    client_referrals = {}
-    client_id_counter = 1
-    withdrawal_requests = {}
-    task_tracking = {}
-
-# Remove admin ID from banned users if accidentally banned
-banned_users.discard(ADMIN_ID)
-
-# ✅ Runtime variables (not saved to disk)
-awaiting_withdraw = {}
-awaiting_message = {}
-awaiting_task_add = {}
-awaiting_support_message = {}
-awaiting_promotion_message = {}
-awaiting_client_data = {}
-awaiting_task_remove = {}
-awaiting_notice = {}
-awaiting_referral_reset = {}
+def load_state():
+    """Load the data snapshot into the repository's collections in place"""
+    global proof_id_counter, client_id_counter, ledger_seq, snapshot_balances
+    try:
+        initial_data = load_data()
+        snapshot_balances = {}
+        for k, v in initial_data.get('user_balances', {}).items():
+            try:
+                snapshot_balances[int(k)] = float(v)
+            except (ValueError, TypeError):
+                pass  # logged by fill() below
+
+        # Typed conversion per collection; malformed entries are logged and skipped
+        for name in STORAGE_SCHEMA:
+            if storage.seeds(name):
+                storage.fill(name, initial_data.get(name))
+
+        if storage.seeds('conversation_states'):
+            saved_states = initial_data.get('conversation_states', {})
+            # Snapshots that kept pending proofs in the conversation slot move them to proof_waiters
+            saved_proofs = {k: v for k, v in saved_states.items() if isinstance(v, list) and v[:1] == ['proof']}
+            conversation_store.restore({k: v for k, v in saved_states.items() if k not in saved_proofs})
+            proof_waiters.restore(dict(saved_proofs, **initial_data.get('proof_waiters', {})))
+            # Older data files kept proof submitters in a separate worked_users map
+            for k, v in initial_data.get('worked_users', {}).items():
+                try:
+                    proof_waiters.set(int(k), 'proof', v)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Invalid worked user data: {k}={v}, error: {e}")
+        proof_id_counter = initial_data.get('proof_id_counter', 1)
+
+        if storage.seeds('banned_users'):
+            banned_users.clear()
+            for x in initial_data.get('banned_users', []):
+                try:
+                    banned_users.add(int(x))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Invalid banned user ID: {x}, error: {e}")
+
+        # Ensure all required sections exist
+        for section in ['watch_ads', 'app_downloads', 'promotional']:
+            if section not in task_sections:
+                task_sections[section] = []
+
+        client_id_counter = initial_data.get('client_id_counter', 1)
+        ledger_seq = initial_data.get('ledger_seq', 0)
+        update_tracker.resume(initial_data.get('last_update_id', 0), initial_data.get('recent_update_ids', []))
+
+        logger.info("Data initialization completed successfully")
+
+    except Exception as e:
+        logger.error(f"Critical error during data initialization: {e}")
+        # Initialize with defaults; shared collections are left to the other processes using them
+        for name, collection in storage.collections.items():
+            if storage.seeds(name):
+                collection.clear()
+        if storage.seeds('banned_users'):
+            banned_users.clear()
+        task_sections.update({'watch_ads': [], 'app_downloads': [], 'promotional': []})
+        proof_id_counter = 1
+        client_id_counter = 1
+        ledger_seq = 0
+        snapshot_balances = {}
+
+    # Remove admin ID from banned users if accidentally banned
+    banned_users.discard(ADMIN_ID)
+
+load_state()
+
+# Polling resumes after the last fully processed update
+bot.last_update_id = update_tracker.processed_id
+
+# Text dispatch tables, filled by the decorators below
+admin_commands = {}   # "/command" -> handler
+menu_routes = {}      # menu button label -> handler
+state_handlers = {}   # conversation state -> (handler, admin_only)
+
+def set_state(user_id, state, payload=True):
+    """Start or replace the user's active conversation"""
+    conversation_store.set(user_id, state, payload)
+
+def get_state(user_id):
+    """Return (state, payload) for the user's active conversation"""
+    return conversation_store.get(user_id)
+
+def in_state(user_id, state):
+    """Check whether the user is in the given conversation state"""
+    return get_state(user_id)[0] == state
+
+def clear_state(user_id, state=None):
+    """End the user's conversation (only if it matches state, when given)"""
+    if state is None or in_state(user_id, state):
+        conversation_store.clear(user_id)
+
+def admin_command(*names):
+    """Register an admin text command handler"""
+    def decorator(handler):
+        for command in names:
+            admin_commands[command] = handler
+        return handler
+    return decorator
+
+def menu_route(*labels):
+    """Register a main menu button handler"""
+    def decorator(handler):
+        for label in labels:
+            menu_routes[label] = handler
+        return handler
+    return decorator
+
+def state_handler(state, admin_only=False):
+    """Register the text handler for a conversation state"""
+    def decorator(handler):
+        state_handlers[state] = (handler, admin_only)
+        return handler
+    return decorator
 
 # Auto-save with improved error handling and thread safety
 def auto_save():
@@ -276,6 +1431,8 @@ def auto_save():
     while True:
         try:
             time.sleep(30)  # Increased to 30 seconds to reduce I/O
+            conversation_store.sweep()
+            proof_waiters.sweep()
             if save_data():
                 save_count += 1
                 logger.info(f"✅ Auto-save completed (#{save_count})")
@@ -288,24 +1445,492 @@ def auto_save():
             logger.error(f"❌ Auto-save error: {e}")
             # Continue running even if error occurs
 
-# Start auto-save thread
-try:
-    save_thread = threading.Thread(target=auto_save, daemon=True)
-    save_thread.start()
-    logger.info("Auto-save thread started")
-except Exception as e:
-    logger.error(f"Failed to start auto-save thread: {e}")
+def start_auto_save_thread():
+    """Start auto-save thread for the threaded engine"""
+    try:
+        save_thread = threading.Thread(target=auto_save, daemon=True)
+        save_thread.start()
+        logger.info("Auto-save thread started")
+    except Exception as e:
+        logger.error(f"Failed to start auto-save thread: {e}")
+
+# ✅ BALANCE LEDGER
+class BalanceLedger:
+    """Append-only journal of balance entries (in paise) and collection changes; user_balances is its materialized view
+
+    Once a snapshot is saved, compact() moves the records it covers to an archive file. The journal then starts
+    with a checkpoint line carrying the idempotency keys, so startup only reads what replay needs.
+    """
+
+    def __init__(self, path, balances, collections, snapshot_seq=0, key_window=100000):
+        self.path = path
+        root, ext = os.path.splitext(path)
+        self.archive_path = f"{root}.archive{ext}"
+        self.balances = balances        # user_id -> rupees, read everywhere in O(1)
+        self.collections = collections  # name -> dict changed only through journal records
+        self.paise = {user_id: to_paise(amount) for user_id, amount in self._initial_balances(balances).items()}
+        self.offsets = {}               # user_id -> byte offsets of records touching that user
+        self.keys = OrderedDict()       # idempotency key -> seq, most recent last
+        self.key_window = key_window
+        self.seq = snapshot_seq
+        self.checkpoint_seq = 0         # records up to here live in the archive
+        self.archive_offsets = None     # user_id -> byte offsets into the archive, built on first statement
+        self.archive_seq = 0            # highest seq covered by archive_offsets
+        self.duplicates = 0
+        self.lock = threading.Lock()
+        self._replay(snapshot_seq)
+        self.journal = open(self.path, 'ab')
+
+    def _initial_balances(self, balances):
+        return balances
+
+    def _remember_key(self, key, seq):
+        if key:
+            self.keys[key] = seq
+            if len(self.keys) > self.key_window:
+                self.keys.popitem(last=False)
+
+    def _apply(self, record):
+        self._apply_entries(record['entries'])
+        self._apply_ops(record['ops'])
+
+    def _apply_entries(self, entries):
+        for entry in entries:
+            user_id = entry['user_id']
+            self.paise[user_id] = self.paise.get(user_id, 0) + entry['paise']
+            self.balances[user_id] = self.paise[user_id] / 100
+
+    def _apply_ops(self, ops):
+        for op, name, key, *value in ops:
+            collection = self.collections[name]
+            if op == 'set':
+                collection[key] = value[0]
+            elif op == 'pop':
+                collection.pop(key, None)
+            elif op == 'add':
+                collection.setdefault(key, set()).add(value[0])
+
+    def _index(self, record, offset):
+        for user_id in {entry['user_id'] for entry in record['entries']}:
+            self.offsets.setdefault(user_id, []).append(offset)
+        self._remember_key(record.get('key'), record['seq'])
+
+    @staticmethod
+    def _parse(line):
+        record = json.loads(line)
+        if 'entries' not in record and 'checkpoint' not in record:
+            # Single-entry lines written before transactions existed
+            record = {'seq': record['seq'], 'key': record.get('key'), 'at': record.get('at'), 'ops': [],
+                      'entries': [{'user_id': record['user_id'], 'paise': record['paise'], 'kind': record['kind']}]}
+        return record
+
+    def _archived_records(self):
+        """(offset, record) pairs from the archive in seq order, skipping any appended twice by a compaction cut short"""
+        if not os.path.exists(self.archive_path):
+            return
+        last_seq = 0
+        offset = 0
+        with open(self.archive_path, 'rb') as archive:
+            for line in archive:
+                try:
+                    record = self._parse(line)
+                except (ValueError, KeyError):
+                    record = None
+                if record and record['seq'] > last_seq:
+                    last_seq = record['seq']
+                    yield offset, record
+                offset += len(line)
+
+    def _index_archived(self, offset, record):
+        """Add one archived record to the per-user archive index"""
+        self.archive_seq = record['seq']
+        for user_id in {entry['user_id'] for entry in record['entries']}:
+            self.archive_offsets.setdefault(user_id, []).append(offset)
+
+    def _archive_index(self):
+        """Per-user archive offsets; one scan on first use, then kept current by compact(). Call under self.lock"""
+        if self.archive_offsets is None:
+            self.archive_offsets = {}
+            for offset, record in self._archived_records():
+                self._index_archived(offset, record)
+        return self.archive_offsets
+
+    def _replay(self, snapshot_seq):
+        """Index the journal and apply records newer than the snapshot"""
+        if not os.path.exists(self.path):
+            return
+        replayed = 0
+        with open(self.path, 'rb') as journal:
+            offset = 0
+            for line in journal:
+                try:
+                    record = self._parse(line)
+                except (ValueError, KeyError):
+                    # A torn final write from a crash is dropped, matching a transaction that never committed
+                    logger.warning(f"Skipping corrupt ledger line at byte {offset}")
+                    offset += len(line)
+                    continue
+                if record.get('checkpoint'):
+                    self.checkpoint_seq = record['seq']
+                    for key, seq in record['keys']:
+                        self._remember_key(key, seq)
+                    if snapshot_seq < self.checkpoint_seq:
+                        # Loaded an older snapshot (e.g. the backup file): catch up from the archive first
+                        logger.warning(f"Snapshot at ledger seq {snapshot_seq} predates checkpoint {self.checkpoint_seq}; replaying archive")
+                        for _, archived in self._archived_records():
+                            if snapshot_seq < archived['seq'] <= self.checkpoint_seq:
+                                self._apply(archived)
+                                replayed += 1
+                    self.seq = max(self.seq, record['seq'])
+                    offset += len(line)
+                    continue
+                self._index(record, offset)
+                if record['seq'] > snapshot_seq:
+                    self._apply(record)
+                    replayed += 1
+                self.seq = max(self.seq, record['seq'])
+                offset += len(line)
+        logger.info(f"Ledger loaded: {self.seq} records, {replayed} replayed after snapshot")
+
+    def balance_paise(self, user_id):
+        return self.paise.get(user_id, 0)
+
+    DUPLICATE = 'duplicate'  # commit() refusal: the idempotency key was already used
+
+    def commit(self, entries, ops, key=None):
+        """Durably append one record, then apply it; returns None once written, or why it was refused"""
+        with self.lock:
+            # Checked against the token on disk, so a fenced instance stops before its heartbeat notices.
+            # Workers never take the lease; each one only ever writes its own journal.
+            if BOT_ROLE != 'worker' and not instance_lease.holds():
+                raise RuntimeError("Instance lease not held; refusing to write the ledger")
+            if key and key in self.keys:
+                self.duplicates += 1
+                return self.DUPLICATE
+            record = {'seq': self.seq + 1, 'key': key, 'at': get_local_time(), 'entries': entries, 'ops': ops}
+            offset = self.journal.tell()
+            self.journal.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.seq += 1
+            self._index(record, offset)
+            self._apply(record)
+            return None
+
+    def post(self, user_id, paise, kind, key=None):
+        """Append a single balance entry"""
+        return self.commit([{'user_id': user_id, 'paise': paise, 'kind': kind}], [], key)
+
+    def snapshot(self):
+        """(last_seq, {user_id: rupees}, {name: collection copy}) taken atomically for save_data"""
+        with self.lock:
+            balances = {user_id: amount / 100 for user_id, amount in self.paise.items()}
+            collections = {name: {key: list(value) if isinstance(value, set) else value for key, value in collection.items()}
+                           for name, collection in self.collections.items()}
+            return self.seq, balances, collections
+
+    def compact(self, snapshot_seq):
+        """Move records covered by a durable snapshot to the archive; returns how many were moved"""
+        with self.lock:
+            if snapshot_seq <= self.checkpoint_seq:
+                return 0
+            archived = []
+            offsets = {}
+            temp_path = self.path + '.tmp'
+            archive_end = os.path.getsize(self.archive_path) if os.path.exists(self.archive_path) else 0
+            self.journal.flush()
+            with open(self.path, 'rb') as journal, open(self.archive_path, 'ab') as archive, open(temp_path, 'wb') as compacted:
+                checkpoint = {'seq': snapshot_seq, 'checkpoint': True, 'keys': list(self.keys.items())}
+                compacted.write((json.dumps(checkpoint, ensure_ascii=False) + "\n").encode('utf-8'))
+                for line in journal:
+                    try:
+                        record = self._parse(line)
+                    except (ValueError, KeyError):
+                        continue
+                    if record.get('checkpoint'):
+                        continue
+                    if record['seq'] <= snapshot_seq:
+                        archive.write(line)
+                        archived.append((archive_end, record))
+                        archive_end += len(line)
+                    else:
+                        for user_id in {entry['user_id'] for entry in record['entries']}:
+                            offsets.setdefault(user_id, []).append(compacted.tell())
+                        compacted.write(line)
+                # The archive must be durable before the journal stops holding these records
+                archive.flush()
+                os.fsync(archive.fileno())
+                compacted.flush()
+                os.fsync(compacted.fileno())
+            os.replace(temp_path, self.path)
+            self.journal.close()
+            self.journal = open(self.path, 'ab')
+            self.offsets = offsets
+            self.checkpoint_seq = snapshot_seq
+            if self.archive_offsets is not None:
+                for offset, record in archived:
+                    if record['seq'] > self.archive_seq:
+                        self._index_archived(offset, record)
+            return len(archived)
+
+    def statement(self, user_id, limit=20):
+        """Most recent entries for one user: the journal by offset, then the archive by offset if more are needed"""
+        def user_entries(record):
+            return [dict(entry, seq=record['seq'], at=record['at']) for entry in record['entries'] if entry['user_id'] == user_id]
+
+        entries = []
+        older = []
+        with self.lock:
+            # Under the lock: compact() swaps the file these offsets point into
+            offsets = self.offsets.get(user_id, [])
+            archived = self._archive_index().get(user_id, [])
+            total = len(offsets) + len(archived)
+            with open(self.path, 'rb') as journal:
+                for offset in offsets[-limit:]:
+                    journal.seek(offset)
+                    entries.extend(user_entries(self._parse(journal.readline())))
+            wanted = limit - len(offsets)
+            if wanted > 0 and archived:
+                with open(self.archive_path, 'rb') as archive:
+                    for offset in archived[-wanted:]:
+                        archive.seek(offset)
+                        older.extend(user_entries(self._parse(archive.readline())))
+        return older + entries, total
+
+class SharedBalanceLedger(BalanceLedger):
+    """Ledger whose balances live on the shared store, moved by per-key atomic increments
+
+    The journal stays local and durable: self.paise is the saved snapshot plus this journal, and that view, not
+    the store, is what save_data writes. Each process has its own journal, so reseeding a lost store replays all of them.
+    """
+
+    def __init__(self, kv, path, balances, collections, snapshot_seq=0, key_window=100000, seed=False, durable=None):
+        self.kv = kv
+        # Only the process seeding the store replays balance entries into it; the others would double-apply them
+        self.seeding = seed
+        self.durable = durable or {}
+        self.overdrawn = 0
+        super().__init__(path, balances, collections, snapshot_seq, key_window)
+        self.seeding = False
+
+    def _initial_balances(self, balances):
+        return self.durable
+
+    def _apply_entries(self, entries):
+        for entry in entries:
+            user_id = entry['user_id']
+            self.paise[user_id] = self.paise.get(user_id, 0) + entry['paise']
+            # Outside of seeding, commit() already moved this balance on the shared store
+            if self.seeding:
+                self.balances.incr(user_id, entry['paise'])
+
+    def seed_from(self, path, after_seq=0):
+        """Replay another process's journal into the shared store while seeding it"""
+        if not os.path.exists(path):
+            return 0
+        replayed = 0
+        with open(path, 'rb') as journal:
+            for line in journal:
+                try:
+                    record = self._parse(line)
+                except (ValueError, KeyError):
+                    continue
+                if record.get('checkpoint') or record['seq'] <= after_seq:
+                    continue
+                for entry in record['entries']:
+                    self.balances.incr(entry['user_id'], entry['paise'])
+                replayed += 1
+        logger.info(f"Seeded {replayed} records from {path}")
+        return replayed
+
+    def balance_paise(self, user_id):
+        return self.balances.paise(user_id)
+
+    OVERDRAWN = 'overdrawn'  # commit() refusal: another process spent the balance first
+
+    def commit(self, entries, ops, key=None):
+        """Claim the key and move balances on the shared store, then journal; returns None once written, or why it was refused"""
+        if key and not self.kv.call('setnx', key=f"idem:{key}", value=get_local_time(), ttl=SHARED_KEY_TTL):
+            with self.lock:
+                self.duplicates += 1
+            return self.DUPLICATE
+        applied = []
+        committed = False
+        try:
+            for entry in entries:
+                # Debits carry a floor so another process can't have spent the money since we checked
+                if not self.balances.incr(entry['user_id'], entry['paise'], 0 if entry['paise'] < 0 else None):
+                    with self.lock:
+                        self.overdrawn += 1
+                    return self.OVERDRAWN
+                applied.append(entry)
+            reason = super().commit(entries, ops, key)
+            committed = reason is None
+            return reason
+        finally:
+            if not committed:
+                for entry in applied:
+                    self.balances.incr(entry['user_id'], -entry['paise'])
+                if key:
+                    self.kv.call('delete', key=f"idem:{key}")
+
+def open_ledger():
+    """Open the journal over the loaded collections, replaying its tail past the snapshot"""
+    collections = {
+        'withdrawal_requests': withdrawal_requests,
+        'referral_data': referral_data,
+        'completed_tasks': completed_tasks,
+    }
+    if not shared_state:
+        return BalanceLedger(LEDGER_FILE, user_balances, collections, ledger_seq, LEDGER_KEY_WINDOW)
+    if BOT_ROLE == 'worker':
+        # bot_data.json's ledger_seq belongs to the poller's journal; a worker's own journal replays in full
+        path, own_seq = WORKER_LEDGER_FILE.format(WORKER_ID), 0
+    else:
+        path, own_seq = LEDGER_FILE, ledger_seq
+    opened = SharedBalanceLedger(shared_state, path, user_balances, collections, own_seq, LEDGER_KEY_WINDOW,
+                                 seed=storage.seeding, durable=snapshot_balances)
+    if storage.seeding:
+        if path != LEDGER_FILE:
+            opened.seed_from(LEDGER_FILE, ledger_seq)
+        for worker_path in sorted(glob.glob(WORKER_LEDGER_FILE.format('*'))):
+            if worker_path != path:
+                opened.seed_from(worker_path)
+    storage.finish_seeding()
+    return opened
+
+ledger = open_ledger()
+
+# ✅ PER-USER LOCKS
+class StripedLocks:
+    """Fixed pool of locks; a user always maps to the same stripe"""
+
+    def __init__(self, stripes=64):
+        self.locks = [threading.RLock() for _ in range(max(1, stripes))]
+
+    def stripe(self, user_id):
+        return hash(user_id) % len(self.locks)
+
+    @contextmanager
+    def hold(self, *user_ids):
+        """Hold the locks for all given users, taken in stripe order so two callers never deadlock"""
+        stripes = sorted({self.stripe(user_id) for user_id in user_ids})
+        for index in stripes:
+            self.locks[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(stripes):
+                self.locks[index].release()
+
+user_locks = StripedLocks(USER_LOCK_STRIPES)
+
+class Transaction:
+    """Balance entries and collection changes staged for one journal record"""
+
+    INSUFFICIENT = 'insufficient'  # a debit was refused while staging
+
+    def __init__(self, key=None):
+        self.key = key
+        self.entries = []
+        self.ops = []
+        self.staged = {}  # user_id -> paise staged in this transaction
+        self.committed = False
+        self.reason = None  # why nothing was committed: INSUFFICIENT or the ledger's DUPLICATE / OVERDRAWN
+
+    def balance(self, user_id):
+        """Balance in rupees including changes staged so far"""
+        return (ledger.balance_paise(user_id) + self.staged.get(user_id, 0)) / 100
+
+    def _entry(self, user_id, paise, kind):
+        self.entries.append({'user_id': user_id, 'paise': paise, 'kind': kind})
+        self.staged[user_id] = self.staged.get(user_id, 0) + paise
+
+    def credit(self, user_id, amount, kind):
+        self._entry(user_id, to_paise(amount), kind)
+
+    def adjust(self, user_id, amount, kind):
+        """Add or deduct, never going below zero"""
+        self._entry(user_id, max(to_paise(amount), -to_paise(self.balance(user_id))), kind)
+
+    def debit(self, user_id, amount, kind):
+        """Stage a debit if the balance covers it; returns whether it was staged"""
+        if to_paise(amount) > to_paise(self.balance(user_id)):
+            self.reason = self.INSUFFICIENT
+            return False
+        self._entry(user_id, -to_paise(amount), kind)
+        return True
 
-# Thread lock for data operations
-data_lock = threading.Lock()
+    def set(self, collection, key, value):
+        self.ops.append(['set', collection, key, value])
+
+    def pop(self, collection, key):
+        self.ops.append(['pop', collection, key])
+
+    def add(self, collection, key, member):
+        self.ops.append(['add', collection, key, member])
+
+@contextmanager
+def transaction(*user_ids, key=None):
+    """Stage changes under the users' locks and commit them as one durable journal record
+
+    Nothing is applied if the block raises; when tx.committed is False, tx.reason says whether a debit was refused,
+    the key was already used or, with shared state, another process spent the balance first.
+    Reads of journaled collections inside the block see committed state, not staged ops.
+    """
+    with user_locks.hold(*user_ids):
+        tx = Transaction(key)
+        yield tx
+        if tx.entries or tx.ops:
+            tx.reason = ledger.commit(tx.entries, tx.ops, key)
+            tx.committed = tx.reason is None
+
+def credit_balance(user_id, amount, kind, key=None):
+    """Atomically add to a balance; returns (old_balance, new_balance), or None if the key was already used"""
+    with transaction(user_id, key=key) as tx:
+        old_balance = tx.balance(user_id)
+        tx.credit(user_id, amount, kind)
+        new_balance = tx.balance(user_id)
+    return (old_balance, new_balance) if tx.committed else None
+
+def adjust_balance(user_id, amount, kind='admin_adjust', key=None):
+    """Atomically add or deduct, never going below zero; returns (old_balance, new_balance, reason)
+
+    reason is None once committed; otherwise it is the ledger's DUPLICATE or OVERDRAWN and nothing changed.
+    """
+    with transaction(user_id, key=key) as tx:
+        old_balance = tx.balance(user_id)
+        tx.adjust(user_id, amount, kind)
+        new_balance = tx.balance(user_id)
+    # Taken from the staged entry, so a deduction clamped at zero reports what was really applied
+    return old_balance, new_balance, tx.reason
+
+def settle_withdrawals(uids, status, **fields):
+    """Move pending withdrawals to approved/rejected exactly once in one transaction, refunding rejections"""
+    settled = []
+    with transaction(*uids) as tx:
+        for uid in uids:
+            request = withdrawal_requests.get(uid)
+            if not request or request.get('status') != 'pending':
+                continue
+            request = dict(request, status=status, **fields)
+            tx.set('withdrawal_requests', uid, request)
+            if status == 'rejected':
+                refund = request['inr_amount'] if request['type'] == 'paypal' else request['amount']
+                tx.credit(uid, refund, 'withdrawal_refund')
+            settled.append((uid, request))
+    return settled
+
+def settle_withdrawal(uid, status):
+    """Settle a single withdrawal; returns the updated request or None if it wasn't pending"""
+    settled = settle_withdrawals([uid], status)
+    return settled[0][1] if settled else None
 
 # ✅ Helper Functions
 def is_banned(user_id):
     """Check if user is banned with admin protection"""
-    if user_id == ADMIN_ID:
-        return False
-    with data_lock:
-        return user_id in banned_users
+    # Set membership is atomic; no lock needed on this per-message path
+    return user_id != ADMIN_ID and user_id in banned_users
 
 def generate_referral_link(user_id):
     """Generate referral link using cached bot username"""
@@ -338,12 +1963,15 @@ def process_referral(new_user_id, referrer_id):
     """Process referral bonuses with thread safety"""
     if referrer_id != new_user_id and new_user_id not in referral_data:
         try:
-            with data_lock:
-                user_balances[referrer_id] = user_balances.get(referrer_id, 0) + 5.0
-                user_balances[new_user_id] = user_balances.get(new_user_id, 0) + 5.0
-                referral_data[new_user_id] = referrer_id
+            with transaction(referrer_id, new_user_id) as tx:
+                # Re-check under the lock so a double /start can't pay the bonus twice
+                if new_user_id in referral_data:
+                    return
+                tx.credit(referrer_id, 5.0, 'referral_bonus')
+                tx.credit(new_user_id, 5.0, 'referral_bonus')
+                tx.set('referral_data', new_user_id, referrer_id)
             
-            if save_data():
+            if tx.committed:
                 logger.info(f"💰 Referral bonus added - Referrer: {referrer_id}, New User: {new_user_id}")
                 
                 try:
@@ -365,15 +1993,9 @@ def process_client_referral(new_user_id, client_id, task_type):
     try:
         if client_id in client_tasks:
             if client_id not in client_referrals:
-                client_referrals[client_id] = []
+                storage.put('client_referrals', client_id, [])
 
-            try:
-                user_chat = bot.get_chat(new_user_id)
-                username = user_chat.username or "No Username"
-                first_name = user_chat.first_name or "Unknown"
-            except:
-                username = "No Username"
-                first_name = "Unknown"
+            username, first_name = get_user_profile(new_user_id)
 
             user_info = {
                 'user_id': new_user_id,
@@ -401,7 +2023,7 @@ def process_client_referral(new_user_id, client_id, task_type):
                     notification += f"📊 **Total Members:** {len(client_referrals[client_id])}\n\n"
                     notification += f"💡 **This proves user completed client task!**"
 
-                    bot.send_message(ADMIN_ID, notification, parse_mode="Markdown")
+                    send_noncritical(ADMIN_ID, notification, parse_mode="Markdown")
                 except Exception as e:
                     print(f"Error sending notification: {e}")
     except Exception as e:
@@ -410,21 +2032,10 @@ def process_client_referral(new_user_id, client_id, task_type):
 def process_task_tracking(new_user_id, task_id, task_type, section):
     """Enhanced task tracking for ALL sections with detailed analytics"""
     try:
-        # Initialize tracking data if not exists
-        if 'task_tracking' not in globals():
-            global task_tracking
-            task_tracking = {}
-
         if task_id not in task_tracking:
-            task_tracking[task_id] = []
+            storage.put('task_tracking', task_id, [])
 
-        try:
-            user_chat = bot.get_chat(new_user_id)
-            username = user_chat.username or "No Username"
-            first_name = user_chat.first_name or "Unknown"
-        except:
-            username = "No Username"
-            first_name = "Unknown"
+        username, first_name = get_user_profile(new_user_id)
 
         # Check if user already tracked this specific task
         existing_user = any(track['user_id'] == new_user_id for track in task_tracking[task_id])
@@ -466,7 +2077,7 @@ def process_task_tracking(new_user_id, task_id, task_type, section):
                 notification += f"💡 **User successfully engaged with {section_name.lower()} task!**\n"
                 notification += f"🔍 **Next:** Monitor for task completion submission"
 
-                bot.send_message(ADMIN_ID, notification, parse_mode="Markdown")
+                send_noncritical(ADMIN_ID, notification, parse_mode="Markdown")
                 
                 # Send confirmation to user
                 bot.send_message(new_user_id, f"✅ **Tracking Confirmed!**\n\n🎯 Your activity has been recorded\n📱 Section: {section_name}\n⚡ Status: Verified\n\n💡 Continue with the task to earn rewards!", parse_mode="Markdown")
@@ -524,15 +2135,7 @@ def validate_user_id(user_id_str):
 
 def reset_user_state(user_id):
     """Reset all user states"""
-    awaiting_withdraw.pop(user_id, None)
-    awaiting_message.pop(user_id, None)
-    awaiting_task_add.pop(user_id, None)
-    awaiting_support_message.pop(user_id, None)
-    awaiting_promotion_message.pop(user_id, None)
-    awaiting_client_data.pop(user_id, None)
-    awaiting_task_remove.pop(user_id, None)
-    awaiting_notice.pop(user_id, None)
-    awaiting_referral_reset.pop(user_id, None)
+    clear_state(user_id)
 
 def notify_admin_user_action(user_id, first_name, username, action, additional_info=""):
     """Send notification to admin about user actions"""
@@ -551,7 +2154,7 @@ def notify_admin_user_action(user_id, first_name, username, action, additional_i
 
         notification += f"⏰ **Time:** {get_local_time()}"
 
-        bot.send_message(ADMIN_ID, notification, parse_mode="Markdown")
+        send_noncritical(ADMIN_ID, notification, parse_mode="Markdown")
     except Exception as e:
         print(f"Error sending admin notification: {e}")
 
@@ -569,29 +2172,185 @@ def auto_add_balance_for_task(user_id, task_text, task_section, task_index):
     try:
         reward = extract_reward_from_task(task_text)
         if reward >= 0.1:
-            user_balances[user_id] = user_balances.get(user_id, 0) + reward
-            save_data()
-
-            # Mark task as completed for limited sections
-            if task_section in ['app_downloads', 'promotional', 'watch_ads']:
-                if user_id not in completed_tasks:
-                    completed_tasks[user_id] = set()
-                completed_tasks[user_id].add(f"{task_section}_{task_index}")
-                save_data()
-
-            return True, reward
+            task_key = f"{task_section}_{task_index}"
+            with transaction(user_id, key=f"task:{user_id}:{task_key}") as tx:
+                # Completion check and credit happen together, so a double tap pays once
+                if task_key in completed_tasks.get(user_id, ()):
+                    return False, 0
+                tx.credit(user_id, reward, 'task_reward')
+
+                # Mark task as completed for limited sections
+                if task_section in ['app_downloads', 'promotional', 'watch_ads']:
+                    tx.add('completed_tasks', user_id, task_key)
+
+            return tx.committed, reward if tx.committed else 0
         return False, 0
     except Exception as e:
         print(f"Error in auto balance addition: {e}")
         return False, 0
 
+# ✅ CALLBACK ROUTER
+class CallbackRoute:
+    """Registered callback handler with its argument types and metrics"""
+
+    def __init__(self, pattern, handler, arg_types, admin_only, invalid_message, ack):
+        self.pattern = pattern
+        self.handler = handler
+        self.arg_types = arg_types
+        self.admin_only = admin_only
+        self.invalid_message = invalid_message
+        self.ack = ack
+        self.hits = 0
+        self.total_time = 0.0  # receipt -> handler finished
+        self.ack_time = 0.0    # receipt -> callback answered
+        self.max_ack_time = 0.0
+
+    def parse_args(self, remainder):
+        """Convert the text after the prefix into typed handler arguments"""
+        if not self.arg_types:
+            return ()
+        # Split from the right so only the first argument may contain "_": "watch_ads_3" -> ("watch_ads", 3)
+        parts = remainder.rsplit("_", len(self.arg_types) - 1) if remainder else []
+        if len(parts) != len(self.arg_types):
+            raise ValueError(f"Expected {len(self.arg_types)} arguments in '{remainder}'")
+        return tuple(arg_type(part) for arg_type, part in zip(self.arg_types, parts))
+
+class CallbackRouter:
+    """Dispatches callback data through an exact-match dict and a prefix trie"""
+
+    def __init__(self):
+        self.exact = {}
+        self.prefix_trie = {}  # char -> child node, None -> route ending here
+        self.routes = []
+
+    def route(self, pattern, *arg_types, prefix=False, admin_only=False, invalid_message="❌ Invalid request!", ack=None):
+        """Register a handler for exact callback data, or for a prefix with typed arguments
+
+        ack is the toast shown by the immediate acknowledgement sent before the handler runs.
+        """
+        def decorator(handler):
+            callback_route = CallbackRoute(pattern, handler, arg_types, admin_only, invalid_message, ack)
+            if prefix:
+                node = self.prefix_trie
+                for char in pattern:
+                    node = node.setdefault(char, {})
+                node[None] = callback_route
+            else:
+                self.exact[pattern] = callback_route
+            self.routes.append(callback_route)
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """Find the route for callback data; the longest matching prefix wins"""
+        callback_route = self.exact.get(data)
+        if callback_route is not None:
+            return callback_route, ""
+
+        node = self.prefix_trie
+        match, match_length = None, 0
+        for i, char in enumerate(data):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                match, match_length = node[None], i + 1
+        if match is None:
+            return None, None
+        return match, data[match_length:]
+
+    def acknowledge(self, call):
+        """Validate and answer a callback ahead of its handler; returns (route, args) to run, or None once fully answered
+
+        The engines call this as soon as the update is admitted, before it waits behind the user's queued updates.
+        """
+        if hasattr(call, 'routed'):
+            return call.routed
+        call.routed = None
+        callback_route, remainder = self.resolve(call.data or "")
+        if callback_route is None:
+            logger.debug(f"No callback route for {call.data}")
+            answer_callback(call)
+            return None
+
+        received = getattr(call, 'received_at', None) or time.monotonic()
+        try:
+            # Fast path: validate and acknowledge before any saves, sends or admin notifications
+            if callback_route.admin_only and call.from_user.id != ADMIN_ID:
+                answer_callback(call, "❌ Admin only!", show_alert=True)
+                return None
+            try:
+                args = callback_route.parse_args(remainder)
+            except ValueError:
+                answer_callback(call, callback_route.invalid_message, show_alert=True)
+                return None
+            # Routed before answering, so a failed ack still lets the handler run
+            call.routed = (callback_route, args)
+            answer_callback(call, callback_route.ack)
+        finally:
+            ack_time = time.monotonic() - received
+            callback_route.ack_time += ack_time
+            callback_route.max_ack_time = max(callback_route.max_ack_time, ack_time)
+            callback_route.hits += 1
+        return call.routed
+
+    def dispatch(self, call):
+        routed = self.acknowledge(call)
+        if routed is None:
+            return False
+        callback_route, args = routed
+        received = getattr(call, 'received_at', None) or time.monotonic()
+        try:
+            callback_route.handler(call, *args)
+        finally:
+            callback_route.total_time += time.monotonic() - received
+        return True
+
+    def report(self):
+        """Per-route hit counts with time-to-ack and time-to-completion"""
+        lines = []
+        for callback_route in sorted(self.routes, key=lambda r: r.hits, reverse=True):
+            if callback_route.hits:
+                ack_ms = callback_route.ack_time / callback_route.hits * 1000
+                done_ms = callback_route.total_time / callback_route.hits * 1000
+                lines.append(f"• {callback_route.pattern}: {callback_route.hits} hits, ack avg {ack_ms:.0f}ms (max {callback_route.max_ack_time * 1000:.0f}ms), done avg {done_ms:.0f}ms")
+        return "\n".join(lines) or "No callbacks handled yet"
+
+callback_router = CallbackRouter()
+
+def answer_callback(call, text=None, show_alert=False, follow_up=False):
+    """Answer a callback once; after the router's ack, only follow_up text (an outcome the user must see) is sent as a message"""
+    if not getattr(call, 'acked', False):
+        call.acked = True
+        bot.answer_callback_query(call.id, text, show_alert=show_alert)
+    elif text and follow_up and call.message is not None:
+        send_noncritical(call.message.chat.id, text)
+
+def acknowledge_callback(call):
+    """Run the router's ack for an admitted callback without letting an API error drop the update"""
+    try:
+        callback_router.acknowledge(call)
+    except Exception as e:
+        logger.warning(f"Callback ack failed for {call.data}: {e}")
+
 # ✅ MARKUP GENERATORS
+def frozen_keyboard(builder):
+    """Build a static keyboard once and reuse its serialized JSON"""
+    serialized = builder().to_json()
+    def cached():
+        return serialized
+    cached.__name__ = builder.__name__
+    cached.__doc__ = builder.__doc__
+    return cached
+
+@frozen_keyboard
 def generate_task_markup():
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
     markup.row("📺 Watch Ads", "📱 App Download")
     markup.row("📢 Promotional", "🔙 Back")
     return markup
 
+@frozen_keyboard
 def generate_withdraw_markup():
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
     markup.row("💳 UPI", "🌐 PayPal")
@@ -599,18 +2358,13 @@ def generate_withdraw_markup():
     markup.row("🔙 Back")
     return markup
 
-def generate_approval_markup(user_id):
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("✅ Approve", callback_data=f"approve_{user_id}"))
-    markup.add(types.InlineKeyboardButton("❌ Reject", callback_data=f"reject_{user_id}"))
-    return markup
-
 def generate_withdrawal_approval_markup(user_id):
     markup = types.InlineKeyboardMarkup()
     markup.add(types.InlineKeyboardButton("✅ Approve Payment", callback_data=f"approve_withdrawal_{user_id}"))
     markup.add(types.InlineKeyboardButton("❌ Reject Payment", callback_data=f"reject_withdrawal_{user_id}"))
     return markup
 
+@frozen_keyboard
 def generate_admin_task_markup():
     """Complete admin task management markup with all features"""
     markup = types.InlineKeyboardMarkup()
@@ -625,6 +2379,7 @@ def generate_admin_task_markup():
     markup.add(types.InlineKeyboardButton("🔙 Close Panel", callback_data="close_admin_panel"))
     return markup
 
+@frozen_keyboard
 def generate_client_task_options():
     """Generate simplified client task management with only add and remove options"""
     markup = types.InlineKeyboardMarkup()
@@ -633,12 +2388,14 @@ def generate_client_task_options():
     markup.add(types.InlineKeyboardButton("🔙 Back to Admin", callback_data="back_to_admin"))
     return markup
 
+@frozen_keyboard
 def generate_promotion_menu():
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
     markup.row("📊 Bot Status", "📢 Request Promotion")
     markup.row("🔙 Back")
     return markup
 
+@frozen_keyboard
 def generate_main_menu():
     """Generate main menu markup"""
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
@@ -647,6 +2404,14 @@ def generate_main_menu():
     markup.row("👥 Referral", "🆘 Support", "📢 Promotion")
     return markup
 
+@frozen_keyboard
+def generate_banned_menu():
+    """Generate the support-only menu shown to banned users"""
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.row("🆘 Support", "🔙 Back")
+    return markup
+
+@frozen_keyboard
 def generate_enhanced_remove_task_markup():
     """Enhanced task removal menu with all sections including auto-tracking"""
     markup = types.InlineKeyboardMarkup()
@@ -700,6 +2465,7 @@ def generate_task_removal_list(section):
 
     return markup
 
+@frozen_keyboard
 def generate_task_add_markup():
     """Generate task addition menu with back button"""
     markup = types.InlineKeyboardMarkup()
@@ -709,6 +2475,86 @@ def generate_task_add_markup():
     markup.add(types.InlineKeyboardButton("🔙 Back to Admin", callback_data="back_to_admin"))
     return markup
 
+# ✅ TASK KEYBOARD CACHE
+class TaskKeyboardCache:
+    """Per-section task keyboard templates with per-user completion overlay"""
+
+    ICONS = {'watch_ads': "📺", 'app_downloads': "📱", 'promotional': "📢"}
+
+    def __init__(self, page_size=8):
+        self.page_size = max(1, page_size)
+        self.templates = {}  # section -> [(task_key, pending_row_json, done_row_json)]
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.renders = 0
+
+    @staticmethod
+    def _row(*buttons):
+        """Serialize one keyboard row from (text, callback_data) pairs"""
+        return json.dumps(
+            [types.InlineKeyboardButton(text, callback_data=callback_data).to_dict() for text, callback_data in buttons],
+            ensure_ascii=False
+        )
+
+    def _build(self, section):
+        icon = self.ICONS.get(section, "📋")
+        template = []
+        for i, task in enumerate(task_sections.get(section, [])):
+            task_parts = task.split(" - ")
+            task_name = task_parts[0] if task_parts else task[:35]
+
+            if section == 'promotional' and is_client_task(task):
+                pending_text = f"🎯 {task_name[:30]}..."
+                done_text = f"✅ {task_name[:20]}... - DONE"
+            else:
+                reward = extract_reward_from_task(task)
+                pending_text = f"{icon} {task_name[:25]}... (₹{reward})" if reward > 0 else f"{icon} {task_name[:35]}..."
+                done_text = f"✅ {task_name[:20]}... (₹{reward}) - DONE"
+
+            callback_data = f"complete_{section}_{i}"
+            template.append((f"{section}_{i}", self._row((pending_text, callback_data)), self._row((done_text, callback_data))))
+        self.builds += 1
+        return template
+
+    def _template(self, section):
+        with self.lock:
+            template = self.templates.get(section)
+            if template is None:
+                template = self.templates[section] = self._build(section)
+            self.renders += 1
+        return template
+
+    def render(self, section, user_id, page=0):
+        """Serialized InlineKeyboardMarkup for one page of a section"""
+        template = self._template(section)
+        pages = max(1, -(-len(template) // self.page_size))
+        page = min(max(page, 0), pages - 1)
+        start = page * self.page_size
+
+        user_completed = completed_tasks.get(user_id, set())
+        rows = [done if task_key in user_completed else pending
+                for task_key, pending, done in template[start:start + self.page_size]]
+
+        if pages > 1:
+            nav = []
+            if page > 0:
+                nav.append(("⬅️ Prev", f"tasks_page_{section}_{page - 1}"))
+            nav.append((f"📄 {page + 1}/{pages}", "no_action"))
+            if page < pages - 1:
+                nav.append(("Next ➡️", f"tasks_page_{section}_{page + 1}"))
+            rows.append(self._row(*nav))
+        return '{"inline_keyboard":[' + ','.join(rows) + ']}'
+
+    def invalidate(self, section=None):
+        """Drop cached templates after tasks are added or removed"""
+        with self.lock:
+            if section is None:
+                self.templates.clear()
+            else:
+                self.templates.pop(section, None)
+
+task_keyboards = TaskKeyboardCache(TASKS_PER_PAGE)
+
 # ✅ START COMMAND
 @bot.message_handler(commands=['start'])
 def send_welcome(message):
@@ -716,12 +2562,10 @@ def send_welcome(message):
     reset_user_state(user_id)
 
     if is_banned(user_id):
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.row("🆘 Support", "🔙 Back")
         bot.send_message(
             message.chat.id,
             "❌ You have been banned from using this bot.\n\n🆘 You can contact admin through Support if needed.",
-            reply_markup=markup
+            reply_markup=generate_banned_menu()
         )
         return
 
@@ -745,7 +2589,7 @@ def send_welcome(message):
 
                 if client_id in client_tasks:
                     if client_id not in client_referrals:
-                        client_referrals[client_id] = []
+                        storage.put('client_referrals', client_id, [])
 
                     existing_user = any(ref['user_id'] == user_id for ref in client_referrals[client_id])
                     if not existing_user:
@@ -812,982 +2656,1728 @@ def send_welcome(message):
         reply_markup=markup
     )
 
-# ✅ ENHANCED TEXT MESSAGE HANDLER
-@bot.message_handler(func=lambda message: True, content_types=['text'])
-def handle_message(message):
-    try:
-        user_id = message.from_user.id
-        name = message.from_user.first_name or "Unknown"
-        username = message.from_user.username or "No Username"
-        text = message.text.strip() if message.text else ""
-        
-        if not text:
-            logger.warning(f"Empty message from user {user_id}")
-            return
-            
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
-        return
+# ✅ ADMIN REPORTS
+# Reports page through the append-only tracking lists; the cursor is a list offset
+def report_entries(kind, key):
+    """Tracking list behind a report, or None if the key is unknown"""
+    if kind == 'client':
+        return client_referrals.get(key)
+    if kind == 'task':
+        return task_tracking.get(key)
+    return None
+
+def report_header(kind, key, total):
+    if kind == 'client':
+        client_name = client_tasks.get(key, {}).get('info', 'Unknown Client')
+        header = f"🎯 **Client Statistics:**\n\n"
+        header += f"📋 **Client:** {client_name}\n"
+        header += f"🏷️ **ID:** {key}\n"
+        header += f"📊 **Total Completions:** {total}\n\n"
+        header += "👥 **User List:**\n"
+        return header
+
+    section, _, task_index = key.rpartition('_')
+    task_name = "Unknown Task"
+    if section in task_sections and task_index.isdigit() and int(task_index) < len(task_sections[section]):
+        task_name = task_sections[section][int(task_index)][:100]
+
+    header = f"📊 **Enhanced Task Tracking Statistics:**\n\n"
+    header += f"🎯 **Task ID:** {key}\n"
+    header += f"📝 **Task:** {task_name}...\n"
+    header += f"📱 **Section:** {section.replace('_', ' ').title()}\n"
+    header += f"📊 **Total Engagements:** {total}\n"
+    header += f"✅ **Verification:** Real-time tracking\n\n"
+    header += "👥 **Detailed Activity Log:**\n"
+    return header
+
+def format_report_entry(kind, number, entry):
+    if kind == 'client':
+        return f"{number}. {entry['first_name']} (@{entry['username']}) - {entry['timestamp']}\n"
+
+    section_name = entry['section'].replace('_', ' ').title()
+    line = f"{number}. **{entry['first_name']}** (@{entry['username']})\n"
+    line += f"   🆔 ID: {entry['user_id']}\n"
+    line += f"   📱 Section: {section_name}\n"
+    line += f"   🔍 Action: {entry['task_type']}\n"
+    line += f"   ⏰ Time: {entry['timestamp']}\n"
+    line += f"   ✅ Status: {entry.get('verification_status', 'verified')}\n\n"
+    return line
+
+def render_report_page(kind, key, offset=0):
+    """Build (text, markup) for one report page, touching only that page's entries"""
+    entries = report_entries(kind, key)
+    if entries is None:
+        return None, None
+
+    total = len(entries)
+    offset = min(max(offset, 0), max(total - 1, 0))
+    offset -= offset % REPORT_PAGE_SIZE
+    page = entries[offset:offset + REPORT_PAGE_SIZE]
+
+    text = report_header(kind, key, total)
+    text += "".join(format_report_entry(kind, number, entry) for number, entry in enumerate(page, offset + 1))
+    if total:
+        text = text.rstrip('\n') + f"\n\n📄 Showing {offset + 1}-{offset + len(page)} of {total}"
 
-    # Handle Back button - reset states first
-    if text == "🔙 Back":
-        reset_user_state(user_id)
+    markup = types.InlineKeyboardMarkup()
+    nav = []
+    if offset > 0:
+        nav.append(types.InlineKeyboardButton("⬅️ Prev", callback_data=f"report_{kind}_{key}_{offset - REPORT_PAGE_SIZE}"))
+    if offset + REPORT_PAGE_SIZE < total:
+        nav.append(types.InlineKeyboardButton("Next ➡️", callback_data=f"report_{kind}_{key}_{offset + REPORT_PAGE_SIZE}"))
+    if nav:
+        markup.row(*nav)
+    markup.add(types.InlineKeyboardButton("📥 Export Full Report", callback_data=f"export_{kind}_{key}"))
+    return text, markup
+
+def export_report(kind, key, chat_id):
+    """Stream a full report to a temp file and send it as a document"""
+    entries = report_entries(kind, key)
+    if entries is None:
+        return False
 
-        if is_banned(user_id):
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-            markup.row("🆘 Support", "🔙 Back")
-            bot.send_message(message.chat.id, "🏠 Main Menu:\n\n❌ **You are banned** - Only Support works.", reply_markup=markup, parse_mode="Markdown")
-        else:
-            bot.send_message(message.chat.id, "🏠 Main Menu:", reply_markup=generate_main_menu())
-        return
+    with tempfile.NamedTemporaryFile('w+', encoding='utf-8', suffix='.txt', delete=False) as report_file:
+        report_file.write(report_header(kind, key, len(entries)).replace('**', ''))
+        unique_users = set()
+        for number, entry in enumerate(list(entries), 1):
+            report_file.write(format_report_entry(kind, number, entry).replace('**', ''))
+            unique_users.add(entry.get('user_id'))
+        if kind == 'task':
+            report_file.write(f"\n📈 Analytics:\n")
+            report_file.write(f"• Unique Users: {len(unique_users)}\n")
+            report_file.write(f"• Multiple Engagements: {len(entries) - len(unique_users)}\n")
+        path = report_file.name
 
-    # Handle banned users
-    if is_banned(user_id):
-        if text in ["🆘 Support"] or user_id in awaiting_support_message:
-            pass
-        elif text in ["📋 Task", "💰 Balance", "📤 Submit Proof", "🏧 Withdraw", "👥 Referral", "📺 Watch Ads", "📱 App Download", "📢 Promotional", "💳 UPI", "🌐 PayPal", "📦 Amazon Pay", "🎮 Google Play Gift", "📢 Promotion"]:
-            bot.send_message(user_id, "❌ You are banned from using this feature.\n\n🆘 Only Support is available for banned users.")
-            return
-        else:
-            bot.send_message(user_id, "❌ You have been banned from using this bot.\n\n🆘 You can only access Support to contact admin.")
-            return
+    try:
+        with open(path, 'rb') as document:
+            bot.send_document(chat_id, document, visible_file_name=f"{kind}_report_{key}.txt",
+                              caption=f"📥 Full {kind} report for {key} ({len(entries)} entries)")
+    finally:
+        os.remove(path)
+    return True
+
+# ✅ DATA EXPORTS
+EXPORT_FIELDS = {
+    'users': ['user_id', 'balance', 'banned', 'referred_by', 'completed_tasks'],
+    'referrals': ['user_id', 'referrer_id'],
+    'withdrawals': ['user_id', 'type', 'payment_id', 'amount', 'final_amount', 'fee_amount',
+                    'inr_amount', 'tax_amount', 'timestamp', 'status'],
+    'tracking': ['task_id', 'user_id', 'username', 'first_name', 'task_type', 'section',
+                 'timestamp', 'verification_status'],
+    'clients': ['client_id', 'user_id', 'username', 'first_name', 'task_type', 'timestamp'],
+}
+EXPORT_FORMATS = ('csv', 'ndjson')
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024  # Bot API limit for send_document
+
+def export_rows(dataset):
+    """Yield one dict per exported row from repository scans, so handlers can keep writing"""
+    if dataset == 'users':
+        for user_id, balance in storage.scan('user_balances'):
+            yield {
+                'user_id': user_id,
+                'balance': balance,
+                'banned': user_id in banned_users,
+                'referred_by': storage.get('referral_data', user_id, ''),
+                'completed_tasks': len(storage.get('completed_tasks', user_id, ())),
+            }
+    elif dataset == 'referrals':
+        for user_id, referrer_id in storage.scan('referral_data'):
+            yield {'user_id': user_id, 'referrer_id': referrer_id}
+    elif dataset == 'withdrawals':
+        for user_id, request in storage.scan('withdrawal_requests'):
+            if request:
+                yield dict(request, user_id=user_id)
+    elif dataset == 'tracking':
+        for task_id, tracks in storage.scan('task_tracking'):
+            for track in list(tracks):
+                yield dict(track, task_id=task_id)
+    elif dataset == 'clients':
+        for client_id, refs in storage.scan('client_referrals'):
+            for ref in list(refs):
+                yield dict(ref, client_id=client_id)
+
+def write_export(dataset, fmt, path):
+    """Stream a dataset into a gzip file, returning the row count"""
+    fields = EXPORT_FIELDS[dataset]
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as export_file:
+        if fmt == 'csv':
+            writer = csv.DictWriter(export_file, fieldnames=fields, restval='', extrasaction='ignore')
+            writer.writeheader()
+            for row in export_rows(dataset):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in export_rows(dataset):
+                export_file.write(json.dumps({field: row.get(field) for field in fields}, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+class ExportWorker:
+    """Single background thread that builds and uploads exports one at a time"""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.completed = 0
+
+    def submit(self, dataset, fmt, chat_id):
+        """Queue an export and return its position in the queue"""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="ExportWorker", daemon=True)
+                self.thread.start()
+        self.jobs.put((dataset, fmt, chat_id))
+        return self.jobs.qsize()
+
+    def _run(self):
+        while True:
+            dataset, fmt, chat_id = self.jobs.get()
+            try:
+                self._export(dataset, fmt, chat_id)
+            except Exception as e:
+                logger.error(f"Export {dataset}.{fmt} failed: {e}")
+                try:
+                    bot.send_message(chat_id, f"❌ Export of {dataset} failed: {str(e)[:100]}")
+                except Exception:
+                    pass
+            finally:
+                self.jobs.task_done()
+
+    def _export(self, dataset, fmt, chat_id):
+        started = time.monotonic()
+        handle, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+        os.close(handle)
+        try:
+            rows = write_export(dataset, fmt, path)
+            size = os.path.getsize(path)
+            if size > TELEGRAM_UPLOAD_LIMIT:
+                bot.send_message(chat_id, f"❌ Export of {dataset} is {size / 1024 / 1024:.1f} MB compressed, above Telegram's 50 MB upload limit.")
+                return
+            with open(path, 'rb') as document:
+                bot.send_document(
+                    chat_id, document,
+                    visible_file_name=f"{dataset}_{datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y%m%d_%H%M%S')}.{fmt}.gz",
+                    caption=f"📦 {dataset} export: {rows} rows, {size / 1024:.1f} KB ({time.monotonic() - started:.1f}s)"
+                )
+            self.completed += 1
+        finally:
+            os.remove(path)
+
+export_worker = ExportWorker()
+
+# ✅ ADMIN ANALYTICS
+# report -> (title, collection snapshotted, tally per chunk, render of the merged tallies)
+ANALYTICS_REPORTS = {
+    'tasks': ("📊 Task tracking overview", 'task_tracking', analytics.tally_tracking, analytics.render_task_overview),
+    'referrals': ("👥 Referral statistics", 'referral_data', analytics.tally_referrals, analytics.render_referral_stats),
+    'referral_panel': ("👥 Referral statistics", 'referral_data', analytics.tally_referrals, analytics.render_referral_panel),
+}
+
+class AnalyticsPool:
+    """Builds admin reports in worker processes from a snapshot, so the update lanes keep their CPU
+
+    Each report is tallied chunk by chunk, with a progress message and a cancel button.
+    """
+
+    def __init__(self, workers=2, chunk_size=5000):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.jobs = {}  # job_id -> cancel event
+        self.next_id = 1
+        self.completed = 0
+        self.cancelled = 0
+
+    def start(self):
+        """Spawn the workers now; later calls reuse them, and a broken pool is replaced the same way"""
+        with self.lock:
+            if self.executor is None:
+                # spawn, not fork: by now this process runs lane, heartbeat and save threads.
+                # A spawned worker imports the parent's __main__ before anything else, so while the workers
+                # launch it points at analytics.py instead of re-running the bot's startup.
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                bot_main = sys.modules['__main__']
+                sys.modules['__main__'] = analytics
+                try:
+                    # A spawn pool starts a worker only for a submit that finds none idle, so keep every worker busy
+                    # with a warm-up task until all of them exist; later submits never start another
+                    warm_up = [self.executor.submit(time.sleep, 0.2) for _ in range(self.workers)]
+                finally:
+                    sys.modules['__main__'] = bot_main
+                wait(warm_up)
+                logger.info(f"Analytics pool started with {self.workers} workers")
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            for cancel in self.jobs.values():
+                cancel.set()
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, report, chat_id, message_id=None, done_markup=None):
+        """Snapshot the report's collection and build it in the background; edits message_id if given"""
+        title, collection, _, _ = ANALYTICS_REPORTS[report]
+        rows = [(key, list(value) if isinstance(value, list) else value) for key, value in storage.scan(collection)]
+        chunks = [rows[i:i + self.chunk_size] for i in range(0, len(rows), self.chunk_size)]
+        with self.lock:
+            job_id = self.next_id
+            self.next_id += 1
+            cancel = self.jobs[job_id] = threading.Event()
+
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("🚫 Cancel", callback_data=f"report_cancel_{job_id}"))
+        progress = f"⏳ {title}: 0/{len(chunks)} chunks of {len(rows)} rows"
+        if message_id is None:
+            message_id = bot.send_message(chat_id, progress, reply_markup=markup).message_id
+        else:
+            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=progress, reply_markup=markup)
+
+        threading.Thread(target=self._run, args=(job_id, report, chunks, len(rows), chat_id, message_id, markup, done_markup, cancel),
+                         name=f"Report-{job_id}", daemon=True).start()
+        return job_id
+
+    def cancel(self, job_id):
+        with self.lock:
+            cancel = self.jobs.get(job_id)
+        if cancel is None:
+            return False
+        cancel.set()
+        return True
 
-    # ✅ ENHANCED ADMIN COMMANDS
-    if user_id == ADMIN_ID:
-        if text.startswith("/addbalance"):
+    def _run(self, job_id, report, chunks, row_count, chat_id, message_id, markup, done_markup, cancel):
+        title, _, tally, render = ANALYTICS_REPORTS[report]
+        futures = []
+        try:
+            executor = self.start()
+            futures = [executor.submit(tally, chunk) for chunk in chunks]
+            pending = set(futures)
+            last_progress = time.monotonic()
+            while pending and not cancel.is_set():
+                _, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                if pending and time.monotonic() - last_progress >= ANALYTICS_PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    bot.edit_message_text(chat_id=chat_id, message_id=message_id, reply_markup=markup,
+                                          text=f"⏳ {title}: {len(futures) - len(pending)}/{len(chunks)} chunks of {row_count} rows")
+            if not cancel.is_set():
+                # Partials are merged in chunk order so ties sort the same way they did in one pass
+                text = executor.submit(render, [future.result() for future in futures], row_count).result()
+            if cancel.is_set():
+                with self.lock:
+                    self.cancelled += 1
+                bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=f"🚫 {title} cancelled.", reply_markup=done_markup)
+                return
+            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode="Markdown", reply_markup=done_markup)
+            with self.lock:
+                self.completed += 1
+        except Exception as e:
+            logger.error(f"Report {report} failed: {e}")
+            if isinstance(e, BrokenProcessPool):
+                # A worker died; the next report spawns a fresh pool
+                with self.lock:
+                    self.executor = None
             try:
-                parts = text.split()
-                if len(parts) != 3:
-                    bot.send_message(ADMIN_ID, "⚠️ Usage: /addbalance user_id amount\n💡 Use negative amounts to deduct balance")
-                    return
+                # Replace the progress message so its Cancel button doesn't outlive the job
+                bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=f"❌ {title} failed: {str(e)[:200]}",
+                                      reply_markup=done_markup)
+            except Exception:
+                try:
+                    bot.send_message(chat_id, f"❌ Error: {str(e)[:200]}")
+                except Exception:
+                    pass
+        finally:
+            for future in futures:
+                future.cancel()
+            with self.lock:
+                self.jobs.pop(job_id, None)
+
+    def summary(self):
+        with self.lock:
+            return f"{len(self.jobs)} running, {self.completed} done, {self.cancelled} cancelled ({self.workers} workers)"
+
+analytics_pool = AnalyticsPool(ANALYTICS_WORKERS, ANALYTICS_CHUNK_SIZE)
+
+# ✅ BULK IMPORTS
+IMPORT_MAX_BYTES = 20 * 1024 * 1024  # Bot API download limit for get_file
+
+def open_import_csv(data):
+    """DictReader over uploaded CSV bytes, with lower-cased headers"""
+    reader = csv.DictReader(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline=''))
+    reader.fieldnames = [(field or '').strip().lower() for field in (reader.fieldnames or [])]
+    return reader
+
+def iter_import_rows(reader):
+    """Yield (line_number, row) one row at a time"""
+    for row in reader:
+        yield reader.line_num, row
+
+def validate_balance_rows(rows):
+    """Validation pass for user_id,amount rows; sums repeated users into one change"""
+    changes = {}
+    errors = []
+    for line_number, row in rows:
+        target_id, error = validate_user_id((row.get('user_id') or '').strip())
+        if error:
+            errors.append((line_number, error, row))
+            continue
+        try:
+            amount = float((row.get('amount') or '').strip())
+        except ValueError:
+            errors.append((line_number, "❌ Invalid amount format", row))
+            continue
+        if not math.isfinite(amount) or amount == 0:
+            errors.append((line_number, "❌ Amount must be a non-zero number", row))
+            continue
+        changes[target_id] = changes.get(target_id, 0) + amount
+    return changes, errors
+
+def validate_task_rows(rows):
+    """Validation pass for section,task rows"""
+    additions = []
+    errors = []
+    for line_number, row in rows:
+        section = (row.get('section') or '').strip().lower()
+        task = (row.get('task') or '').strip()
+        if section not in task_sections:
+            errors.append((line_number, f"❌ Invalid section: {section or '(empty)'}", row))
+        elif not task:
+            errors.append((line_number, "❌ Empty task", row))
+        else:
+            additions.append((section, task))
+    return additions, errors
+
+def apply_balance_import(changes, import_id):
+    """Apply all balance changes, persist once, then queue user notifications; returns (updated, net change, refused)"""
+    updates = []
+    overdrawn = 0
+    for target_id, amount in changes.items():
+        old_balance, new_balance, reason = adjust_balance(target_id, amount, 'bulk_import', key=f"import:{import_id}:{target_id}")
+        if reason == BalanceLedger.DUPLICATE:
+            continue  # this file was already imported for this user
+        if reason:
+            overdrawn += 1  # the balance was spent elsewhere before the deduction landed
+            continue
+        # Deductions stop at zero, so report the change actually applied rather than the one requested
+        applied = round(new_balance - old_balance, 2)
+        if applied:
+            updates.append((target_id, applied, old_balance, new_balance))
+    save_data()
 
-                target_id, error = validate_user_id(parts[1])
-                if error:
-                    bot.send_message(ADMIN_ID, error)
-                    return
+    for target_id, amount, old_balance, new_balance in updates:
+        if amount >= 0:
+            notification_message = f"💰 **Balance Added!**\n\n✅ ₹{amount:.2f} has been added to your account by admin!\n\n"
+        else:
+            notification_message = f"💸 **Balance Deducted!**\n\n⚠️ ₹{abs(amount):.2f} has been deducted from your account by admin!\n\n"
+        notification_message += f"📊 **Balance Update:**\n"
+        notification_message += f"   • Previous: ₹{old_balance:.2f}\n"
+        notification_message += f"   • Current: ₹{new_balance:.2f}"
+        notification_sender.submit(target_id, notification_message, parse_mode="Markdown")
+    return len(updates), sum(amount for _, amount, _, _ in updates), overdrawn
+
+def apply_task_import(additions):
+    """Append all imported tasks and persist once"""
+    for section, task in additions:
+        task_sections[section].append(task)
+    for section in {section for section, _ in additions}:
+        task_keyboards.invalidate(section)
+    save_data()
 
-                amount_str = parts[2]
-                try:
-                    amount = float(amount_str)
-                except ValueError:
-                    bot.send_message(ADMIN_ID, "❌ Invalid amount format")
-                    return
+def send_import_errors(chat_id, file_name, errors):
+    """Send rejected rows back as a CSV report"""
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    os.close(handle)
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(['line', 'error', 'row'])
+            for line_number, error, row in errors:
+                writer.writerow([line_number, error, json.dumps(row, ensure_ascii=False)])
+        with open(path, 'rb') as document:
+            bot.send_document(chat_id, document, visible_file_name=f"errors_{file_name}",
+                              caption=f"⚠️ {len(errors)} rows were rejected")
+    finally:
+        os.remove(path)
+
+def run_bulk_import(document, chat_id):
+    """Download an admin CSV, validate every row, then apply the valid rows in one step"""
+    try:
+        file_info = bot.get_file(document.file_id)
+        data = bot.download_file(file_info.file_path)
+        reader = open_import_csv(data)
+        header = set(reader.fieldnames)
+        rows = iter_import_rows(reader)
+
+        started = time.monotonic()
+        if {'user_id', 'amount'} <= header:
+            changes, errors = validate_balance_rows(rows)
+            updated, total, overdrawn = apply_balance_import(changes, document.file_unique_id) if changes else (0, 0, 0)
+            summary = f"✅ **Balance Import Complete**\n\n👥 **Users Updated:** {updated}\n💰 **Net Change:** ₹{total:.2f}\n"
+            if overdrawn:
+                summary += f"⚠️ **Insufficient Balance:** {overdrawn} (balance changed during import; re-run the file)\n"
+            summary += f"📨 **Notifications Queued:** {updated} (~{updated / BULK_NOTIFY_RATE:.0f}s)\n"
+        elif {'section', 'task'} <= header:
+            additions, errors = validate_task_rows(rows)
+            if additions:
+                apply_task_import(additions)
+            summary = f"✅ **Task Import Complete**\n\n📋 **Tasks Added:** {len(additions)}\n"
+        else:
+            bot.send_message(chat_id, "❌ Unknown CSV format.\n\n💡 Use columns `user_id,amount` for balances or `section,task` for tasks.", parse_mode="Markdown")
+            return
 
-                old_balance = user_balances.get(target_id, 0)
-                user_balances[target_id] = max(0, old_balance + amount)
-                new_balance = user_balances[target_id]
-                save_data()
+        summary += f"❌ **Rejected Rows:** {len(errors)}\n⏱️ **Time:** {time.monotonic() - started:.2f}s"
+        bot.send_message(chat_id, summary, parse_mode="Markdown")
+        if errors:
+            send_import_errors(chat_id, document.file_name or "import.csv", errors)
+    except Exception as e:
+        logger.error(f"Bulk import failed: {e}")
+        bot.send_message(chat_id, f"❌ Import failed: {str(e)[:100]}")
+
+# ✅ PROOF REVIEW QUEUE
+# Pending proofs keyed by submission ID, oldest first; reviewed proofs are removed
+proof_lock = threading.Lock()
+
+def queue_proof(user_id, photo_id):
+    """Record a proof screenshot as its own submission; returns (submission_id, pending_count)"""
+    global proof_id_counter
+    task_data = pending_tasks.get(user_id, {})
+    with proof_lock:
+        submission_id = proof_id_counter
+        proof_id_counter += 1
+        storage.put('proof_submissions', submission_id, {
+            'id': submission_id,
+            'user_id': user_id,
+            'photo_id': photo_id,
+            'task': task_data.get('task', ''),
+            'task_name': task_data.get('task_name', 'Unknown Task'),
+            'section': task_data.get('section', ''),
+            'task_index': task_data.get('task_index', 0),
+            'reward': task_data.get('reward', 0),
+            'submitted_at': get_local_time()
+        })
+        return submission_id, len(proof_submissions)
+
+def proof_page():
+    """Oldest pending submissions, one album's worth"""
+    with proof_lock:
+        return list(islice(proof_submissions.values(), PROOF_PAGE_SIZE))
+
+def describe_proof(submission):
+    text = f"#{submission['id']} 👤 {submission['user_id']}\n📝 {submission['task_name'][:60]}"
+    if submission['section']:
+        text += f"\n🔗 {submission['section'].replace('_', ' ').title()}"
+    if submission['reward'] > 0 and not is_client_task(submission['task']):
+        text += f" 💰 ₹{submission['reward']}"
+    return text
+
+def generate_proof_page_markup(page):
+    markup = types.InlineKeyboardMarkup()
+    for submission in page:
+        markup.row(
+            types.InlineKeyboardButton(f"✅ #{submission['id']}", callback_data=f"proof_ok_{submission['id']}"),
+            types.InlineKeyboardButton(f"❌ #{submission['id']}", callback_data=f"proof_no_{submission['id']}")
+        )
+    first, last = page[0]['id'], page[-1]['id']
+    markup.row(
+        types.InlineKeyboardButton("✅ Approve Page", callback_data=f"proofs_ok_{first}_{last}"),
+        types.InlineKeyboardButton("❌ Reject Page", callback_data=f"proofs_no_{first}_{last}")
+    )
+    return markup
 
-                operation = "added" if amount >= 0 else "deducted"
-                print(f"💰 Balance updated - User: {target_id}, Amount: {amount:+.2f}, Operation: {operation}")
+def send_proof_page(chat_id):
+    """Send the next page of proofs as an album plus one review message"""
+    page = proof_page()
+    if not page:
+        bot.send_message(chat_id, "✅ No proofs waiting for review.")
+        return
+    bot.send_media_group(chat_id, [types.InputMediaPhoto(submission['photo_id'], caption=describe_proof(submission)) for submission in page])
+    summary = f"📤 **Proof Review** ({len(proof_submissions)} pending)\n\n"
+    # Task names are user-facing text and may contain Markdown characters
+    summary += "\n".join(f"#{submission['id']} • {submission['user_id']} • {formatting.escape_markdown(submission['task_name'][:40])}" for submission in page)
+    bot.send_message(chat_id, summary, parse_mode="Markdown", reply_markup=generate_proof_page_markup(page))
+
+def review_proofs(submission_ids, approve):
+    """Approve or reject submissions in one pass with a single save; returns how many were pending"""
+    # Held until the approval is durable: a commit that raises leaves every proof queued, and nobody reviews them twice
+    with proof_lock:
+        reviewed = [proof_submissions[submission_id] for submission_id in submission_ids if submission_id in proof_submissions]
+        if not reviewed:
+            return 0
+        if approve:
+            with transaction(*{submission['user_id'] for submission in reviewed}) as tx:
+                for submission in reviewed:
+                    if submission['section'] in ['app_downloads', 'promotional', 'watch_ads']:
+                        tx.add('completed_tasks', submission['user_id'], f"{submission['section']}_{submission['task_index']}")
+            if tx.reason:
+                logger.error(f"Proof approval refused by the ledger ({tx.reason}); {len(reviewed)} proofs left pending")
+                return 0
+        for submission in reviewed:
+            storage.delete('proof_submissions', submission['id'])
+
+    if approve:
+        # pending_tasks isn't journaled, so it is only cleared once the approval has committed
+        for submission in reviewed:
+            current = pending_tasks.get(submission['user_id'])
+            if current and current.get('section') == submission['section'] and current.get('task_index') == submission['task_index']:
+                storage.delete('pending_tasks', submission['user_id'])
+    save_data()
 
-                try:
-                    if amount >= 0:
-                        notification_message = f"💰 **Balance Added!**\n\n"
-                        notification_message += f"✅ ₹{amount:.2f} has been added to your account by admin!\n\n"
-                    else:
-                        notification_message = f"💸 **Balance Deducted!**\n\n"
-                        notification_message += f"⚠️ ₹{abs(amount):.2f} has been deducted from your account by admin!\n\n"
+    for submission in reviewed:
+        uid = submission['user_id']
+        if not approve:
+            notification_sender.submit(uid, "❌ Task proof rejected. Please follow requirements properly.")
+        elif is_client_task(submission['task']):
+            notification_sender.submit(uid, f"✅ Client task approved!\n📝 Task: {submission['task_name']}\n⚠️ Admin will add reward manually.")
+        else:
+            notification_sender.submit(uid, f"✅ Task approved!\n📝 Task: {submission['task_name']}\n⚠️ Admin will add ₹{submission['reward']} manually.")
+    logger.info(f"{'Approved' if approve else 'Rejected'} {len(reviewed)} proof submissions")
+    return len(reviewed)
+
+# ✅ WITHDRAWAL CONSOLE
+PAYOUT_METHODS = {
+    'upi': ("UPI", "INR"),
+    'amazon': ("Amazon Pay", "INR"),
+    'googleplay': ("Google Play Gift", "INR"),
+    'paypal': ("PayPal", "USD"),
+}
+WITHDRAWAL_CONSOLES_KEPT = 20
+# Console message_id -> {'page': user IDs shown on it, 'selected': user IDs ticked on it}, newest last
+withdrawal_consoles = OrderedDict()
+
+def withdrawal_console(message_id):
+    """Page and selection state of one console message"""
+    console = withdrawal_consoles.get(message_id)
+    if console is None:
+        console = withdrawal_consoles[message_id] = {'page': [], 'selected': set()}
+        while len(withdrawal_consoles) > WITHDRAWAL_CONSOLES_KEPT:
+            withdrawal_consoles.popitem(last=False)
+    return console
+
+def withdrawal_approved_message(request):
+    """Payment confirmation text for an approved withdrawal"""
+    if request['type'] == 'paypal':
+        return f"✅ **PayPal Payment Approved!**\n\n💰 **Amount:** ${request['final_amount']:.2f}\n🌐 **PayPal:** {request['payment_id']}\n\n💡 **Please check your PayPal account**\n⏰ **Time:** {get_local_time()}"
+    elif request['type'] == 'upi':
+        return f"✅ **UPI Payment Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n💳 **UPI ID:** {request['payment_id']}\n\n💡 **Please check your UPI account**\n⏰ **Time:** {get_local_time()}"
+    elif request['type'] == 'amazon':
+        return f"✅ **Amazon Pay Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n📦 **Mobile:** {request['payment_id']}\n\n💡 **Please check your Amazon Pay account**\n⏰ **Time:** {get_local_time()}"
+    return f"✅ **Google Play Gift Card Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n🎮 **Email:** {request['payment_id']}\n\n💡 **Please check your email for gift card code**\n⏰ **Time:** {get_local_time()}"
+
+def pending_withdrawals():
+    """Yield (user_id, request) for pending withdrawals in request order"""
+    for uid in list(withdrawal_requests):
+        request = withdrawal_requests.get(uid)
+        if request and request.get('status') == 'pending':
+            yield uid, request
+
+def withdrawal_page(offset):
+    """(offset actually shown, total pending, [(user_id, request)] on that page)"""
+    offset = max(offset, 0)
+    total = sum(1 for _ in pending_withdrawals())
+    if offset >= total:
+        offset = max(0, total - 1) // WITHDRAWAL_PAGE_SIZE * WITHDRAWAL_PAGE_SIZE
+    return offset, total, list(islice(pending_withdrawals(), offset, offset + WITHDRAWAL_PAGE_SIZE))
+
+def render_withdrawal_console(offset, console):
+    """Build (text, markup) for one page of the pending-withdrawal console, recording the page on console"""
+    offset, total, page = withdrawal_page(offset)
+    console['page'] = [uid for uid, _ in page]
+    console['selected'].intersection_update(uid for uid, _ in pending_withdrawals())
+    selected = console['selected']
+
+    text = f"🏧 **Pending Withdrawals:** {total}\n☑️ **Selected:** {len(selected)}\n\n"
+    if not page:
+        text += "✅ Nothing to pay out."
+    markup = types.InlineKeyboardMarkup()
+    for uid, request in page:
+        method, currency = PAYOUT_METHODS.get(request['type'], (request['type'], "INR"))
+        symbol = "$" if currency == "USD" else "₹"
+        tick = "☑️" if uid in selected else "⬜"
+        markup.add(types.InlineKeyboardButton(
+            f"{tick} {uid} • {method} • {symbol}{request.get('final_amount', request['amount']):.2f}",
+            callback_data=f"wd_sel_{uid}_{offset}"
+        ))
+
+    nav = []
+    if offset > 0:
+        nav.append(types.InlineKeyboardButton("⬅️ Prev", callback_data=f"wd_page_{max(0, offset - WITHDRAWAL_PAGE_SIZE)}"))
+    if offset + WITHDRAWAL_PAGE_SIZE < total:
+        nav.append(types.InlineKeyboardButton("Next ➡️", callback_data=f"wd_page_{offset + WITHDRAWAL_PAGE_SIZE}"))
+    if nav:
+        markup.row(*nav)
+    if page:
+        markup.row(
+            types.InlineKeyboardButton(f"✅ Approve Selected ({len(selected)})", callback_data=f"wd_approve_sel_{offset}"),
+            types.InlineKeyboardButton("✅ Approve Page", callback_data=f"wd_approve_page_{offset}")
+        )
+    return text, markup
+
+def approve_withdrawal_batch(uids):
+    """Approve pending withdrawals in one transaction; returns the approved (user_id, request) pairs"""
+    approved = settle_withdrawals(uids, 'approved', approved_at=get_local_time())
+    if not approved:
+        return approved
+
+    for uid, request in approved:
+        for console in withdrawal_consoles.values():
+            console['selected'].discard(uid)
+        notification_sender.submit(uid, withdrawal_approved_message(request), parse_mode="Markdown")
+    logger.info(f"Approved {len(approved)} withdrawals in one batch")
+    return approved
+
+def send_payout_files(chat_id, approved):
+    """Send one payout CSV per payment method for an approved batch"""
+    by_method = {}
+    for uid, request in approved:
+        by_method.setdefault(request['type'], []).append((uid, request))
+
+    stamp = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y%m%d_%H%M%S')
+    for method_key, rows in by_method.items():
+        method, currency = PAYOUT_METHODS.get(method_key, (method_key, "INR"))
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        try:
+            with open(path, 'w', encoding='utf-8', newline='') as payout_file:
+                writer = csv.writer(payout_file)
+                writer.writerow(['user_id', 'payment_id', 'requested', 'deduction', 'payout', 'currency', 'requested_at'])
+                total = 0
+                for uid, request in rows:
+                    # PayPal keeps a 7% tax, other methods a 2% fee
+                    deduction = request.get('tax_amount', request.get('fee_amount', 0))
+                    writer.writerow([uid, request['payment_id'], request['amount'], f"{deduction:.2f}",
+                                     f"{request['final_amount']:.2f}", currency, request.get('timestamp', '')])
+                    total += request['final_amount']
+            with open(path, 'rb') as document:
+                bot.send_document(chat_id, document, visible_file_name=f"payout_{method_key}_{stamp}.csv",
+                                  caption=f"💸 {method} payout: {len(rows)} payments, {currency} {total:.2f}")
+        finally:
+            os.remove(path)
+
+# ✅ ADMIN COMMANDS
+
+@admin_command("/addbalance")
+def cmd_addbalance(message, user_id, name, username, text):
+    """Add or deduct balance for a user"""
+    try:
+        parts = text.split()
+        if len(parts) != 3:
+            bot.send_message(ADMIN_ID, "⚠️ Usage: /addbalance user_id amount\n💡 Use negative amounts to deduct balance")
+            return
 
-                    notification_message += f"📊 **Balance Update:**\n"
-                    notification_message += f"   • Previous: ₹{old_balance:.2f}\n"
-                    notification_message += f"   • {operation.title()}: ₹{abs(amount):.2f}\n"
-                    notification_message += f"   • Current: ₹{new_balance:.2f}"
+        target_id, error = validate_user_id(parts[1])
+        if error:
+            bot.send_message(ADMIN_ID, error)
+            return
 
-                    bot.send_message(target_id, notification_message, parse_mode="Markdown")
-                    bot.send_message(ADMIN_ID, f"✅ ₹{abs(amount):.2f} {operation} for user {target_id}. New balance: ₹{new_balance:.2f}")
+        amount_str = parts[2]
+        try:
+            amount = float(amount_str)
+        except ValueError:
+            bot.send_message(ADMIN_ID, "❌ Invalid amount format")
+            return
 
-                except Exception as e:
-                    bot.send_message(ADMIN_ID, f"✅ ₹{abs(amount):.2f} {operation} for user {target_id}. New balance: ₹{new_balance:.2f}\n⚠️ Could not send notification: {str(e)}")
+        old_balance, new_balance, reason = adjust_balance(target_id, amount, key=f"msg:{message.chat.id}:{message.message_id}")
+        if reason == BalanceLedger.DUPLICATE:
+            bot.send_message(ADMIN_ID, f"ℹ️ This balance change for user {target_id} was already applied.")
+            return
+        if reason:
+            bot.send_message(ADMIN_ID, f"❌ Insufficient balance: user {target_id} spent part of it before the deduction applied.\n💳 Current balance: ₹{user_balances.get(target_id, 0):.2f}\n\nNothing was deducted; please try again.")
+            return
+        # A deduction stops at zero; report what was actually taken
+        amount = round(new_balance - old_balance, 2)
+        save_data()
 
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
+        operation = "added" if amount >= 0 else "deducted"
+        print(f"💰 Balance updated - User: {target_id}, Amount: {amount:+.2f}, Operation: {operation}")
 
-        elif text.startswith("/balance"):
-            try:
-                parts = text.split()
-                if len(parts) != 2:
-                    bot.send_message(ADMIN_ID, "⚠️ Usage: /balance user_id")
-                    return
+        try:
+            if amount >= 0:
+                notification_message = f"💰 **Balance Added!**\n\n"
+                notification_message += f"✅ ₹{amount:.2f} has been added to your account by admin!\n\n"
+            else:
+                notification_message = f"💸 **Balance Deducted!**\n\n"
+                notification_message += f"⚠️ ₹{abs(amount):.2f} has been deducted from your account by admin!\n\n"
 
-                target_id, error = validate_user_id(parts[1])
-                if error:
-                    bot.send_message(ADMIN_ID, error)
-                    return
+            notification_message += f"📊 **Balance Update:**\n"
+            notification_message += f"   • Previous: ₹{old_balance:.2f}\n"
+            notification_message += f"   • {operation.title()}: ₹{abs(amount):.2f}\n"
+            notification_message += f"   • Current: ₹{new_balance:.2f}"
 
-                bal = user_balances.get(target_id, 0)
-                bot.send_message(ADMIN_ID, f"👤 User ID: {target_id}\n💰 Balance: ₹{bal:.2f}")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
+            bot.send_message(target_id, notification_message, parse_mode="Markdown")
+            bot.send_message(ADMIN_ID, f"✅ ₹{abs(amount):.2f} {operation} for user {target_id}. New balance: ₹{new_balance:.2f}")
 
-        elif text.startswith("/addclienttask"):
-            try:
-                parts = text.split(' ', 2)
-                if len(parts) >= 3:
-                    client_name = parts[1]
-                    links_text = parts[2]
-                    original_links = [link.strip() for link in links_text.split() if link.strip().startswith('http')]
-
-                    if original_links:
-                        client_id = generate_fixed_client_id()
-
-                        client_tasks[client_id] = {
-                            'info': client_name,
-                            'links': original_links,
-                            'created_at': get_local_time(),
-                            'tracking_links': [],
-                            'auto_tracking': True
-                        }
-
-                        for i, original_link in enumerate(original_links):
-                            tracking_link = generate_client_tracking_link(client_id, f"link{i+1}")
-                            client_tasks[client_id]['tracking_links'].append(tracking_link)
-
-                            task_name = f"{client_name} - Link {i+1}"
-                            promotional_task = f"{task_name} - TRACKING:{client_id}_link{i+1} - ORIGINAL:{original_link}"
-                            task_sections['promotional'].append(promotional_task)
-
-                        save_data()
-
-                        response = f"✅ **Client Task Created with Auto-Tracking!**\n\n"
-                        response += f"🏷️ **Client ID:** {client_id}\n"
-                        response += f"📋 **Client:** {client_name}\n"
-                        response += f"📊 **Links:** {len(original_links)}\n"
-                        response += f"🔄 **Auto-Tracking:** Enabled\n\n"
-                        response += f"🔗 **Original Links:**\n"
-                        for i, link in enumerate(original_links, 1):
-                            response += f"{i}. `{link}`\n"
-                        response += f"\n🎯 **Tracking Links:**\n"
-                        for i, tracking_link in enumerate(client_tasks[client_id]['tracking_links'], 1):
-                            response += f"{i}. `{tracking_link}`\n"
-
-                        bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
-                    else:
-                        bot.send_message(ADMIN_ID, "❌ No valid links found.")
-                else:
-                    bot.send_message(ADMIN_ID, "⚠️ Usage: /addclienttask client_name link1 link2")
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
+        except Exception as e:
+            bot.send_message(ADMIN_ID, f"✅ ₹{abs(amount):.2f} {operation} for user {target_id}. New balance: ₹{new_balance:.2f}\n⚠️ Could not send notification: {str(e)}")
 
-        elif text == "/tasks":
-            try:
-                markup = generate_admin_task_markup()
-
-                watch_ads_count = len(task_sections['watch_ads'])
-                app_downloads_count = len(task_sections['app_downloads'])
-                promotional_count = len(task_sections['promotional'])
-                client_tasks_count = len(client_tasks)
-
-                task_info = f"📋 **Admin Task Management Panel**\n\n"
-                task_info += f"📊 **Current Tasks:**\n"
-                task_info += f"📺 Watch Ads: {watch_ads_count}\n"
-                task_info += f"📱 App Downloads: {app_downloads_count}\n"
-                task_info += f"📢 Promotional: {promotional_count}\n"
-                task_info += f"🎯 Client Tasks: {client_tasks_count}\n\n"
-                task_info += f"🔧 **Choose an option below:**"
-
-                bot.send_message(ADMIN_ID, task_info, parse_mode="Markdown", reply_markup=markup)
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ **Error:** {str(e)}")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
 
-        elif text.startswith("/clientstats"):
-            try:
-                parts = text.split()
-                if len(parts) > 1:
-                    client_id = parts[1]
-                    if client_id in client_referrals:
-                        client_task = client_tasks.get(client_id, {})
-                        client_name = client_task.get('info', 'Unknown Client')
-
-                        stats = f"🎯 **Client Statistics:**\n\n"
-                        stats += f"📋 **Client:** {client_name}\n"
-                        stats += f"🏷️ **ID:** {client_id}\n"
-                        stats += f"📊 **Total Completions:** {len(client_referrals[client_id])}\n\n"
-                        stats += "👥 **User List:**\n"
-                        for i, ref in enumerate(client_referrals[client_id], 1):
-                            stats += f"{i}. {ref['first_name']} (@{ref['username']}) - {ref['timestamp']}\n"
-
-                        bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
-                    else:
-                        bot.send_message(ADMIN_ID, f"❌ No data found for client {client_id}")
-                else:
-                    if client_referrals:
-                        stats = "🎯 **All Client Statistics:**\n\n"
-                        for client_id, refs in client_referrals.items():
-                            client_task = client_tasks.get(client_id, {})
-                            client_name = client_task.get('info', f'Client {client_id}')
-                            stats += f"🏷️ **{client_name}** (ID: {client_id}): {len(refs)} completions\n"
-                        stats += f"\n💡 Use /clientstats client_id for details"
-                        bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
-                    else:
-                        bot.send_message(ADMIN_ID, "❌ No client statistics available")
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
+@admin_command("/balance")
+def cmd_balance(message, user_id, name, username, text):
+    """Show a user's balance"""
+    try:
+        parts = text.split()
+        if len(parts) != 2:
+            bot.send_message(ADMIN_ID, "⚠️ Usage: /balance user_id")
+            return
 
-        elif text.startswith("/taskstats"):
-            try:
-                parts = text.split()
-                if len(parts) > 1:
-                    task_id = parts[1]
-                    if task_id in task_tracking:
-                        # Get task details
-                        section = task_id.split('_')[0] + '_' + task_id.split('_')[1] if '_' in task_id else task_id
-                        task_index = int(task_id.split('_')[1]) if '_' in task_id else 0
-                        
-                        task_name = "Unknown Task"
-                        if section in task_sections and task_index < len(task_sections[section]):
-                            task_name = task_sections[section][task_index][:100]
-                        
-                        stats = f"📊 **Enhanced Task Tracking Statistics:**\n\n"
-                        stats += f"🎯 **Task ID:** {task_id}\n"
-                        stats += f"📝 **Task:** {task_name}...\n"
-                        stats += f"📱 **Section:** {section.replace('_', ' ').title()}\n"
-                        stats += f"📊 **Total Engagements:** {len(task_tracking[task_id])}\n"
-                        stats += f"✅ **Verification:** Real-time tracking\n\n"
-                        
-                        stats += "👥 **Detailed Activity Log:**\n"
-                        for i, track in enumerate(task_tracking[task_id], 1):
-                            section_name = track['section'].replace('_', ' ').title()
-                            verification = track.get('verification_status', 'verified')
-                            stats += f"{i}. **{track['first_name']}** (@{track['username']})\n"
-                            stats += f"   🆔 ID: {track['user_id']}\n"
-                            stats += f"   📱 Section: {section_name}\n"
-                            stats += f"   🔍 Action: {track['task_type']}\n"
-                            stats += f"   ⏰ Time: {track['timestamp']}\n"
-                            stats += f"   ✅ Status: {verification}\n\n"
-
-                        stats += f"📈 **Analytics:**\n"
-                        stats += f"• Unique Users: {len(set(track['user_id'] for track in task_tracking[task_id]))}\n"
-                        stats += f"• Multiple Engagements: {len(task_tracking[task_id]) - len(set(track['user_id'] for track in task_tracking[task_id]))}\n"
-                        stats += f"• Success Rate: 100% (All verified)\n"
-
-                        bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
-                    else:
-                        bot.send_message(ADMIN_ID, f"❌ No tracking data found for task {task_id}")
-                else:
-                    if task_tracking:
-                        stats = "📊 **Complete Task Tracking Overview:**\n\n"
-                        
-                        total_engagements = sum(len(tracks) for tracks in task_tracking.values())
-                        unique_users = len(set(track['user_id'] for tracks in task_tracking.values() for track in tracks))
-                        
-                        stats += f"🔍 **Global Statistics:**\n"
-                        stats += f"• Total Tasks with Tracking: {len(task_tracking)}\n"
-                        stats += f"• Total Engagements: {total_engagements}\n"
-                        stats += f"• Unique Users Tracked: {unique_users}\n\n"
-                        
-                        stats += "📱 **By Section:**\n"
-                        section_stats = {}
-                        for task_id, tracks in task_tracking.items():
-                            section = tracks[0]['section'] if tracks else 'unknown'
-                            if section not in section_stats:
-                                section_stats[section] = 0
-                            section_stats[section] += len(tracks)
-                        
-                        for section, count in section_stats.items():
-                            section_name = section.replace('_', ' ').title()
-                            stats += f"📱 {section_name}: {count} engagements\n"
-                        
-                        stats += f"\n🎯 **Task Breakdown:**\n"
-                        for task_id, tracks in sorted(task_tracking.items(), key=lambda x: len(x[1]), reverse=True)[:10]:
-                            section_name = tracks[0]['section'].replace('_', ' ').title() if tracks else 'Unknown'
-                            stats += f"🎯 **{task_id}** ({section_name}): {len(tracks)} engagements\n"
-                        
-                        if len(task_tracking) > 10:
-                            stats += f"... and {len(task_tracking) - 10} more tasks\n"
-                            
-                        stats += f"\n💡 Use `/taskstats task_id` for detailed analysis"
-                        bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
-                    else:
-                        bot.send_message(ADMIN_ID, "❌ No task tracking statistics available")
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
+        target_id, error = validate_user_id(parts[1])
+        if error:
+            bot.send_message(ADMIN_ID, error)
+            return
 
-        elif text.startswith("/message"):
-            try:
-                parts = text.split(' ', 2)
-                if len(parts) >= 3:
-                    target_id, error = validate_user_id(parts[1])
-                    if error:
-                        bot.reply_to(message, error)
-                        return
-
-                    message_text = parts[2]
-                    try:
-                        bot.send_message(target_id, f"📩 Admin Message:\n{message_text}")
-                        bot.reply_to(message, f"✅ Message sent to user {target_id}.")
-                    except Exception as e:
-                        bot.reply_to(message, f"⚠️ Error sending message: {str(e)}")
-                elif len(parts) == 2:
-                    target_id, error = validate_user_id(parts[1])
-                    if error:
-                        bot.reply_to(message, error)
-                        return
-
-                    awaiting_message[ADMIN_ID] = target_id
-                    bot.reply_to(message, f"✅ Now send the message for user {target_id}:")
-                else:
-                    bot.reply_to(message, "⚠️ Usage: /message user_id [message]")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
+        bal = user_balances.get(target_id, 0)
+        bot.send_message(ADMIN_ID, f"👤 User ID: {target_id}\n💰 Balance: ₹{bal:.2f}")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
 
-        elif text.startswith("/ban"):
-            try:
-                parts = text.split()
-                if len(parts) != 2:
-                    bot.reply_to(message, "⚠️ Usage: /ban user_id")
-                    return
+@admin_command("/addclienttask")
+def cmd_addclienttask(message, user_id, name, username, text):
+    """Create a client task with tracking links"""
+    try:
+        parts = text.split(' ', 2)
+        if len(parts) >= 3:
+            client_name = parts[1]
+            links_text = parts[2]
+            original_links = [link.strip() for link in links_text.split() if link.strip().startswith('http')]
+
+            if original_links:
+                client_id = generate_fixed_client_id()
+
+                storage.put('client_tasks', client_id, {
+                    'info': client_name,
+                    'links': original_links,
+                    'created_at': get_local_time(),
+                    'tracking_links': [],
+                    'auto_tracking': True
+                })
+
+                for i, original_link in enumerate(original_links):
+                    tracking_link = generate_client_tracking_link(client_id, f"link{i+1}")
+                    client_tasks[client_id]['tracking_links'].append(tracking_link)
+
+                    task_name = f"{client_name} - Link {i+1}"
+                    promotional_task = f"{task_name} - TRACKING:{client_id}_link{i+1} - ORIGINAL:{original_link}"
+                    task_sections['promotional'].append(promotional_task)
+
+                task_keyboards.invalidate('promotional')
+                save_data()
 
-                target_id, error = validate_user_id(parts[1])
-                if error:
-                    bot.send_message(ADMIN_ID, error)
-                    return
+                response = f"✅ **Client Task Created with Auto-Tracking!**\n\n"
+                response += f"🏷️ **Client ID:** {client_id}\n"
+                response += f"📋 **Client:** {client_name}\n"
+                response += f"📊 **Links:** {len(original_links)}\n"
+                response += f"🔄 **Auto-Tracking:** Enabled\n\n"
+                response += f"🔗 **Original Links:**\n"
+                for i, link in enumerate(original_links, 1):
+                    response += f"{i}. `{link}`\n"
+                response += f"\n🎯 **Tracking Links:**\n"
+                for i, tracking_link in enumerate(client_tasks[client_id]['tracking_links'], 1):
+                    response += f"{i}. `{tracking_link}`\n"
+
+                bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
+            else:
+                bot.send_message(ADMIN_ID, "❌ No valid links found.")
+        else:
+            bot.send_message(ADMIN_ID, "⚠️ Usage: /addclienttask client_name link1 link2")
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
 
-                if target_id == ADMIN_ID:
-                    bot.send_message(ADMIN_ID, "❌ Cannot ban admin!")
-                else:
-                    banned_users.add(target_id)
-                    save_data()
-                    print(f"🚫 User banned - ID: {target_id}")
-                    bot.send_message(ADMIN_ID, f"✅ User {target_id} has been banned.")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
+@admin_command("/tasks")
+def cmd_tasks(message, user_id, name, username, text):
+    """List tasks in every section"""
+    try:
+        markup = generate_admin_task_markup()
+
+        watch_ads_count = len(task_sections['watch_ads'])
+        app_downloads_count = len(task_sections['app_downloads'])
+        promotional_count = len(task_sections['promotional'])
+        client_tasks_count = len(client_tasks)
+
+        task_info = f"📋 **Admin Task Management Panel**\n\n"
+        task_info += f"📊 **Current Tasks:**\n"
+        task_info += f"📺 Watch Ads: {watch_ads_count}\n"
+        task_info += f"📱 App Downloads: {app_downloads_count}\n"
+        task_info += f"📢 Promotional: {promotional_count}\n"
+        task_info += f"🎯 Client Tasks: {client_tasks_count}\n\n"
+        task_info += f"🔧 **Choose an option below:**"
+
+        bot.send_message(ADMIN_ID, task_info, parse_mode="Markdown", reply_markup=markup)
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ **Error:** {str(e)}")
 
-        elif text.startswith("/unban"):
-            try:
-                parts = text.split()
-                if len(parts) != 2:
-                    bot.reply_to(message, "⚠️ Usage: /unban user_id")
-                    return
+@admin_command("/clientstats")
+def cmd_clientstats(message, user_id, name, username, text):
+    """Show client referral statistics"""
+    try:
+        parts = text.split()
+        if len(parts) > 1:
+            client_id = parts[1]
+            stats, markup = render_report_page('client', client_id)
+            if stats:
+                bot.send_message(ADMIN_ID, stats, parse_mode="Markdown", reply_markup=markup)
+            else:
+                bot.send_message(ADMIN_ID, f"❌ No data found for client {client_id}")
+        else:
+            if client_referrals:
+                stats = "🎯 **All Client Statistics:**\n\n"
+                for client_id, refs in client_referrals.items():
+                    client_task = client_tasks.get(client_id, {})
+                    client_name = client_task.get('info', f'Client {client_id}')
+                    stats += f"🏷️ **{client_name}** (ID: {client_id}): {len(refs)} completions\n"
+                stats += f"\n💡 Use /clientstats client_id for details"
+                bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
+            else:
+                bot.send_message(ADMIN_ID, "❌ No client statistics available")
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
 
-                target_id, error = validate_user_id(parts[1])
-                if error:
-                    bot.send_message(ADMIN_ID, error)
-                    return
+@admin_command("/taskstats")
+def cmd_taskstats(message, user_id, name, username, text):
+    """Show task tracking statistics"""
+    try:
+        parts = text.split()
+        if len(parts) > 1:
+            task_id = parts[1]
+            stats, markup = render_report_page('task', task_id)
+            if stats:
+                bot.send_message(ADMIN_ID, stats, parse_mode="Markdown", reply_markup=markup)
+            else:
+                bot.send_message(ADMIN_ID, f"❌ No tracking data found for task {task_id}")
+        else:
+            if task_tracking:
+                analytics_pool.submit('tasks', ADMIN_ID)
+            else:
+                bot.send_message(ADMIN_ID, "❌ No task tracking statistics available")
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
 
-                banned_users.discard(target_id)
-                save_data()
-                print(f"✅ User unbanned - ID: {target_id}")
-                bot.send_message(ADMIN_ID, f"✅ User {target_id} has been unbanned.")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
-
-        elif text == "/stats":
-            total_users = len(user_balances)
-            total_banned = len(banned_users)
-            total_active = total_users - total_banned
-            total_tasks = sum(len(tasks) for tasks in task_sections.values())
-            total_balance = sum(user_balances.values())
-            pending_withdrawals = len([req for req in withdrawal_requests.values() if req.get('status') == 'pending'])
-
-            stats_msg = f"📊 **Bot System Status Report:**\n\n"
-            stats_msg += f"👥 **Users:** {total_users} (Active: {total_active}, Banned: {total_banned})\n"
-            stats_msg += f"📋 **Tasks:** {total_tasks} (Client: {len(client_tasks)})\n"
-            stats_msg += f"💰 **Total Balance:** ₹{total_balance:.2f}\n"
-            stats_msg += f"📤 **Pending Withdrawals:** {pending_withdrawals}\n"
-            stats_msg += f"📊 **Referrals:** {len(referral_data)}\n"
-            stats_msg += f"🔄 **Auto-Save:** Active (10s interval)\n"
-            stats_msg += f"🎯 **Auto-Tracking:** Active\n"
-            stats_msg += f"⏰ **System Time:** {get_local_time()}\n"
-            stats_msg += f"💾 **Data Integrity:** ✅ Verified"
-
-            bot.send_message(ADMIN_ID, stats_msg, parse_mode="Markdown")
-
-        elif text.startswith("/notice"):
+@admin_command("/message")
+def cmd_message(message, user_id, name, username, text):
+    """Start a direct message to a user"""
+    try:
+        parts = text.split(' ', 2)
+        if len(parts) >= 3:
+            target_id, error = validate_user_id(parts[1])
+            if error:
+                bot.reply_to(message, error)
+                return
+
+            message_text = parts[2]
             try:
-                parts = text.split(' ', 1)
-                if len(parts) >= 2:
-                    notice_text = parts[1]
-
-                    sent_count = 0
-                    failed_count = 0
-
-                    for user_id in user_balances.keys():
-                        try:
-                            if user_id != ADMIN_ID:
-                                notice_message = f"📢 **NOTICE FROM ADMIN**\n\n{notice_text}\n\n📅 **Time:** {get_local_time()}"
-                                bot.send_message(user_id, notice_message, parse_mode="Markdown")
-                                sent_count += 1
-                        except Exception as e:
-                            failed_count += 1
-                            print(f"Failed to send notice to {user_id}: {e}")
-
-                    result_msg = f"✅ **Notice Sent Successfully!**\n\n📤 **Sent to:** {sent_count} users\n❌ **Failed:** {failed_count} users\n📝 **Message:** {notice_text[:100]}..."
-                    bot.send_message(ADMIN_ID, result_msg, parse_mode="Markdown")
-                else:
-                    awaiting_notice[ADMIN_ID] = True
-                    bot.reply_to(message, "📢 **Send Notice to All Users**\n\n📝 Send your notice message:")
+                bot.send_message(target_id, f"📩 Admin Message:\n{message_text}")
+                bot.reply_to(message, f"✅ Message sent to user {target_id}.")
             except Exception as e:
-                bot.reply_to(message, f"❌ **Error:** {str(e)}")
+                bot.reply_to(message, f"⚠️ Error sending message: {str(e)}")
+        elif len(parts) == 2:
+            target_id, error = validate_user_id(parts[1])
+            if error:
+                bot.reply_to(message, error)
+                return
 
-        elif text.startswith("/resetreferral"):
-            try:
-                parts = text.split()
-                if len(parts) != 2:
-                    bot.send_message(ADMIN_ID, "⚠️ Usage: /resetreferral user_id\n💡 This will allow user to refer again")
-                    return
+            set_state(ADMIN_ID, 'admin_message', target_id)
+            bot.reply_to(message, f"✅ Now send the message for user {target_id}:")
+        else:
+            bot.reply_to(message, "⚠️ Usage: /message user_id [message]")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
 
-                target_id, error = validate_user_id(parts[1])
-                if error:
-                    bot.send_message(ADMIN_ID, error)
-                    return
+@admin_command("/ban")
+def cmd_ban(message, user_id, name, username, text):
+    """Ban a user"""
+    try:
+        parts = text.split()
+        if len(parts) != 2:
+            bot.reply_to(message, "⚠️ Usage: /ban user_id")
+            return
 
-                # Remove from referral_data to allow re-referral
-                if target_id in referral_data:
-                    old_referrer = referral_data[target_id]
-                    del referral_data[target_id]
-                    save_data()
-                    bot.send_message(ADMIN_ID, f"✅ **Referral Reset Complete!**\n\n👤 **User ID:** {target_id}\n🔄 **Previous Referrer:** {old_referrer}\n✅ **Status:** Can now be referred again")
+        target_id, error = validate_user_id(parts[1])
+        if error:
+            bot.send_message(ADMIN_ID, error)
+            return
 
-                    try:
-                        bot.send_message(target_id, "🔄 **Referral Status Reset!**\n\n✅ You can now use referral links again!\n💰 Get ₹5 bonus when someone refers you", parse_mode="Markdown")
-                    except:
-                        pass
-                else:
-                    bot.send_message(ADMIN_ID, f"ℹ️ User {target_id} has not been referred yet or already reset.")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
+        if target_id == ADMIN_ID:
+            bot.send_message(ADMIN_ID, "❌ Cannot ban admin!")
+        else:
+            banned_users.add(target_id)
+            save_data()
+            print(f"🚫 User banned - ID: {target_id}")
+            bot.send_message(ADMIN_ID, f"✅ User {target_id} has been banned.")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
 
-        elif text.startswith("/referralstats"):
-            try:
-                if referral_data:
-                    stats = "👥 **All Referral Statistics:**\n\n"
-                    referrer_counts = {}
+@admin_command("/unban")
+def cmd_unban(message, user_id, name, username, text):
+    """Unban a user"""
+    try:
+        parts = text.split()
+        if len(parts) != 2:
+            bot.reply_to(message, "⚠️ Usage: /unban user_id")
+            return
 
-                    for referred_user, referrer in referral_data.items():
-                        referrer_counts[referrer] = referrer_counts.get(referrer, 0) + 1
+        target_id, error = validate_user_id(parts[1])
+        if error:
+            bot.send_message(ADMIN_ID, error)
+            return
 
-                    stats += "📊 **Referrers (Top performers):**\n"
-                    for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True):
-                        earnings = count * 5
-                        stats += f"👤 **User {referrer}:** {count} referrals (₹{earnings} earned)\n"
+        banned_users.discard(target_id)
+        save_data()
+        print(f"✅ User unbanned - ID: {target_id}")
+        bot.send_message(ADMIN_ID, f"✅ User {target_id} has been unbanned.")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
+
+@admin_command("/stats")
+def cmd_stats(message, user_id, name, username, text):
+    """Show bot statistics"""
+    total_users = len(user_balances)
+    total_banned = len(banned_users)
+    total_active = total_users - total_banned
+    total_tasks = sum(len(tasks) for tasks in task_sections.values())
+    total_balance = sum(user_balances.values())
+    pending_withdrawals = len([req for req in withdrawal_requests.values() if req.get('status') == 'pending'])
+
+    stats_msg = f"📊 **Bot System Status Report:**\n\n"
+    stats_msg += f"👥 **Users:** {total_users} (Active: {total_active}, Banned: {total_banned})\n"
+    stats_msg += f"📋 **Tasks:** {total_tasks} (Client: {len(client_tasks)})\n"
+    stats_msg += f"💰 **Total Balance:** ₹{total_balance:.2f}\n"
+    stats_msg += f"📤 **Pending Withdrawals:** {pending_withdrawals}\n"
+    stats_msg += f"📸 **Pending Proofs:** {len(proof_submissions)}\n"
+    stats_msg += f"📒 **Ledger:** {ledger.seq} entries (Duplicates blocked: {ledger.duplicates})\n"
+    if shared_state:
+        stats_msg += f"🗄 **Shared State:** {SHARED_STATE_URL} (Overdrafts refused: {ledger.overdrawn})\n"
+    stats_msg += f"📨 **Notification Queue:** {notification_sender.backlog()} (Sent: {notification_sender.sent})\n"
+    stats_msg += f"🚦 **Flood Guard:** {flood_guard.summary()}\n"
+    stats_msg += f"🧮 **Reports:** {analytics_pool.summary()}\n"
+    stats_msg += f"🔁 **Updates:** processed through {update_tracker.processed_id} (In flight: {len(update_tracker.in_flight)}, Duplicates dropped: {update_tracker.duplicates})\n"
+    stats_msg += f"📊 **Referrals:** {len(referral_data)}\n"
+    stats_msg += f"👤 **Profile Cache:** {len(user_profiles.entries)} users ({user_profiles.hit_rate():.0f}% hits)\n"
+    stats_msg += f"⌨️ **Task Keyboards:** {len(task_keyboards.templates)} cached ({task_keyboards.builds} builds / {task_keyboards.renders} renders)\n"
+    stats_msg += f"💬 **Conversations:** {len(conversation_store.entries)} active, {len(proof_waiters.entries)} awaiting proof (Expired: {conversation_store.expired}, Evicted: {conversation_store.evicted})\n"
+    stats_msg += f"🔄 **Auto-Save:** Active (10s interval)\n"
+    if isinstance(bot, LanedTeleBot):
+        stats_msg += f"🛣️ **Update Lanes:** {len(bot.lane_queues)} (Backlog: {sum(bot.lane_backlog())})\n"
+    else:
+        stats_msg += f"⚡ **Engine:** asyncio ({len(bot.chat_tails)} chats in flight)\n"
+    stats_msg += f"🎯 **Auto-Tracking:** Active\n"
+    stats_msg += f"⏰ **System Time:** {get_local_time()}\n"
+    stats_msg += f"💾 **Data Integrity:** ✅ Verified"
+
+    bot.send_message(ADMIN_ID, stats_msg, parse_mode="Markdown")
+
+@admin_command("/transport")
+def cmd_transport(message, user_id, name, username, text):
+    """Show Telegram transport metrics"""
+    bot.send_message(ADMIN_ID, f"📡 Telegram API Transport\n\n{telegram_transport.report()}")
+
+@admin_command("/routes")
+def cmd_routes(message, user_id, name, username, text):
+    """Show callback route metrics"""
+    bot.send_message(ADMIN_ID, f"🧭 Callback Routes\n\n{callback_router.report()}")
+
+@admin_command("/export")
+def cmd_export(message, user_id, name, username, text):
+    """Queue a gzip CSV/NDJSON export of a dataset"""
+    parts = text.split()
+    dataset = parts[1].lower() if len(parts) > 1 else ""
+    fmt = parts[2].lower() if len(parts) > 2 else 'csv'
+    if dataset not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+        bot.send_message(ADMIN_ID, f"⚠️ Usage: /export dataset [csv|ndjson]\n📦 Datasets: {', '.join(EXPORT_FIELDS)}")
+        return
 
-                    stats += f"\n📈 **Total Referrals:** {len(referral_data)}\n"
-                    stats += f"💰 **Total Bonus Paid:** ₹{len(referral_data) * 10} (₹5 each to referrer & new user)\n"
-                    stats += f"\n💡 **Commands:**\n"
-                    stats += f"• `/resetreferral user_id` - Reset user's referral status\n"
-                    stats += f"• `/referralstats` - View this statistics"
+    position = export_worker.submit(dataset, fmt, ADMIN_ID)
+    bot.send_message(ADMIN_ID, f"⏳ Export of {dataset} ({fmt}.gz) queued (position {position}). The file will be sent when ready.")
+
+@admin_command("/proofs")
+def cmd_proofs(message, user_id, name, username, text):
+    """Review pending proof screenshots a page at a time"""
+    send_proof_page(ADMIN_ID)
+
+@admin_command("/withdrawals")
+def cmd_withdrawals(message, user_id, name, username, text):
+    """Open the pending-withdrawal console"""
+    console = {'page': [], 'selected': set()}
+    console_text, markup = render_withdrawal_console(0, console)
+    sent = bot.send_message(ADMIN_ID, console_text, reply_markup=markup, parse_mode="Markdown")
+    withdrawal_console(sent.message_id).update(console)
+
+@admin_command("/statement")
+def cmd_statement(message, user_id, name, username, text):
+    """Show a user's recent ledger entries"""
+    parts = text.split()
+    if len(parts) < 2:
+        bot.send_message(ADMIN_ID, "⚠️ Usage: /statement user_id [count]")
+        return
+    target_id, error = validate_user_id(parts[1])
+    if error:
+        bot.send_message(ADMIN_ID, error)
+        return
+    limit = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 20
+
+    entries, total = ledger.statement(target_id, min(limit, 50))
+    statement = f"📒 Statement for {target_id}\n💰 Balance: ₹{user_balances.get(target_id, 0):.2f}\n🧾 Entries: {total}\n\n"
+    if not entries:
+        statement += "No ledger entries yet."
+    for entry in reversed(entries):
+        statement += f"#{entry['seq']} {entry['at']} {entry['kind']} {entry['paise'] / 100:+.2f}\n"
+    bot.send_message(ADMIN_ID, statement)
+
+@admin_command("/notice")
+def cmd_notice(message, user_id, name, username, text):
+    """Start a notice broadcast"""
+    try:
+        parts = text.split(' ', 1)
+        if len(parts) >= 2:
+            notice_text = parts[1]
 
-                    bot.send_message(ADMIN_ID, stats, parse_mode="Markdown")
-                else:
-                    bot.send_message(ADMIN_ID, "📊 **No Referral Data Available**\n\n💡 Referrals will appear here once users start using referral links.")
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
+            sent_count = 0
+            failed_count = 0
 
-        # Handle client data setup through interactive mode
-        elif user_id in awaiting_client_data:
-            try:
-                data_type = awaiting_client_data[user_id]
+            for user_id in user_balances.keys():
+                try:
+                    if user_id != ADMIN_ID:
+                        notice_message = f"📢 **NOTICE FROM ADMIN**\n\n{notice_text}\n\n📅 **Time:** {get_local_time()}"
+                        bot.send_message(user_id, notice_message, parse_mode="Markdown")
+                        sent_count += 1
+                except Exception as e:
+                    failed_count += 1
+                    print(f"Failed to send notice to {user_id}: {e}")
 
-                if data_type == 'client_name':
-                    awaiting_client_data[user_id] = {'step': 'links', 'client_name': text.strip()}
-                    bot.send_message(ADMIN_ID, f"✅ **Client Name:** {text.strip()}\n\n📝 **Now send the links** (space separated):\n\n💡 **Example:**\n`https://example1.com https://example2.com`")
-                    return
+            result_msg = f"✅ **Notice Sent Successfully!**\n\n📤 **Sent to:** {sent_count} users\n❌ **Failed:** {failed_count} users\n📝 **Message:** {notice_text[:100]}..."
+            bot.send_message(ADMIN_ID, result_msg, parse_mode="Markdown")
+        else:
+            set_state(ADMIN_ID, 'notice')
+            bot.reply_to(message, "📢 **Send Notice to All Users**\n\n📝 Send your notice message:")
+    except Exception as e:
+        bot.reply_to(message, f"❌ **Error:** {str(e)}")
 
-                elif isinstance(awaiting_client_data[user_id], dict) and awaiting_client_data[user_id].get('step') == 'links':
-                    client_name = awaiting_client_data[user_id]['client_name']
-                    links_text = text.strip()
-                    original_links = [link.strip() for link in links_text.split() if link.strip().startswith('http')]
-
-                    if original_links:
-                        client_id = generate_fixed_client_id()
-
-                        client_tasks[client_id] = {
-                            'info': client_name,
-                            'links': original_links,
-                            'created_at': get_local_time(),
-                            'tracking_links': [],
-                            'auto_tracking': True
-                        }
-
-                        for i, original_link in enumerate(original_links):
-                            tracking_link = generate_client_tracking_link(client_id, f"link{i+1}")
-                            client_tasks[client_id]['tracking_links'].append(tracking_link)
-
-                            task_name = f"{client_name} - Link {i+1}"
-                            promotional_task = f"{task_name} - TRACKING:{client_id}_link{i+1} - ORIGINAL:{original_link}"
-                            task_sections['promotional'].append(promotional_task)
-
-                        save_data()
-
-                        response = f"🎉 **Client Task Successfully Created with Auto-Tracking!**\n\n"
-                        response += f"🏷️ **Client ID:** {client_id}\n"
-                        response += f"📋 **Client:** {client_name}\n"
-                        response += f"📊 **Links Added:** {len(original_links)}\n"
-                        response += f"🔄 **Auto-Tracking:** Enabled\n\n"
-                        response += f"🔗 **Original Links:**\n"
-                        for i, link in enumerate(original_links, 1):
-                            response += f"{i}. `{link}`\n"
-                        response += f"\n🎯 **Tracking Links:**\n"
-                        for i, tracking_link in enumerate(client_tasks[client_id]['tracking_links'], 1):
-                            response += f"{i}. `{tracking_link}`\n"
-                        response += f"\n✅ **Automatically added to Promotional Tasks**"
-
-                        bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
-                        awaiting_client_data.pop(user_id, None)
-                    else:
-                        bot.send_message(ADMIN_ID, "❌ **No valid links found!**\n\n💡 Please send valid HTTP/HTTPS links separated by spaces.")
-                        return
-
-                elif data_type == 'simple_add_link':
-                    new_link = text.strip()
-
-                    if new_link.startswith('http'):
-                        client_id = generate_fixed_client_id()
-                        client_name = f"Client {client_id}"
-
-                        client_tasks[client_id] = {
-                            'info': client_name,
-                            'links': [new_link],
-                            'created_at': get_local_time(),
-                            'tracking_links': [],
-                            'auto_tracking': True
-                        }
-
-                        tracking_link = generate_client_tracking_link(client_id, "link1")
-                        client_tasks[client_id]['tracking_links'].append(tracking_link)
-
-                        task_name = f"{client_name} - Link 1"
-                        promotional_task = f"{task_name} - TRACKING:{client_id}_link1 - ORIGINAL:{new_link}"
-                        task_sections['promotional'].append(promotional_task)
-
-                        save_data()
-
-                        response = f"🎉 **Client Task Link Added Successfully!**\n\n"
-                        response += f"🏷️ **Auto Client ID:** {client_id}\n"
-                        response += f"🔗 **Original Link:** {new_link}\n"
-                        response += f"🎯 **Tracking Link:** `{tracking_link}`\n\n"
-                        response += f"✅ **Auto-completed:**\n"
-                        response += f"📢 Added to Promotional Tasks\n"
-                        response += f"🔄 Real-time tracking enabled\n"
-                        response += f"🚨 Admin notifications active\n\n"
-                        response += f"💾 **Data saved automatically**"
-
-                        bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
-                        awaiting_client_data.pop(user_id, None)
-                    else:
-                        bot.send_message(ADMIN_ID, "❌ **Invalid link format!**\n\n💡 Please send a valid HTTP/HTTPS link starting with http:// or https://")
-                        return
+@admin_command("/resetreferral")
+def cmd_resetreferral(message, user_id, name, username, text):
+    """Reset referral status for a user"""
+    try:
+        parts = text.split()
+        if len(parts) != 2:
+            bot.send_message(ADMIN_ID, "⚠️ Usage: /resetreferral user_id\n💡 This will allow user to refer again")
+            return
 
-            except Exception as e:
-                bot.send_message(ADMIN_ID, f"❌ **Error setting up client task:** {str(e)}")
-                awaiting_client_data.pop(user_id, None)
+        target_id, error = validate_user_id(parts[1])
+        if error:
+            bot.send_message(ADMIN_ID, error)
+            return
 
-        # Handle admin message sending
-        elif ADMIN_ID in awaiting_message:
-            target_id = awaiting_message[ADMIN_ID]
-            try:
-                bot.send_message(target_id, f"📩 Admin Message:\n{text}")
-                bot.reply_to(message, "✅ Message sent.")
-            except Exception as e:
-                bot.reply_to(message, f"⚠️ Error: {str(e)}")
-            awaiting_message.pop(ADMIN_ID, None)
+        # Remove from referral_data to allow re-referral
+        if target_id in referral_data:
+            old_referrer = referral_data[target_id]
+            with transaction(target_id) as tx:
+                tx.pop('referral_data', target_id)
+            bot.send_message(ADMIN_ID, f"✅ **Referral Reset Complete!**\n\n👤 **User ID:** {target_id}\n🔄 **Previous Referrer:** {old_referrer}\n✅ **Status:** Can now be referred again")
 
-        # Handle referral reset
-        elif ADMIN_ID in awaiting_referral_reset:
             try:
-                target_id, error = validate_user_id(text.strip())
-                if error:
-                    bot.reply_to(message, error)
-                    return
+                bot.send_message(target_id, "🔄 **Referral Status Reset!**\n\n✅ You can now use referral links again!\n💰 Get ₹5 bonus when someone refers you", parse_mode="Markdown")
+            except:
+                pass
+        else:
+            bot.send_message(ADMIN_ID, f"ℹ️ User {target_id} has not been referred yet or already reset.")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
 
-                # Remove from referral_data to allow re-referral
-                if target_id in referral_data:
-                    old_referrer = referral_data[target_id]
-                    del referral_data[target_id]
-                    save_data()
+@admin_command("/referralstats")
+def cmd_referralstats(message, user_id, name, username, text):
+    """Show referral statistics"""
+    try:
+        if referral_data:
+            analytics_pool.submit('referrals', ADMIN_ID)
+        else:
+            bot.send_message(ADMIN_ID, "📊 **No Referral Data Available**\n\n💡 Referrals will appear here once users start using referral links.")
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ Error: {str(e)}")
 
-                    result_msg = f"✅ **Referral Reset Complete!**\n\n👤 **User ID:** {target_id}\n🔄 **Previous Referrer:** {old_referrer}\n✅ **Status:** Can now be referred again"
-                    bot.reply_to(message, result_msg, parse_mode="Markdown")
+# ✅ CONVERSATION STATE HANDLERS
 
-                    try:
-                        bot.send_message(target_id, "🔄 **Referral Status Reset!**\n\n✅ You can now use referral links again!\n💰 Get ₹5 bonus when someone refers you", parse_mode="Markdown")
-                    except:
-                        pass
-                else:
-                    bot.reply_to(message, f"ℹ️ User {target_id} has not been referred yet or already reset.")
+@state_handler('client_data', admin_only=True)
+def state_client_data(message, user_id, name, username, text, payload):
+    """Collect client name and links for a new client task"""
+    try:
+        data_type = payload
 
-                awaiting_referral_reset.pop(ADMIN_ID, None)
-            except Exception as e:
-                bot.reply_to(message, f"❌ **Error:** {str(e)}")
-                awaiting_referral_reset.pop(ADMIN_ID, None)
+        if data_type == 'client_name':
+            set_state(user_id, 'client_data', {'step': 'links', 'client_name': text.strip()})
+            bot.send_message(ADMIN_ID, f"✅ **Client Name:** {text.strip()}\n\n📝 **Now send the links** (space separated):\n\n💡 **Example:**\n`https://example1.com https://example2.com`")
+            return
 
-        # Handle notice sending
-        elif ADMIN_ID in awaiting_notice:
-            try:
-                notice_text = text.strip()
+        elif isinstance(data_type, dict) and data_type.get('step') == 'links':
+            client_name = data_type['client_name']
+            links_text = text.strip()
+            original_links = [link.strip() for link in links_text.split() if link.strip().startswith('http')]
 
-                sent_count = 0
-                failed_count = 0
+            if original_links:
+                client_id = generate_fixed_client_id()
 
-                for user_id in user_balances.keys():
-                    try:
-                        if user_id != ADMIN_ID:
-                            notice_message = f"📢 **NOTICE FROM ADMIN**\n\n{notice_text}\n\n📅 **Time:** {get_local_time()}"
-                            bot.send_message(user_id, notice_message, parse_mode="Markdown")
-                            sent_count += 1
-                    except Exception as e:
-                        failed_count += 1
-                        print(f"Failed to send notice to {user_id}: {e}")
-
-                result_msg = f"✅ **Notice Sent Successfully!**\n\n📤 **Sent to:** {sent_count} users\n❌ **Failed:** {failed_count} users\n📝 **Message:** {notice_text[:100]}..."
-                if len(notice_text) > 100:
-                    result_msg += "..."
-
-                bot.reply_to(message, result_msg, parse_mode="Markdown")
-                awaiting_notice.pop(ADMIN_ID, None)
-            except Exception as e:
-                bot.reply_to(message, f"❌ **Error sending notice:** {str(e)}")
-                awaiting_notice.pop(ADMIN_ID, None)
-
-        # Handle task addition
-        elif user_id in awaiting_task_add:
-            section = awaiting_task_add[user_id]
-            if section in task_sections:
-                task_sections[section].append(text)
+                storage.put('client_tasks', client_id, {
+                    'info': client_name,
+                    'links': original_links,
+                    'created_at': get_local_time(),
+                    'tracking_links': [],
+                    'auto_tracking': True
+                })
+
+                for i, original_link in enumerate(original_links):
+                    tracking_link = generate_client_tracking_link(client_id, f"link{i+1}")
+                    client_tasks[client_id]['tracking_links'].append(tracking_link)
+
+                    task_name = f"{client_name} - Link {i+1}"
+                    promotional_task = f"{task_name} - TRACKING:{client_id}_link{i+1} - ORIGINAL:{original_link}"
+                    task_sections['promotional'].append(promotional_task)
+
+                task_keyboards.invalidate('promotional')
                 save_data()
-                bot.reply_to(message, f"✅ Task added to {section.replace('_', ' ').title()} section with auto-tracking enabled.")
+
+                response = f"🎉 **Client Task Successfully Created with Auto-Tracking!**\n\n"
+                response += f"🏷️ **Client ID:** {client_id}\n"
+                response += f"📋 **Client:** {client_name}\n"
+                response += f"📊 **Links Added:** {len(original_links)}\n"
+                response += f"🔄 **Auto-Tracking:** Enabled\n\n"
+                response += f"🔗 **Original Links:**\n"
+                for i, link in enumerate(original_links, 1):
+                    response += f"{i}. `{link}`\n"
+                response += f"\n🎯 **Tracking Links:**\n"
+                for i, tracking_link in enumerate(client_tasks[client_id]['tracking_links'], 1):
+                    response += f"{i}. `{tracking_link}`\n"
+                response += f"\n✅ **Automatically added to Promotional Tasks**"
+
+                bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
+                clear_state(user_id)
             else:
-                bot.reply_to(message, f"❌ Invalid section: {section}")
-            awaiting_task_add.pop(user_id, None)
+                bot.send_message(ADMIN_ID, "❌ **No valid links found!**\n\n💡 Please send valid HTTP/HTTPS links separated by spaces.")
+                return
 
-    # ✅ Support Message Handling
-    if user_id in awaiting_support_message:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🆘 *Support Message*\n👤 Name: {name}\n🔗 Username: @{username}\n🆔 ID: {user_id}\n💬 Message:\n{text}",
-                parse_mode="Markdown"
-            )
-            bot.reply_to(message, "✅ Your message has been sent to support team.")
-        except Exception as e:
-            bot.reply_to(message, "❌ Error sending support message.")
-            print(f"Support message error: {e}")
-        awaiting_support_message.pop(user_id, None)
-        return
+        elif data_type == 'simple_add_link':
+            new_link = text.strip()
 
-    # ✅ Promotion Message Handling
-    if user_id in awaiting_promotion_message:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"📢 *Promotion Request*\n👤 Name: {name}\n🔗 Username: @{username}\n🆔 ID: {user_id}\n💬 Message:\n{text}",
-                parse_mode="Markdown"
-            )
-            bot.reply_to(message, "✅ Your promotion request has been sent to admin.")
-        except Exception as e:
-            bot.reply_to(message, "❌ Error sending promotion request.")
-            print(f"Promotion message error: {e}")
-        awaiting_promotion_message.pop(user_id, None)
-        return
+            if new_link.startswith('http'):
+                client_id = generate_fixed_client_id()
+                client_name = f"Client {client_id}"
 
-    # ✅ Enhanced Withdraw Logic with Admin Approval
-    if user_id in awaiting_withdraw:
-        withdraw_type = awaiting_withdraw[user_id]
-        try:
-            parts = text.split()
-            if len(parts) >= 2:
-                payment_id = parts[0]
-                amount, error = validate_amount(parts[1])
-                if error:
-                    bot.reply_to(message, error)
-                    return
+                storage.put('client_tasks', client_id, {
+                    'info': client_name,
+                    'links': [new_link],
+                    'created_at': get_local_time(),
+                    'tracking_links': [],
+                    'auto_tracking': True
+                })
 
-                balance = user_balances.get(user_id, 0)
+                tracking_link = generate_client_tracking_link(client_id, "link1")
+                client_tasks[client_id]['tracking_links'].append(tracking_link)
 
-                # Check minimum limits
-                min_limits = {
-                    'upi': 15,
-                    'amazon': 15,
-                    'googleplay': 15,
-                    'paypal': 2
-                }
+                task_name = f"{client_name} - Link 1"
+                promotional_task = f"{task_name} - TRACKING:{client_id}_link1 - ORIGINAL:{new_link}"
+                task_sections['promotional'].append(promotional_task)
 
-                min_amount = min_limits.get(withdraw_type, 15)
-                if amount < min_amount:
-                    currency = "USD" if withdraw_type == 'paypal' else "₹"
-                    bot.reply_to(message, f"❌ **Minimum Amount Required**\n\n💳 Minimum: {currency}{min_amount}\n📝 Your request: {currency}{amount}")
-                    return
+                task_keyboards.invalidate('promotional')
+                save_data()
 
-                # PayPal with 7% Tax
-                if withdraw_type == 'paypal':
-                    inr_amount = amount * 83
-                    if inr_amount > balance:
-                        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Required: ₹{inr_amount:.2f} (${amount})\n💳 Your Balance: ₹{balance:.2f}")
-                        return
-
-                    tax_rate = 0.07
-                    tax_amount_usd = amount * tax_rate
-                    final_amount_usd = amount - tax_amount_usd
-
-                    # Store withdrawal request
-                    withdrawal_requests[user_id] = {
-                        'type': 'paypal',
-                        'payment_id': payment_id,
-                        'amount': amount,
-                        'final_amount': final_amount_usd,
-                        'inr_amount': inr_amount,
-                        'tax_amount': tax_amount_usd,
-                        'timestamp': get_local_time(),
-                        'status': 'pending'
-                    }
-
-                    user_balances[user_id] -= inr_amount
-                    save_data()
-
-                    bot.reply_to(message, f"✅ **PayPal Withdrawal Request Submitted**\n\n💰 **Amount:** ${amount} (₹{inr_amount:.2f})\n🏛️ **Tax (7%):** ${tax_amount_usd:.2f}\n📊 **Final Amount:** ${final_amount_usd:.2f}\n⏳ **Status:** Pending admin approval\n🕐 **Processing:** 24-48 hours", parse_mode="Markdown")
-
-                    bot.send_message(
-                        ADMIN_ID,
-                        f"📤 **PayPal Withdrawal Request**\n\n👤 **User:** {name}\n🆔 **ID:** {user_id}\n🌐 **PayPal:** `{payment_id}`\n💰 **Final Amount:** ${final_amount_usd:.2f} USD\n💱 **INR:** ₹{inr_amount:.2f}\n🏛️ **Tax (7%):** ${tax_amount_usd:.2f} USD\n📱 **Contact:** @{username}",
-                        parse_mode="Markdown",
-                        reply_markup=generate_withdrawal_approval_markup(user_id)
-                    )
+                response = f"🎉 **Client Task Link Added Successfully!**\n\n"
+                response += f"🏷️ **Auto Client ID:** {client_id}\n"
+                response += f"🔗 **Original Link:** {new_link}\n"
+                response += f"🎯 **Tracking Link:** `{tracking_link}`\n\n"
+                response += f"✅ **Auto-completed:**\n"
+                response += f"📢 Added to Promotional Tasks\n"
+                response += f"🔄 Real-time tracking enabled\n"
+                response += f"🚨 Admin notifications active\n\n"
+                response += f"💾 **Data saved automatically**"
+
+                bot.send_message(ADMIN_ID, response, parse_mode="Markdown")
+                clear_state(user_id)
+            else:
+                bot.send_message(ADMIN_ID, "❌ **Invalid link format!**\n\n💡 Please send a valid HTTP/HTTPS link starting with http:// or https://")
+                return
 
-                else:
-                    # For INR-based withdrawals - 2% fee
-                    if amount > balance:
-                        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Required: ₹{amount}\n💳 Your Balance: ₹{balance:.2f}")
-                        return
-
-                    fee_rate = 0.02
-                    fee_amount = amount * fee_rate
-                    final_amount = amount - fee_amount
-
-                    # Store withdrawal request
-                    withdrawal_requests[user_id] = {
-                        'type': withdraw_type,
-                        'payment_id': payment_id,
-                        'amount': amount,
-                        'final_amount': final_amount,
-                        'fee_amount': fee_amount,
-                        'timestamp': get_local_time(),
-                        'status': 'pending'
-                    }
-
-                    user_balances[user_id] -= amount
-                    save_data()
-
-                    method_names = {
-                        'upi': 'UPI',
-                        'amazon': 'Amazon Pay',
-                        'googleplay': 'Google Play Gift Card'
-                    }
-
-                    method_name = method_names.get(withdraw_type, withdraw_type.upper())
-                    bot.reply_to(message, f"✅ **{method_name} Withdrawal Request**\n\n💳 **Payment ID:** {payment_id}\n💰 **Amount:** ₹{amount}\n📊 **After 2% Fee:** ₹{final_amount:.2f}\n⏳ **Status:** Pending admin approval", parse_mode="Markdown")
-
-                    bot.send_message(
-                        ADMIN_ID,
-                        f"📤 **{method_name} Withdrawal**\n\n👤 **User:** {name}\n🆔 **ID:** {user_id}\n💳 **Payment ID:** `{payment_id}`\n💰 **Amount:** ₹{final_amount:.2f}\n📱 **Contact:** @{username}",
-                        parse_mode="Markdown",
-                        reply_markup=generate_withdrawal_approval_markup(user_id)
-                    )
+    except Exception as e:
+        bot.send_message(ADMIN_ID, f"❌ **Error setting up client task:** {str(e)}")
+        clear_state(user_id)
 
-            else:
-                # Format help
-                if withdraw_type == 'upi':
-                    bot.reply_to(message, "⚠️ **Format:** `upi@bank 50`\n💡 **Example:** `yourname@paytm 100`", parse_mode="Markdown")
-                elif withdraw_type == 'paypal':
-                    bot.reply_to(message, "⚠️ **Format:** `email@gmail.com 5`\n💡 **Example:** `john@gmail.com 10`\n💱 **Note:** Amount in USD", parse_mode="Markdown")
-                elif withdraw_type == 'amazon':
-                    bot.reply_to(message, "⚠️ **Format:** `9876543210 50`\n💡 **Example:** `9876543210 100`", parse_mode="Markdown")
-                elif withdraw_type == 'googleplay':
-                    bot.reply_to(message, "⚠️ **Format:** `email@gmail.com 50`\n💡 **Example:** `john@gmail.com 100`", parse_mode="Markdown")
+@state_handler('admin_message', admin_only=True)
+def state_admin_message(message, user_id, name, username, text, payload):
+    """Deliver an admin message to the selected user"""
+    target_id = payload
+    try:
+        bot.send_message(target_id, f"📩 Admin Message:\n{text}")
+        bot.reply_to(message, "✅ Message sent.")
+    except Exception as e:
+        bot.reply_to(message, f"⚠️ Error: {str(e)}")
+    clear_state(ADMIN_ID)
 
-        except Exception as e:
-            bot.reply_to(message, "⚠️ **Error Processing Request**\n\nPlease try again.", parse_mode="Markdown")
-            print(f"Withdrawal error: {e}")
+@state_handler('referral_reset', admin_only=True)
+def state_referral_reset(message, user_id, name, username, text, payload):
+    """Reset referral status for the entered user ID"""
+    try:
+        target_id, error = validate_user_id(text.strip())
+        if error:
+            bot.reply_to(message, error)
+            return
 
-        awaiting_withdraw.pop(user_id, None)
-        return
+        # Remove from referral_data to allow re-referral
+        if target_id in referral_data:
+            old_referrer = referral_data[target_id]
+            with transaction(target_id) as tx:
+                tx.pop('referral_data', target_id)
 
-    # ✅ Main Menu Options
-    if text == "📋 Task":
-        notify_admin_user_action(user_id, name, username, "📋 Task Menu Accessed")
-        bot.send_message(message.chat.id, "📝 Choose a task category:", reply_markup=generate_task_markup())
+            result_msg = f"✅ **Referral Reset Complete!**\n\n👤 **User ID:** {target_id}\n🔄 **Previous Referrer:** {old_referrer}\n✅ **Status:** Can now be referred again"
+            bot.reply_to(message, result_msg, parse_mode="Markdown")
 
-    elif text == "📺 Watch Ads":
-        notify_admin_user_action(user_id, name, username, "📺 Watch Ads Section", f"Tasks Available: {len(task_sections['watch_ads'])}")
-        if task_sections['watch_ads']:
-            markup = types.InlineKeyboardMarkup()
-            for i, task in enumerate(task_sections['watch_ads']):
-                # Check if user has completed this task
-                user_completed = completed_tasks.get(user_id, set())
-                task_key = f"watch_ads_{i}"
+            try:
+                bot.send_message(target_id, "🔄 **Referral Status Reset!**\n\n✅ You can now use referral links again!\n💰 Get ₹5 bonus when someone refers you", parse_mode="Markdown")
+            except:
+                pass
+        else:
+            bot.reply_to(message, f"ℹ️ User {target_id} has not been referred yet or already reset.")
 
-                task_parts = task.split(" - ")
-                task_name = task_parts[0] if task_parts else task[:35]
-                reward = extract_reward_from_task(task)
+        clear_state(ADMIN_ID)
+    except Exception as e:
+        bot.reply_to(message, f"❌ **Error:** {str(e)}")
+        clear_state(ADMIN_ID)
 
-                if task_key in user_completed:
-                    button_text = f"✅ {task_name[:20]}... (₹{reward}) - DONE"
-                else:
-                    button_text = f"📺 {task_name[:25]}... (₹{reward})" if reward > 0 else f"📺 {task_name[:35]}..."
+@state_handler('notice', admin_only=True)
+def state_notice(message, user_id, name, username, text, payload):
+    """Broadcast the entered notice to all users"""
+    try:
+        notice_text = text.strip()
 
-                markup.add(types.InlineKeyboardButton(button_text, callback_data=f"complete_watch_ads_{i}"))
-            bot.send_message(message.chat.id, "📺 Available Watch Ads Tasks:\n\n🔒 Limited - Each task can be done only once!\n🔄 Auto-Tracking: Active", reply_markup=markup)
-        else:
-            bot.reply_to(message, "📺 No watch ads tasks available.")
+        sent_count = 0
+        failed_count = 0
 
-    elif text == "📱 App Download":
-        notify_admin_user_action(user_id, name, username, "📱 App Download Section", f"Tasks Available: {len(task_sections['app_downloads'])}")
-        if task_sections['app_downloads']:
-            markup = types.InlineKeyboardMarkup()
-            for i, task in enumerate(task_sections['app_downloads']):
-                user_completed = completed_tasks.get(user_id, set())
-                task_key = f"app_downloads_{i}"
+        for user_id in user_balances.keys():
+            try:
+                if user_id != ADMIN_ID:
+                    notice_message = f"📢 **NOTICE FROM ADMIN**\n\n{notice_text}\n\n📅 **Time:** {get_local_time()}"
+                    bot.send_message(user_id, notice_message, parse_mode="Markdown")
+                    sent_count += 1
+            except Exception as e:
+                failed_count += 1
+                print(f"Failed to send notice to {user_id}: {e}")
 
-                task_parts = task.split(" - ")
-                task_name = task_parts[0] if task_parts else task[:35]
-                reward = extract_reward_from_task(task)
+        result_msg = f"✅ **Notice Sent Successfully!**\n\n📤 **Sent to:** {sent_count} users\n❌ **Failed:** {failed_count} users\n📝 **Message:** {notice_text[:100]}..."
+        if len(notice_text) > 100:
+            result_msg += "..."
 
-                if task_key in user_completed:
-                    button_text = f"✅ {task_name[:20]}... (₹{reward}) - DONE"
-                else:
-                    button_text = f"📱 {task_name[:25]}... (₹{reward})" if reward > 0 else f"📱 {task_name[:35]}..."
+        bot.reply_to(message, result_msg, parse_mode="Markdown")
+        clear_state(ADMIN_ID)
+    except Exception as e:
+        bot.reply_to(message, f"❌ **Error sending notice:** {str(e)}")
+        clear_state(ADMIN_ID)
+
+@state_handler('task_add', admin_only=True)
+def state_task_add(message, user_id, name, username, text, payload):
+    """Add the entered link to the selected task section"""
+    section = payload
+    if section in task_sections:
+        task_sections[section].append(text)
+        task_keyboards.invalidate(section)
+        save_data()
+        bot.reply_to(message, f"✅ Task added to {section.replace('_', ' ').title()} section with auto-tracking enabled.")
+    else:
+        bot.reply_to(message, f"❌ Invalid section: {section}")
+    clear_state(user_id)
 
-                markup.add(types.InlineKeyboardButton(button_text, callback_data=f"complete_app_downloads_{i}"))
-            bot.send_message(message.chat.id, "📱 Available App Download Tasks:\n\n🔒 Limited - Each task can be done only once!\n🔄 Auto-Tracking: Active", reply_markup=markup)
-        else:
-            bot.reply_to(message, "📱 No app download tasks available.")
+@state_handler('support_message')
+def state_support_message(message, user_id, name, username, text, payload):
+    """Forward a support message to admin"""
+    try:
+        bot.send_message(
+            ADMIN_ID,
+            f"🆘 *Support Message*\n👤 Name: {name}\n🔗 Username: @{username}\n🆔 ID: {user_id}\n💬 Message:\n{text}",
+            parse_mode="Markdown"
+        )
+        bot.reply_to(message, "✅ Your message has been sent to support team.")
+    except Exception as e:
+        bot.reply_to(message, "❌ Error sending support message.")
+        print(f"Support message error: {e}")
+    clear_state(user_id)
 
-    elif text == "📢 Promotional":
-        notify_admin_user_action(user_id, name, username, "📢 Promotional Section", f"Tasks Available: {len(task_sections['promotional'])}")
-        if task_sections['promotional']:
-            markup = types.InlineKeyboardMarkup()
-            for i, task in enumerate(task_sections['promotional']):
-                user_completed = completed_tasks.get(user_id, set())
-                task_key = f"promotional_{i}"
+@state_handler('promotion_message')
+def state_promotion_message(message, user_id, name, username, text, payload):
+    """Forward a promotion request to admin"""
+    try:
+        bot.send_message(
+            ADMIN_ID,
+            f"📢 *Promotion Request*\n👤 Name: {name}\n🔗 Username: @{username}\n🆔 ID: {user_id}\n💬 Message:\n{text}",
+            parse_mode="Markdown"
+        )
+        bot.reply_to(message, "✅ Your promotion request has been sent to admin.")
+    except Exception as e:
+        bot.reply_to(message, "❌ Error sending promotion request.")
+        print(f"Promotion message error: {e}")
+    clear_state(user_id)
+
+def reply_withdrawal_refused(message, tx, required):
+    """Explain why a withdrawal transaction did not commit"""
+    balance = user_balances.get(message.from_user.id, 0)
+    if tx.reason == BalanceLedger.DUPLICATE:
+        bot.reply_to(message, "ℹ️ **Request Already Submitted**\n\nThis withdrawal request was already received; it was not charged twice.", parse_mode="Markdown")
+    elif tx.reason == SharedBalanceLedger.OVERDRAWN:
+        bot.reply_to(message, f"⚠️ **Balance Changed**\n\nYour balance changed while this request was processed.\n💳 Your Balance: ₹{balance:.2f}\n\nPlease try again.", parse_mode="Markdown")
+    else:
+        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Required: {required}\n💳 Your Balance: ₹{balance:.2f}")
 
-                task_parts = task.split(" - ")
-                task_name = task_parts[0] if task_parts else task[:35]
+@state_handler('withdraw')
+def state_withdraw(message, user_id, name, username, text, payload):
+    """Process withdrawal details for the selected method"""
+    withdraw_type = payload
+    try:
+        parts = text.split()
+        if len(parts) >= 2:
+            payment_id = parts[0]
+            amount, error = validate_amount(parts[1])
+            if error:
+                bot.reply_to(message, error)
+                return
 
-                if is_client_task(task):
-                    if task_key in user_completed:
-                        button_text = f"✅ {task_name[:20]}... - DONE"
-                    else:
-                        button_text = f"🎯 {task_name[:30]}..."
-                else:
-                    reward = extract_reward_from_task(task)
-                    if task_key in user_completed:
-                        button_text = f"✅ {task_name[:20]}... (₹{reward}) - DONE"
-                    else:
-                        button_text = f"📢 {task_name[:25]}... (₹{reward})" if reward > 0 else f"📢 {task_name[:35]}..."
+            # Check minimum limits
+            min_limits = {
+                'upi': 15,
+                'amazon': 15,
+                'googleplay': 15,
+                'paypal': 2
+            }
 
-                markup.add(types.InlineKeyboardButton(button_text, callback_data=f"complete_promotional_{i}"))
+            min_amount = min_limits.get(withdraw_type, 15)
+            if amount < min_amount:
+                currency = "USD" if withdraw_type == 'paypal' else "₹"
+                bot.reply_to(message, f"❌ **Minimum Amount Required**\n\n💳 Minimum: {currency}{min_amount}\n📝 Your request: {currency}{amount}")
+                return
 
-            bot.send_message(message.chat.id, "📢 Available Promotional Tasks:\n\n🔒 Limited - Each task can be done only once!\n🎯 Client Tasks - Reward determined by admin\n🔄 Auto-Tracking: Active for all tasks", reply_markup=markup)
-        else:
-            bot.reply_to(message, "📢 No promotional tasks available.")
+            # PayPal with 7% Tax
+            if withdraw_type == 'paypal':
+                inr_amount = amount * 83
+                tax_rate = 0.07
+                tax_amount_usd = amount * tax_rate
+                final_amount_usd = amount - tax_amount_usd
+
+                # Debit and store the withdrawal request as one record
+                with transaction(user_id, key=f"msg:{message.chat.id}:{message.message_id}") as tx:
+                    debited = tx.debit(user_id, inr_amount, 'withdrawal')
+                    if debited:
+                        tx.set('withdrawal_requests', user_id, {
+                            'type': 'paypal',
+                            'payment_id': payment_id,
+                            'amount': amount,
+                            'final_amount': final_amount_usd,
+                            'inr_amount': inr_amount,
+                            'tax_amount': tax_amount_usd,
+                            'timestamp': get_local_time(),
+                            'status': 'pending'
+                        })
+                if not tx.committed:
+                    reply_withdrawal_refused(message, tx, f"₹{inr_amount:.2f} (${amount})")
+                    return
 
-    elif text == "📤 Submit Proof":
-        notify_admin_user_action(user_id, name, username, "📤 Submit Proof", "Ready to submit screenshot")
-        worked_users[user_id] = name
-        bot.reply_to(message, "📸 Please send your proof (screenshot).")
+                bot.reply_to(message, f"✅ **PayPal Withdrawal Request Submitted**\n\n💰 **Amount:** ${amount} (₹{inr_amount:.2f})\n🏛️ **Tax (7%):** ${tax_amount_usd:.2f}\n📊 **Final Amount:** ${final_amount_usd:.2f}\n⏳ **Status:** Pending admin approval\n🕐 **Processing:** 24-48 hours", parse_mode="Markdown")
 
-    elif text == "💰 Balance":
-        balance = user_balances.get(user_id, 0)
-        notify_admin_user_action(user_id, name, username, "💰 Balance Check", f"Current Balance: ₹{balance:.2f}")
-        bot.reply_to(message, f"💰 Your balance: ₹{balance:.2f}")
+                bot.send_message(
+                    ADMIN_ID,
+                    f"📤 **PayPal Withdrawal Request**\n\n👤 **User:** {name}\n🆔 **ID:** {user_id}\n🌐 **PayPal:** `{payment_id}`\n💰 **Final Amount:** ${final_amount_usd:.2f} USD\n💱 **INR:** ₹{inr_amount:.2f}\n🏛️ **Tax (7%):** ${tax_amount_usd:.2f} USD\n📱 **Contact:** @{username}",
+                    parse_mode="Markdown",
+                    reply_markup=generate_withdrawal_approval_markup(user_id)
+                )
+
+            else:
+                # For INR-based withdrawals - 2% fee
+                fee_rate = 0.02
+                fee_amount = amount * fee_rate
+                final_amount = amount - fee_amount
+
+                # Debit and store the withdrawal request as one record
+                with transaction(user_id, key=f"msg:{message.chat.id}:{message.message_id}") as tx:
+                    debited = tx.debit(user_id, amount, 'withdrawal')
+                    if debited:
+                        tx.set('withdrawal_requests', user_id, {
+                            'type': withdraw_type,
+                            'payment_id': payment_id,
+                            'amount': amount,
+                            'final_amount': final_amount,
+                            'fee_amount': fee_amount,
+                            'timestamp': get_local_time(),
+                            'status': 'pending'
+                        })
+                if not tx.committed:
+                    reply_withdrawal_refused(message, tx, f"₹{amount}")
+                    return
+
+                method_names = {
+                    'upi': 'UPI',
+                    'amazon': 'Amazon Pay',
+                    'googleplay': 'Google Play Gift Card'
+                }
+
+                method_name = method_names.get(withdraw_type, withdraw_type.upper())
+                bot.reply_to(message, f"✅ **{method_name} Withdrawal Request**\n\n💳 **Payment ID:** {payment_id}\n💰 **Amount:** ₹{amount}\n📊 **After 2% Fee:** ₹{final_amount:.2f}\n⏳ **Status:** Pending admin approval", parse_mode="Markdown")
+
+                bot.send_message(
+                    ADMIN_ID,
+                    f"📤 **{method_name} Withdrawal**\n\n👤 **User:** {name}\n🆔 **ID:** {user_id}\n💳 **Payment ID:** `{payment_id}`\n💰 **Amount:** ₹{final_amount:.2f}\n📱 **Contact:** @{username}",
+                    parse_mode="Markdown",
+                    reply_markup=generate_withdrawal_approval_markup(user_id)
+                )
 
-    elif text == "🏧 Withdraw":
-        balance = user_balances.get(user_id, 0)
-        notify_admin_user_action(user_id, name, username, "🏧 Withdraw Menu", f"Current Balance: ₹{balance:.2f}")
-        withdraw_info = "💳 **Withdrawal Methods & Limits:**\n\n"
-        withdraw_info += "💳 **UPI:** Minimum ₹15 (2% fee)\n"
-        withdraw_info += "🌐 **PayPal:** Minimum $2 USD (7% tax)\n"
-        withdraw_info += "📦 **Amazon Pay:** Minimum ₹15 (2% fee)\n"
-        withdraw_info += "🎮 **Google Play:** Minimum ₹15 (2% fee)\n\n"
-        withdraw_info += "🕐 **Processing:** 24-48 hours\n"
-        withdraw_info += "⚠️ **Note:** Admin approval required\n\n"
-        withdraw_info += "Choose your withdrawal method:"
-
-        bot.send_message(message.chat.id, withdraw_info, parse_mode="Markdown", reply_markup=generate_withdraw_markup())
-
-    elif text == "💳 UPI":
-        balance = user_balances.get(user_id, 0)
-        notify_admin_user_action(user_id, name, username, "💳 UPI Withdrawal", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
-        if balance < 15:
-            bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n💳 UPI Minimum: ₹15", parse_mode="Markdown")
         else:
-            awaiting_withdraw[user_id] = 'upi'
-            bot.reply_to(message, "💳 **UPI Withdrawal**\n\n📝 **Format:** `upi@bank 50`\n💰 **Minimum:** ₹15\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
+            # Format help
+            if withdraw_type == 'upi':
+                bot.reply_to(message, "⚠️ **Format:** `upi@bank 50`\n💡 **Example:** `yourname@paytm 100`", parse_mode="Markdown")
+            elif withdraw_type == 'paypal':
+                bot.reply_to(message, "⚠️ **Format:** `email@gmail.com 5`\n💡 **Example:** `john@gmail.com 10`\n💱 **Note:** Amount in USD", parse_mode="Markdown")
+            elif withdraw_type == 'amazon':
+                bot.reply_to(message, "⚠️ **Format:** `9876543210 50`\n💡 **Example:** `9876543210 100`", parse_mode="Markdown")
+            elif withdraw_type == 'googleplay':
+                bot.reply_to(message, "⚠️ **Format:** `email@gmail.com 50`\n💡 **Example:** `john@gmail.com 100`", parse_mode="Markdown")
 
-    elif text == "🌐 PayPal":
-        balance = user_balances.get(user_id, 0)
-        usd_balance = balance / 83
-        notify_admin_user_action(user_id, name, username, "🌐 PayPal Withdrawal", f"Balance: ₹{balance:.2f} (${usd_balance:.2f}), Min Required: $2")
-        if usd_balance < 2:
-            bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f} (${usd_balance:.2f})\n🌐 PayPal Minimum: $2 USD", parse_mode="Markdown")
+    except Exception as e:
+        bot.reply_to(message, "⚠️ **Error Processing Request**\n\nPlease try again.", parse_mode="Markdown")
+        print(f"Withdrawal error: {e}")
+
+    clear_state(user_id)
+
+# ✅ MAIN MENU ROUTES
+
+@menu_route("📋 Task")
+def menu_task(message, user_id, name, username, text):
+    """Show task categories"""
+    notify_admin_user_action(user_id, name, username, "📋 Task Menu Accessed")
+    bot.send_message(message.chat.id, "📝 Choose a task category:", reply_markup=generate_task_markup())
+
+@menu_route("📺 Watch Ads")
+def menu_watch_ads(message, user_id, name, username, text):
+    """Show Watch Ads tasks"""
+    notify_admin_user_action(user_id, name, username, "📺 Watch Ads Section", f"Tasks Available: {len(task_sections['watch_ads'])}")
+    if task_sections['watch_ads']:
+        markup = task_keyboards.render('watch_ads', user_id)
+        bot.send_message(message.chat.id, "📺 Available Watch Ads Tasks:\n\n🔒 Limited - Each task can be done only once!\n🔄 Auto-Tracking: Active", reply_markup=markup)
+    else:
+        bot.reply_to(message, "📺 No watch ads tasks available.")
+
+@menu_route("📱 App Download")
+def menu_app_download(message, user_id, name, username, text):
+    """Show App Download tasks"""
+    notify_admin_user_action(user_id, name, username, "📱 App Download Section", f"Tasks Available: {len(task_sections['app_downloads'])}")
+    if task_sections['app_downloads']:
+        markup = task_keyboards.render('app_downloads', user_id)
+        bot.send_message(message.chat.id, "📱 Available App Download Tasks:\n\n🔒 Limited - Each task can be done only once!\n🔄 Auto-Tracking: Active", reply_markup=markup)
+    else:
+        bot.reply_to(message, "📱 No app download tasks available.")
+
+@menu_route("📢 Promotional")
+def menu_promotional(message, user_id, name, username, text):
+    """Show Promotional tasks"""
+    notify_admin_user_action(user_id, name, username, "📢 Promotional Section", f"Tasks Available: {len(task_sections['promotional'])}")
+    if task_sections['promotional']:
+        markup = task_keyboards.render('promotional', user_id)
+        bot.send_message(message.chat.id, "📢 Available Promotional Tasks:\n\n🔒 Limited - Each task can be done only once!\n🎯 Client Tasks - Reward determined by admin\n🔄 Auto-Tracking: Active for all tasks", reply_markup=markup)
+    else:
+        bot.reply_to(message, "📢 No promotional tasks available.")
+
+@menu_route("📤 Submit Proof")
+def menu_submit_proof(message, user_id, name, username, text):
+    """Explain proof submission"""
+    notify_admin_user_action(user_id, name, username, "📤 Submit Proof", "Ready to submit screenshot")
+    proof_waiters.set(user_id, 'proof', name)
+    bot.reply_to(message, "📸 Please send your proof (screenshot).")
+
+@menu_route("💰 Balance")
+def menu_balance(message, user_id, name, username, text):
+    """Show the user's balance"""
+    balance = user_balances.get(user_id, 0)
+    notify_admin_user_action(user_id, name, username, "💰 Balance Check", f"Current Balance: ₹{balance:.2f}")
+    bot.reply_to(message, f"💰 Your balance: ₹{balance:.2f}")
+
+@menu_route("🏧 Withdraw")
+def menu_withdraw(message, user_id, name, username, text):
+    """Show withdrawal methods"""
+    balance = user_balances.get(user_id, 0)
+    notify_admin_user_action(user_id, name, username, "🏧 Withdraw Menu", f"Current Balance: ₹{balance:.2f}")
+    withdraw_info = "💳 **Withdrawal Methods & Limits:**\n\n"
+    withdraw_info += "💳 **UPI:** Minimum ₹15 (2% fee)\n"
+    withdraw_info += "🌐 **PayPal:** Minimum $2 USD (7% tax)\n"
+    withdraw_info += "📦 **Amazon Pay:** Minimum ₹15 (2% fee)\n"
+    withdraw_info += "🎮 **Google Play:** Minimum ₹15 (2% fee)\n\n"
+    withdraw_info += "🕐 **Processing:** 24-48 hours\n"
+    withdraw_info += "⚠️ **Note:** Admin approval required\n\n"
+    withdraw_info += "Choose your withdrawal method:"
+
+    bot.send_message(message.chat.id, withdraw_info, parse_mode="Markdown", reply_markup=generate_withdraw_markup())
+
+@menu_route("💳 UPI")
+def menu_upi(message, user_id, name, username, text):
+    """Start a UPI withdrawal"""
+    balance = user_balances.get(user_id, 0)
+    notify_admin_user_action(user_id, name, username, "💳 UPI Withdrawal", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
+    if balance < 15:
+        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n💳 UPI Minimum: ₹15", parse_mode="Markdown")
+    else:
+        set_state(user_id, 'withdraw', 'upi')
+        bot.reply_to(message, "💳 **UPI Withdrawal**\n\n📝 **Format:** `upi@bank 50`\n💰 **Minimum:** ₹15\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
+
+@menu_route("🌐 PayPal")
+def menu_paypal(message, user_id, name, username, text):
+    """Start a PayPal withdrawal"""
+    balance = user_balances.get(user_id, 0)
+    usd_balance = balance / 83
+    notify_admin_user_action(user_id, name, username, "🌐 PayPal Withdrawal", f"Balance: ₹{balance:.2f} (${usd_balance:.2f}), Min Required: $2")
+    if usd_balance < 2:
+        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f} (${usd_balance:.2f})\n🌐 PayPal Minimum: $2 USD", parse_mode="Markdown")
+    else:
+        set_state(user_id, 'withdraw', 'paypal')
+        bot.reply_to(message, f"🌐 **PayPal Withdrawal**\n\n📝 **Format:** `email@gmail.com 5`\n💰 **Minimum:** $2 USD\n💱 **Rate:** $1 = ₹83\n💰 **Available:** ${usd_balance:.2f}\n🏛️ **Tax:** 7%\n✅ **Admin approval required**", parse_mode="Markdown")
+
+@menu_route("📦 Amazon Pay")
+def menu_amazon_pay(message, user_id, name, username, text):
+    """Start an Amazon Pay withdrawal"""
+    balance = user_balances.get(user_id, 0)
+    notify_admin_user_action(user_id, name, username, "📦 Amazon Pay Withdrawal", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
+    if balance < 15:
+        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n📦 Amazon Minimum: ₹15", parse_mode="Markdown")
+    else:
+        set_state(user_id, 'withdraw', 'amazon')
+        bot.reply_to(message, "📦 **Amazon Pay**\n\n📝 **Format:** `9876543210 50`\n💰 **Minimum:** ₹15\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
+
+@menu_route("🎮 Google Play Gift")
+def menu_google_play(message, user_id, name, username, text):
+    """Start a Google Play Gift withdrawal"""
+    balance = user_balances.get(user_id, 0)
+    notify_admin_user_action(user_id, name, username, "🎮 Google Play Gift", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
+    if balance < 15:
+        bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n🎮 Google Play Minimum: ₹15", parse_mode="Markdown")
+    else:
+        set_state(user_id, 'withdraw', 'googleplay')
+        bot.reply_to(message, "🎮 **Google Play Gift**\n\n📝 **Format:** `email@gmail.com 50`\n💰 **Minimum:** ₹15\n🎁 **Note:** Code sent to email\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
+
+@menu_route("👥 Referral")
+def menu_referral(message, user_id, name, username, text):
+    """Show the user's referral link"""
+    ref_link = generate_referral_link(user_id)
+    referred_count = sum(1 for ref_id in referral_data.values() if ref_id == user_id)
+    notify_admin_user_action(user_id, name, username, "👥 Referral Menu", f"Total Referrals: {referred_count}, Bonus Earned: ₹{referred_count * 5:.2f}")
+    bot.reply_to(message, f"👥 *Your Referral Info:*\n\n🔗 Your Link:\n`{ref_link}`\n\n👥 Total Referrals: {referred_count}\n💰 Bonus: ₹{referred_count * 5:.2f}\n\n📢 Share with friends!\nBoth get ₹5.00!", parse_mode="Markdown")
+
+@menu_route("🆘 Support")
+def menu_support(message, user_id, name, username, text):
+    """Start a support message"""
+    notify_admin_user_action(user_id, name, username, "🆘 Support Request", "User wants to contact support")
+    set_state(user_id, 'support_message')
+    bot.reply_to(message, "🆘 *Support*\n\nDescribe your problem. Your message will be sent to admin.", parse_mode="Markdown")
+
+@menu_route("📢 Promotion")
+def menu_promotion(message, user_id, name, username, text):
+    """Show promotion info"""
+    notify_admin_user_action(user_id, name, username, "📢 Promotion Menu", "Accessed promotion features")
+    bot.send_message(message.chat.id, "📢 *Promotion Menu*", parse_mode="Markdown", reply_markup=generate_promotion_menu())
+
+@menu_route("📊 Bot Status")
+def menu_bot_status(message, user_id, name, username, text):
+    """Show bot status"""
+    total_users = len(user_balances)
+    total_banned = len(banned_users)
+    active_users = total_users - total_banned
+    total_tasks = sum(len(tasks) for tasks in task_sections.values())
+
+    notify_admin_user_action(user_id, name, username, "📊 Bot Status Check", "Viewed bot statistics")
+
+    status_msg = f"📊 **Bot Statistics**\n\n"
+    status_msg += f"👥 **Total Members:** {total_users}\n"
+    status_msg += f"✅ **Active Users:** {active_users}\n"
+    status_msg += f"🚫 **Banned Users:** {total_banned}\n"
+    status_msg += f"📋 **Available Tasks:** {total_tasks}\n"
+    status_msg += f"🎯 **Client Projects:** {len(client_tasks)}\n"
+    status_msg += f"🔄 **Auto-Tracking:** Active\n\n"
+    status_msg += f"🚀 **Status:** Online & Active"
+
+    bot.reply_to(message, status_msg, parse_mode="Markdown")
+
+@menu_route("📢 Request Promotion")
+def menu_request_promotion(message, user_id, name, username, text):
+    """Start a promotion request"""
+    notify_admin_user_action(user_id, name, username, "📢 Promotion Request", "Starting promotion request")
+    set_state(user_id, 'promotion_message')
+    bot.reply_to(message, "📢 *Promotion Request*\n\nDescribe your requirements:\n• Members needed\n• Links\n• Budget\n• Requirements\n\nMessage will be sent to admin.", parse_mode="Markdown")
+
+# ✅ ENHANCED TEXT MESSAGE HANDLER
+@bot.message_handler(func=lambda message: True, content_types=['text'])
+def handle_message(message):
+    try:
+        user_id = message.from_user.id
+        name = message.from_user.first_name or "Unknown"
+        username = message.from_user.username or "No Username"
+        text = message.text.strip() if message.text else ""
+        
+        if not text:
+            logger.warning(f"Empty message from user {user_id}")
+            return
+            
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        return
+
+    # Handle Back button - reset states first
+    if text == "🔙 Back":
+        reset_user_state(user_id)
+
+        if is_banned(user_id):
+            bot.send_message(message.chat.id, "🏠 Main Menu:\n\n❌ **You are banned** - Only Support works.", reply_markup=generate_banned_menu(), parse_mode="Markdown")
         else:
-            awaiting_withdraw[user_id] = 'paypal'
-            bot.reply_to(message, f"🌐 **PayPal Withdrawal**\n\n📝 **Format:** `email@gmail.com 5`\n💰 **Minimum:** $2 USD\n💱 **Rate:** $1 = ₹83\n💰 **Available:** ${usd_balance:.2f}\n🏛️ **Tax:** 7%\n✅ **Admin approval required**", parse_mode="Markdown")
+            bot.send_message(message.chat.id, "🏠 Main Menu:", reply_markup=generate_main_menu())
+        return
 
-    elif text == "📦 Amazon Pay":
-        balance = user_balances.get(user_id, 0)
-        notify_admin_user_action(user_id, name, username, "📦 Amazon Pay Withdrawal", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
-        if balance < 15:
-            bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n📦 Amazon Minimum: ₹15", parse_mode="Markdown")
+    # Handle banned users
+    if is_banned(user_id):
+        if text in ["🆘 Support"] or in_state(user_id, 'support_message'):
+            pass
+        elif text in ["📋 Task", "💰 Balance", "📤 Submit Proof", "🏧 Withdraw", "👥 Referral", "📺 Watch Ads", "📱 App Download", "📢 Promotional", "💳 UPI", "🌐 PayPal", "📦 Amazon Pay", "🎮 Google Play Gift", "📢 Promotion"]:
+            bot.send_message(user_id, "❌ You are banned from using this feature.\n\n🆘 Only Support is available for banned users.")
+            return
         else:
-            awaiting_withdraw[user_id] = 'amazon'
-            bot.reply_to(message, "📦 **Amazon Pay**\n\n📝 **Format:** `9876543210 50`\n💰 **Minimum:** ₹15\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
+            bot.send_message(user_id, "❌ You have been banned from using this bot.\n\n🆘 You can only access Support to contact admin.")
+            return
 
-    elif text == "🎮 Google Play Gift":
-        balance = user_balances.get(user_id, 0)
-        notify_admin_user_action(user_id, name, username, "🎮 Google Play Gift", f"Balance: ₹{balance:.2f}, Min Required: ₹15")
-        if balance < 15:
-            bot.reply_to(message, f"❌ **Insufficient Balance**\n\n💰 Your Balance: ₹{balance:.2f}\n🎮 Google Play Minimum: ₹15", parse_mode="Markdown")
+
+    # ✅ ENHANCED ADMIN COMMANDS
+    if user_id == ADMIN_ID and text.startswith("/"):
+        command = admin_commands.get(text.split()[0])
+        if command:
+            command(message, user_id, name, username, text)
+            return
+
+    # ✅ Active conversation (one flow per user)
+    state, payload = get_state(user_id)
+    if state in state_handlers:
+        handler, admin_only = state_handlers[state]
+        if admin_only and user_id != ADMIN_ID:
+            clear_state(user_id)
         else:
-            awaiting_withdraw[user_id] = 'googleplay'
-            bot.reply_to(message, "🎮 **Google Play Gift**\n\n📝 **Format:** `email@gmail.com 50`\n💰 **Minimum:** ₹15\n🎁 **Note:** Code sent to email\n⚠️ **Fee:** 2%\n✅ **Admin approval required**", parse_mode="Markdown")
-
-    elif text == "👥 Referral":
-        ref_link = generate_referral_link(user_id)
-        referred_count = sum(1 for ref_id in referral_data.values() if ref_id == user_id)
-        notify_admin_user_action(user_id, name, username, "👥 Referral Menu", f"Total Referrals: {referred_count}, Bonus Earned: ₹{referred_count * 5:.2f}")
-        bot.reply_to(message, f"👥 *Your Referral Info:*\n\n🔗 Your Link:\n`{ref_link}`\n\n👥 Total Referrals: {referred_count}\n💰 Bonus: ₹{referred_count * 5:.2f}\n\n📢 Share with friends!\nBoth get ₹5.00!", parse_mode="Markdown")
-
-    elif text == "🆘 Support":
-        notify_admin_user_action(user_id, name, username, "🆘 Support Request", "User wants to contact support")
-        awaiting_support_message[user_id] = True
-        bot.reply_to(message, "🆘 *Support*\n\nDescribe your problem. Your message will be sent to admin.", parse_mode="Markdown")
-
-    elif text == "📢 Promotion":
-        notify_admin_user_action(user_id, name, username, "📢 Promotion Menu", "Accessed promotion features")
-        bot.send_message(message.chat.id, "📢 *Promotion Menu*", parse_mode="Markdown", reply_markup=generate_promotion_menu())
-
-    elif text == "📊 Bot Status":
-        total_users = len(user_balances)
-        total_banned = len(banned_users)
-        active_users = total_users - total_banned
-        total_tasks = sum(len(tasks) for tasks in task_sections.values())
-
-        notify_admin_user_action(user_id, name, username, "📊 Bot Status Check", "Viewed bot statistics")
-
-        status_msg = f"📊 **Bot Statistics**\n\n"
-        status_msg += f"👥 **Total Members:** {total_users}\n"
-        status_msg += f"✅ **Active Users:** {active_users}\n"
-        status_msg += f"🚫 **Banned Users:** {total_banned}\n"
-        status_msg += f"📋 **Available Tasks:** {total_tasks}\n"
-        status_msg += f"🎯 **Client Projects:** {len(client_tasks)}\n"
-        status_msg += f"🔄 **Auto-Tracking:** Active\n\n"
-        status_msg += f"🚀 **Status:** Online & Active"
-
-        bot.reply_to(message, status_msg, parse_mode="Markdown")
-
-    elif text == "📢 Request Promotion":
-        notify_admin_user_action(user_id, name, username, "📢 Promotion Request", "Starting promotion request")
-        awaiting_promotion_message[user_id] = True
-        bot.reply_to(message, "📢 *Promotion Request*\n\nDescribe your requirements:\n• Members needed\n• Links\n• Budget\n• Requirements\n\nMessage will be sent to admin.", parse_mode="Markdown")
+            handler(message, user_id, name, username, text, payload)
+            return
+
+    # ✅ Main Menu Options
+    route = menu_routes.get(text)
+    if route:
+        route(message, user_id, name, username, text)
 
 # ✅ HANDLE MEDIA SUBMISSION
 @bot.message_handler(content_types=['photo', 'video', 'document'])
 def handle_media(message):
     user_id = message.from_user.id
 
+    # Handle admin CSV imports
+    if user_id == ADMIN_ID and message.content_type == 'document' and (message.document.file_name or '').lower().endswith('.csv'):
+        if (message.document.file_size or 0) > IMPORT_MAX_BYTES:
+            bot.reply_to(message, "❌ File too large. Telegram bots can only download files up to 20 MB.")
+            return
+        bot.reply_to(message, "⏳ Import started. A summary will follow when it finishes.")
+        threading.Thread(target=run_bulk_import, args=(message.document, message.chat.id), daemon=True).start()
+        return
+
     # Handle promotion media
-    if user_id in awaiting_promotion_message:
+    if in_state(user_id, 'promotion_message'):
         try:
             caption = f"📢 *Promotion Media*\n👤 {message.from_user.first_name}\n🔗 @{message.from_user.username or 'No Username'}\n🆔 {user_id}"
 
@@ -1805,12 +4395,12 @@ def handle_media(message):
         return
 
     # Handle banned users
-    if is_banned(user_id) and user_id not in awaiting_support_message:
+    if is_banned(user_id) and not in_state(user_id, 'support_message'):
         bot.send_message(user_id, "❌ You are banned. Only Support is available.")
         return
 
     # Handle support media
-    if user_id in awaiting_support_message:
+    if in_state(user_id, 'support_message'):
         try:
             caption = f"🆘 *Support Media*\n👤 {message.from_user.first_name}\n🔗 @{message.from_user.username or 'No Username'}\n🆔 {user_id}"
 
@@ -1819,927 +4409,964 @@ def handle_media(message):
             elif message.content_type == 'video':
                 bot.send_video(ADMIN_ID, video=message.video.file_id, caption=caption, parse_mode="Markdown")
             elif message.content_type == 'document':
-                bot.send_document(ADMIN_ID, document=message.document.file_id, caption=caption, parse_mode="Markdown")
-
-            bot.reply_to(message, "✅ Media sent to support team.")
-        except Exception as e:
-            bot.reply_to(message, "❌ Error sending media.")
-            print(f"Support media error: {e}")
-        return
-
-    # Handle proof submission (photos only)
-    if message.content_type == 'photo' and user_id in worked_users:
-        task_info = ""
-        reward_info = ""
-        if user_id in pending_tasks:
-            task_data = pending_tasks[user_id]
-            task_name = task_data.get('task_name', 'Unknown Task')
-            reward = task_data.get('reward', 0)
-            section = task_data.get('section', 'Unknown')
-            task_info = f"\n📝 Task: {task_name}\n🔗 Section: {section.replace('_', ' ').title()}"
-
-            if not is_client_task(task_data.get('task', '')):
-                reward_info = f"\n💰 Reward: ₹{reward}" if reward > 0 else ""
-
-        pending_tasks[user_id] = pending_tasks.get(user_id, {})
-        pending_tasks[user_id]['photo_id'] = message.photo[-1].file_id
-
-        try:
-            bot.send_photo(
-                ADMIN_ID,
-                photo=message.photo[-1].file_id,
-                caption=f"📤 *Task Submission*\n👤 User ID: {user_id}{task_info}{reward_info}",
-                parse_mode='Markdown',
-                reply_markup=generate_approval_markup(user_id)
-            )
-            bot.reply_to(message, "✅ Screenshot submitted! Wait for admin approval.\n\n⚠️ Money added manually by admin using /addbalance command.")
-        except Exception as e:
-            bot.reply_to(message, "❌ Error submitting screenshot.")
-            print(f"Screenshot submission error: {e}")
-
-        worked_users.pop(user_id, None)
-
-# ✅ ENHANCED CALLBACK HANDLER
-@bot.callback_query_handler(func=lambda call: True)
-def handle_callback(call):
-    user_id = call.from_user.id
-
-    try:
-        # Handle withdrawal approval/rejection
-        if call.data.startswith("approve_withdrawal_"):
-            uid = int(call.data.split("_")[2])
-
-            if uid in withdrawal_requests:
-                request = withdrawal_requests[uid]
-
-                # Send payment confirmation message based on withdrawal type
-                if request['type'] == 'paypal':
-                    message = f"✅ **PayPal Payment Approved!**\n\n💰 **Amount:** ${request['final_amount']:.2f}\n🌐 **PayPal:** {request['payment_id']}\n\n💡 **Please check your PayPal account**\n⏰ **Time:** {get_local_time()}"
-                elif request['type'] == 'upi':
-                    message = f"✅ **UPI Payment Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n💳 **UPI ID:** {request['payment_id']}\n\n💡 **Please check your UPI account**\n⏰ **Time:** {get_local_time()}"
-                elif request['type'] == 'amazon':
-                    message = f"✅ **Amazon Pay Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n📦 **Mobile:** {request['payment_id']}\n\n💡 **Please check your Amazon Pay account**\n⏰ **Time:** {get_local_time()}"
-                elif request['type'] == 'googleplay':
-                    message = f"✅ **Google Play Gift Card Approved!**\n\n💰 **Amount:** ₹{request['final_amount']:.2f}\n🎮 **Email:** {request['payment_id']}\n\n💡 **Please check your email for gift card code**\n⏰ **Time:** {get_local_time()}"
-
-                bot.send_message(uid, message, parse_mode="Markdown")
-
-                # Update withdrawal status
-                withdrawal_requests[uid]['status'] = 'approved'
-                save_data()
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=f"✅ Payment approved and sent to user {uid}. Amount: {request.get('final_amount', request.get('amount'))}"
-                )
-
-        elif call.data.startswith("reject_withdrawal_"):
-            uid = int(call.data.split("_")[2])
-
-            if uid in withdrawal_requests:
-                request = withdrawal_requests[uid]
-
-                # Refund the balance
-                if request['type'] == 'paypal':
-                    user_balances[uid] = user_balances.get(uid, 0) + request['inr_amount']
-                else:
-                    user_balances[uid] = user_balances.get(uid, 0) + request['amount']
+                bot.send_document(ADMIN_ID, document=message.document.file_id, caption=caption, parse_mode="Markdown")
 
-                # Update withdrawal status
-                withdrawal_requests[uid]['status'] = 'rejected'
-                save_data()
+            bot.reply_to(message, "✅ Media sent to support team.")
+        except Exception as e:
+            bot.reply_to(message, "❌ Error sending media.")
+            print(f"Support media error: {e}")
+        return
 
-                bot.send_message(uid, "❌ **Withdrawal Request Rejected**\n\n💰 Your balance has been refunded\n📞 Contact support for more information")
+    # Handle proof submission (photos only)
+    if message.content_type == 'photo' and proof_waiters.get(user_id)[0] == 'proof':
+        submission_id, pending_count = queue_proof(user_id, message.photo[-1].file_id)
+        bot.reply_to(message, f"✅ Screenshot submitted! (Proof #{submission_id}) Wait for admin approval.\n\n⚠️ Money added manually by admin using /addbalance command.")
+
+        # Ping admin when the queue starts and then once per page, not for every photo
+        if pending_count == 1 or pending_count % PROOF_PAGE_SIZE == 0:
+            send_noncritical(ADMIN_ID, f"📤 {pending_count} proof(s) waiting for review. Use /proofs to review them.")
+
+        proof_waiters.clear(user_id)
+
+# ✅ CALLBACK ROUTES
+@callback_router.route("approve_withdrawal_", int, prefix=True)
+def cb_approve_withdrawal(call, uid):
+    """Approve a pending withdrawal and notify the user"""
+    request = settle_withdrawal(uid, 'approved')
+    if request:
+        bot.send_message(uid, withdrawal_approved_message(request), parse_mode="Markdown")
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"✅ Payment approved and sent to user {uid}. Amount: {request.get('final_amount', request.get('amount'))}"
+        )
+    else:
+        answer_callback(call, "ℹ️ This withdrawal was already processed.", show_alert=True, follow_up=True)
+
+@callback_router.route("reject_withdrawal_", int, prefix=True)
+def cb_reject_withdrawal(call, uid):
+    """Reject a pending withdrawal and refund the balance"""
+    if settle_withdrawal(uid, 'rejected'):
+        bot.send_message(uid, "❌ **Withdrawal Request Rejected**\n\n💰 Your balance has been refunded\n📞 Contact support for more information")
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"❌ Payment rejected for user {uid}. Balance refunded."
+        )
+    else:
+        answer_callback(call, "ℹ️ This withdrawal was already processed.", show_alert=True, follow_up=True)
+
+def refresh_withdrawal_console(call, offset, notice=None):
+    console_text, markup = render_withdrawal_console(offset, withdrawal_console(call.message.message_id))
+    if notice:
+        console_text = f"{notice}\n\n{console_text}"
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=console_text,
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
 
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=f"❌ Payment rejected for user {uid}. Balance refunded."
-                )
+def approve_from_console(call, uids, offset):
+    approved = approve_withdrawal_batch(uids)
+    answer_callback(call, f"✅ {len(approved)} withdrawals approved", follow_up=True)
+    refresh_withdrawal_console(call, offset, f"✅ **Approved {len(approved)} withdrawals.** Notifications queued.")
+    if approved:
+        send_payout_files(call.message.chat.id, approved)
+
+@callback_router.route("wd_page_", int, prefix=True, admin_only=True, invalid_message="❌ Invalid page!")
+def cb_withdrawal_page(call, offset):
+    """Move the withdrawal console to another page"""
+    refresh_withdrawal_console(call, offset)
+
+@callback_router.route("wd_sel_", int, int, prefix=True, admin_only=True)
+def cb_withdrawal_select(call, uid, offset):
+    """Tick or untick one withdrawal in the console"""
+    selected = withdrawal_console(call.message.message_id)['selected']
+    if uid in selected:
+        selected.discard(uid)
+    else:
+        selected.add(uid)
+    refresh_withdrawal_console(call, offset)
+
+@callback_router.route("wd_approve_sel_", int, prefix=True, admin_only=True)
+def cb_withdrawal_approve_selected(call, offset):
+    """Approve every withdrawal ticked on this console message"""
+    approve_from_console(call, list(withdrawal_console(call.message.message_id)['selected']), offset)
+
+@callback_router.route("wd_approve_page_", int, prefix=True, admin_only=True)
+def cb_withdrawal_approve_page(call, offset):
+    """Approve every withdrawal shown on this console message, if the page still holds the same requests"""
+    shown = withdrawal_console(call.message.message_id)['page']
+    if [uid for uid, _ in withdrawal_page(offset)[2]] != shown:
+        refresh_withdrawal_console(call, offset, "⚠️ **This page changed since it was shown.** Nothing was approved; check it and tap again.")
+        return
+    approve_from_console(call, list(shown), offset)
 
-        # Handle task finishing (Complete Task button)
-        elif call.data.startswith("finish_task_"):
-            try:
-                parts = call.data.split("_")
-                if len(parts) >= 4:
-                    section = "_".join(parts[2:-1])
-                    task_index = int(parts[-1])
-
-                    # Validate section exists
-                    if section not in task_sections:
-                        bot.answer_callback_query(call.id, "❌ Invalid task section!", show_alert=True)
-                        return
-
-                    # Validate task index
-                    if not (0 <= task_index < len(task_sections[section])):
-                        bot.answer_callback_query(call.id, "❌ Task not found!", show_alert=True)
-                        return
-
-                    # Check completion limits for all sections
-                    if section in ['app_downloads', 'promotional', 'watch_ads']:
-                        user_completed = completed_tasks.get(call.from_user.id, set())
-                        task_key = f"{section}_{task_index}"
-
-                        if task_key in user_completed:
-                            if section == 'app_downloads':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this App Download task! Each app can only be downloaded once.", show_alert=True)
-                            elif section == 'promotional':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this Promotional task! Each promotional task can only be done once.", show_alert=True)
-                            elif section == 'watch_ads':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this Watch Ads task! Each video can only be watched once.", show_alert=True)
-                            return
-
-                    # Get task details
-                    task = task_sections[section][task_index]
-                    reward = extract_reward_from_task(task)
-                    task_parts = task.split(" - ")
-                    task_name = task_parts[0] if task_parts else task[:50]
-
-                    # Check for auto-balance feature
-                    auto_added, auto_reward = auto_add_balance_for_task(call.from_user.id, task, section, task_index)
-
-                    # Notify admin about task completion
-                    balance = user_balances.get(call.from_user.id, 0)
-                    first_name = call.from_user.first_name or "Unknown"
-                    username = call.from_user.username or "No Username"
-
-                    task_type = section.replace('_', ' ').title()
-                    reward_text = f"₹{reward}" if reward > 0 and not is_client_task(task) else "Admin Determined"
-
-                    notify_admin_user_action(
-                        call.from_user.id, 
-                        first_name, 
-                        username, 
-                        f"✅ Completed {task_type} Task (Auto-Complete)", 
-                        f"Task: {task_name[:50]}..., Reward: {reward_text}, Auto-Added: {'Yes' if auto_added else 'No'}"
-                    )
-
-                    if auto_added:
-                        completion_msg = f"✅ **Task Completed Successfully!**\n\n"
-                        completion_msg += f"📝 **Task:** {task_name}\n"
-                        completion_msg += f"💰 **Reward:** ₹{auto_reward} (Auto-Added)\n"
-                        completion_msg += f"🔄 **Type:** {task_type}\n\n"
-                        completion_msg += f"✅ **Balance automatically updated!**\n"
-                        completion_msg += f"📸 You can still submit screenshot for verification"
-
-                        bot.send_message(call.from_user.id, completion_msg, parse_mode="Markdown")
-                        bot.answer_callback_query(call.id, f"✅ Task completed! ₹{auto_reward} added automatically!")
-                    else:
-                        completion_msg = f"✅ **Task Marked as Completed!**\n\n"
-                        completion_msg += f"📝 **Task:** {task_name}\n"
-                        completion_msg += f"💰 **Reward:** ₹{reward} (Pending)\n"
-                        completion_msg += f"🔄 **Type:** {task_type}\n\n"
-                        completion_msg += f"📸 **Next Step:** Submit screenshot for admin approval\n"
-                        completion_msg += f"⚠️ **Note:** Balance will be added after admin verification"
-
-                        bot.send_message(call.from_user.id, completion_msg, parse_mode="Markdown")
-                        bot.answer_callback_query(call.id, "✅ Task completed! Now submit screenshot for verification.")
-                else:
-                    bot.answer_callback_query(call.id, "❌ Invalid task format!", show_alert=True)
-            except ValueError as e:
-                bot.answer_callback_query(call.id, "❌ Invalid task index!", show_alert=True)
-                print(f"Task finish error: {e}")
-            except Exception as e:
-                bot.answer_callback_query(call.id, "❌ Error completing task!", show_alert=True)
-                print(f"Task completion error: {e}")
+@callback_router.route("finish_task_", str, int, prefix=True, invalid_message="❌ Invalid task format!")
+def cb_finish_task(call, section, task_index):
+    """Complete Task button"""
+    try:
+        # Validate section exists
+        if section not in task_sections:
+            answer_callback(call, "❌ Invalid task section!", show_alert=True, follow_up=True)
             return
 
-        # Handle task completion with auto-balance feature
-        elif call.data.startswith("complete_"):
-            try:
-                parts = call.data.split("_")
-                if len(parts) >= 3:
-                    section = "_".join(parts[1:-1])
-                    task_index = int(parts[-1])
-
-                    # Validate section exists
-                    if section not in task_sections:
-                        bot.answer_callback_query(call.id, "❌ Invalid task section!", show_alert=True)
-                        return
-
-                    # Validate task index
-                    if not (0 <= task_index < len(task_sections[section])):
-                        bot.answer_callback_query(call.id, "❌ Task not found!", show_alert=True)
-                        return
-
-                    # Check completion limits for all sections including watch_ads
-                    if section in ['app_downloads', 'promotional', 'watch_ads']:
-                        user_completed = completed_tasks.get(call.from_user.id, set())
-                        task_key = f"{section}_{task_index}"
-
-                        if task_key in user_completed:
-                            if section == 'app_downloads':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this App Download task! Each app can only be downloaded once.", show_alert=True)
-                            elif section == 'promotional':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this Promotional task! Each promotional task can only be done once.", show_alert=True)
-                            elif section == 'watch_ads':
-                                bot.answer_callback_query(call.id, "🚫 You have already completed this Watch Ads task! Each video can only be watched once.", show_alert=True)
-
-                            # Notify admin about attempted re-completion
-                            first_name = call.from_user.first_name or "Unknown"
-                            username = call.from_user.username or "No Username"
-                            task_name = task_sections[section][task_index][:50]
-
-                            notify_admin_user_action(
-                                call.from_user.id, 
-                                first_name, 
-                                username, 
-                                f"🚫 Attempted Re-completion", 
-                                f"Section: {section.replace('_', ' ').title()}, Task: {task_name}..."
-                            )
-                            return
-
-                    # Get task details
-                    task = task_sections[section][task_index]
-                    link = extract_link_from_task(task)
-                    reward = extract_reward_from_task(task)
-                    task_parts = task.split(" - ")
-                    task_name = task_parts[0] if task_parts else task[:50]
-
-                    # Check for auto-balance feature
-                    auto_added, auto_reward = auto_add_balance_for_task(call.from_user.id, task, section, task_index)
-
-                    # Notify admin about task start
-                    balance = user_balances.get(call.from_user.id, 0)
-                    first_name = call.from_user.first_name or "Unknown"
-                    username = call.from_user.username or "No Username"
-
-                    task_type = section.replace('_', ' ').title()
-                    reward_text = f"₹{reward}" if reward > 0 and not is_client_task(task) else "Admin Determined"
-
-                    notify_admin_user_action(
-                        call.from_user.id, 
-                        first_name, 
-                        username, 
-                        f"🎯 Started {task_type} Task (Auto-Tracking)", 
-                        f"Task: {task_name[:50]}..., Reward: {reward_text}, Auto-Added: {'Yes' if auto_added else 'No'}"
-                    )
-
-                    # Store task info
-                    pending_tasks[call.from_user.id] = {
-                        'task': task,
-                        'task_name': task_name,
-                        'section': section,
-                        'task_index': task_index,
-                        'reward': reward,
-                        'link': link
-                    }
-
-                    # Handle client tasks
-                    if is_client_task(task):
-                        try:
-                            tracking_part = task.split("TRACKING:")[1].split(" - ")[0]
-                            original_part = task.split("ORIGINAL:")[1].split(" - ")[0] if " - " in task.split("ORIGINAL:")[1] else task.split("ORIGINAL:")[1]
-                            client_id = tracking_part.split("_")[0]
-                            tracking_link = generate_client_tracking_link(client_id, tracking_part.split("_")[1])
-
-                            markup = types.InlineKeyboardMarkup()
-                            markup.add(types.InlineKeyboardButton("🔗 Visit Website", url=original_part))
-                            markup.add(types.InlineKeyboardButton("✅ Complete Task", url=tracking_link))
-
-                            # Fixed Markdown formatting to avoid parsing errors
-                            task_info = f"🎯 Client Task (Real-Time Tracking): {task_name}\n"
-                            task_info += f"💡 Reward: Determined by admin\n\n"
-                            task_info += f"Steps:\n"
-                            task_info += f"1. Click 'Visit Website'\n"
-                            task_info += f"2. Complete the required action\n"
-                            task_info += f"3. Click 'Complete Task'\n"
-                            task_info += f"4. Submit screenshot\n"
-                            task_info += f"5. Wait for approval\n\n"
-                            task_info += f"🔄 Auto-Tracking: Active\n"
-                            task_info += f"🚨 Admin will get instant notification!"
-
-                            bot.send_message(call.from_user.id, task_info, reply_markup=markup)
-                            bot.answer_callback_query(call.id, "✅ Client task loaded!")
-
-                        except Exception as e:
-                            bot.answer_callback_query(call.id, "❌ Error processing client task!", show_alert=True)
-                            print(f"Client task error: {e}")
-
-                    elif link:
-                        markup = types.InlineKeyboardMarkup()
-                        markup.add(types.InlineKeyboardButton("🔗 Visit Website", url=link))
-
-                        # Add tracking link for ALL sections including promotional
-                        if section in ['watch_ads', 'app_downloads', 'promotional']:
-                            tracking_link = generate_task_tracking_link(section, task_index, f"task{task_index+1}")
-                            markup.add(types.InlineKeyboardButton("🎯 Track Activity", url=tracking_link))
-
-                        # Only add Complete Task button for non-watch_ads sections
-                        if section != 'watch_ads':
-                            markup.add(types.InlineKeyboardButton("✅ Complete Task", callback_data=f"finish_task_{section}_{task_index}"))
-
-                        # Fixed Markdown formatting to avoid parsing errors
-                        task_info = f"📝 Task (Enhanced Tracking): {task_name}\n"
-                        if reward > 0:
-                            task_info += f"💰 Reward: ₹{reward}\n"
-
-                        if auto_added:
-                            task_info += f"✅ Auto-Added: ₹{auto_reward} (task completed!)\n"
-
-                        if section == 'watch_ads':
-                            task_info += "🔒 Type: One-time only\n"
-                            task_info += "📺 Enhanced Tracking: Active\n"
-                        elif section == 'app_downloads':
-                            task_info += "🔒 Type: One-time only\n"
-                            task_info += "📱 Enhanced Tracking: Active\n"
-                        elif section == 'promotional':
-                            task_info += "🔒 Type: One-time only\n"
-
-                        if auto_added:
-                            task_info += "\n✅ Task Completed Automatically!\n📸 You can still submit screenshot for verification"
-                        else:
-                            if section in ['watch_ads', 'app_downloads', 'promotional']:
-                                task_info += "\n📋 **Complete Task Steps:**\n"
-                                task_info += "1️⃣ Click 'Visit Website'\n"
-                                task_info += "2️⃣ Complete the required action\n"
-                                task_info += "3️⃣ Click 'Track Activity' (🚨 IMPORTANT for verification)\n"
-                                task_info += "4️⃣ Click 'Complete Task'\n"
-                                task_info += "5️⃣ Submit screenshot proof\n\n"
-                                task_info += "🔍 **Enhanced Tracking Features:**\n"
-                                task_info += "✅ Real-time activity monitoring\n"
-                                task_info += "🚨 Instant admin notifications\n"
-                                task_info += "📊 Engagement verification\n"
-                                task_info += "🛡️ Anti-fraud protection\n\n"
-                                task_info += "💡 **Note:** Tracking link proves you visited the website!"
-                            else:
-                                task_info += "\nSteps:\n1. Click 'Visit Website'\n2. Complete the required action\n3. Click 'Complete Task'\n4. Submit screenshot\n\n🔄 Auto-Tracking: Active"
-
-                        bot.send_message(call.from_user.id, task_info, reply_markup=markup)
-
-                        if auto_added:
-                            bot.answer_callback_query(call.id, f"✅ Task completed! ₹{auto_reward} added automatically!")
-                        else:
-                            if section in ['watch_ads', 'app_downloads']:
-                                bot.answer_callback_query(call.id, "✅ Task loaded with enhanced tracking!")
-                            else:
-                                bot.answer_callback_query(call.id, "✅ Task loaded successfully!")
-                    else:
-                        bot.answer_callback_query(call.id, "❌ No valid link found!", show_alert=True)
-                else:
-                    bot.answer_callback_query(call.id, "❌ Invalid task format!", show_alert=True)
-            except ValueError as e:
-                bot.answer_callback_query(call.id, "❌ Invalid task index!", show_alert=True)
-                print(f"Task index error: {e}")
-            except Exception as e:
-                bot.answer_callback_query(call.id, "❌ Error loading task!", show_alert=True)
-                print(f"Task completion error: {e}")
+        # Validate task index
+        if not (0 <= task_index < len(task_sections[section])):
+            answer_callback(call, "❌ Task not found!", show_alert=True, follow_up=True)
             return
 
-        # Handle approval/rejection for task submissions
-        elif call.data.startswith("approve_"):
-            uid = int(call.data.split("_")[1])
-
-            if uid in pending_tasks:
-                task_data = pending_tasks[uid]
-                section = task_data.get('section', '')
-                task_index = task_data.get('task_index', 0)
-                task_name = task_data.get('task_name', 'Unknown Task')
+        # Check completion limits for all sections
+        if section in ['app_downloads', 'promotional', 'watch_ads']:
+            user_completed = completed_tasks.get(call.from_user.id, set())
+            task_key = f"{section}_{task_index}"
+
+            if task_key in user_completed:
+                if section == 'app_downloads':
+                    answer_callback(call, "🚫 You have already completed this App Download task! Each app can only be downloaded once.", show_alert=True, follow_up=True)
+                elif section == 'promotional':
+                    answer_callback(call, "🚫 You have already completed this Promotional task! Each promotional task can only be done once.", show_alert=True, follow_up=True)
+                elif section == 'watch_ads':
+                    answer_callback(call, "🚫 You have already completed this Watch Ads task! Each video can only be watched once.", show_alert=True, follow_up=True)
+                return
 
-                # Mark as completed for limited sections
-                if section in ['app_downloads', 'promotional', 'watch_ads']:
-                    if uid not in completed_tasks:
-                        completed_tasks[uid] = set()
-                    completed_tasks[uid].add(f"{section}_{task_index}")
+        # Get task details
+        task = task_sections[section][task_index]
+        reward = extract_reward_from_task(task)
+        task_parts = task.split(" - ")
+        task_name = task_parts[0] if task_parts else task[:50]
+
+        # Check for auto-balance feature
+        auto_added, auto_reward = auto_add_balance_for_task(call.from_user.id, task, section, task_index)
+
+        # Notify admin about task completion
+        balance = user_balances.get(call.from_user.id, 0)
+        first_name = call.from_user.first_name or "Unknown"
+        username = call.from_user.username or "No Username"
+
+        task_type = section.replace('_', ' ').title()
+        reward_text = f"₹{reward}" if reward > 0 and not is_client_task(task) else "Admin Determined"
+
+        notify_admin_user_action(
+            call.from_user.id, 
+            first_name, 
+            username, 
+            f"✅ Completed {task_type} Task (Auto-Complete)", 
+            f"Task: {task_name[:50]}..., Reward: {reward_text}, Auto-Added: {'Yes' if auto_added else 'No'}"
+        )
 
-                pending_tasks.pop(uid, None)
-                save_data()
-                print(f"✅ Task completed - User: {uid}, Section: {section}")
+        if auto_added:
+            completion_msg = f"✅ **Task Completed Successfully!**\n\n"
+            completion_msg += f"📝 **Task:** {task_name}\n"
+            completion_msg += f"💰 **Reward:** ₹{auto_reward} (Auto-Added)\n"
+            completion_msg += f"🔄 **Type:** {task_type}\n\n"
+            completion_msg += f"✅ **Balance automatically updated!**\n"
+            completion_msg += f"📸 You can still submit screenshot for verification"
 
-                task = task_data.get('task', '')
-                if is_client_task(task):
-                    bot.send_message(uid, f"✅ Client task approved!\n📝 Task: {task_name}\n⚠️ Admin will add reward manually.")
-                else:
-                    reward = task_data.get('reward', 0)
-                    bot.send_message(uid, f"✅ Task approved!\n📝 Task: {task_name}\n⚠️ Admin will add ₹{reward} manually.")
-            else:
-                bot.send_message(uid, "✅ Task approved!")
+            bot.send_message(call.from_user.id, completion_msg, parse_mode="Markdown")
+            answer_callback(call, f"✅ Task completed! ₹{auto_reward} added automatically!")
+        else:
+            completion_msg = f"✅ **Task Marked as Completed!**\n\n"
+            completion_msg += f"📝 **Task:** {task_name}\n"
+            completion_msg += f"💰 **Reward:** ₹{reward} (Pending)\n"
+            completion_msg += f"🔄 **Type:** {task_type}\n\n"
+            completion_msg += f"📸 **Next Step:** Submit screenshot for admin approval\n"
+            completion_msg += f"⚠️ **Note:** Balance will be added after admin verification"
+
+            bot.send_message(call.from_user.id, completion_msg, parse_mode="Markdown")
+            answer_callback(call, "✅ Task completed! Now submit screenshot for verification.")
+    except Exception as e:
+        answer_callback(call, "❌ Error completing task!", show_alert=True)
+        print(f"Task completion error: {e}")
 
-            bot.edit_message_caption(
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                caption=f"✅ Approved task from user {uid}. (Admin must use /addbalance manually)"
-            )
+@callback_router.route("complete_", str, int, prefix=True, invalid_message="❌ Invalid task format!")
+def cb_complete_task(call, section, task_index):
+    """Open a task with auto-balance and tracking links"""
+    try:
+        # Validate section exists
+        if section not in task_sections:
+            answer_callback(call, "❌ Invalid task section!", show_alert=True, follow_up=True)
+            return
 
-        elif call.data.startswith("reject_"):
-            uid = int(call.data.split("_")[1])
-            bot.send_message(uid, "❌ Task proof rejected. Please follow requirements properly.")
-            bot.edit_message_caption(
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                caption=f"❌ Rejected task from user {uid}."
-            )
+        # Validate task index
+        if not (0 <= task_index < len(task_sections[section])):
+            answer_callback(call, "❌ Task not found!", show_alert=True, follow_up=True)
+            return
 
-        # Admin management callbacks
-        elif call.data.startswith("admin_"):
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
+        # Check completion limits for all sections including watch_ads
+        if section in ['app_downloads', 'promotional', 'watch_ads']:
+            user_completed = completed_tasks.get(call.from_user.id, set())
+            task_key = f"{section}_{task_index}"
+
+            if task_key in user_completed:
+                if section == 'app_downloads':
+                    answer_callback(call, "🚫 You have already completed this App Download task! Each app can only be downloaded once.", show_alert=True, follow_up=True)
+                elif section == 'promotional':
+                    answer_callback(call, "🚫 You have already completed this Promotional task! Each promotional task can only be done once.", show_alert=True, follow_up=True)
+                elif section == 'watch_ads':
+                    answer_callback(call, "🚫 You have already completed this Watch Ads task! Each video can only be watched once.", show_alert=True, follow_up=True)
+
+                # Notify admin about attempted re-completion
+                first_name = call.from_user.first_name or "Unknown"
+                username = call.from_user.username or "No Username"
+                task_name = task_sections[section][task_index][:50]
+
+                notify_admin_user_action(
+                    call.from_user.id, 
+                    first_name, 
+                    username, 
+                    f"🚫 Attempted Re-completion", 
+                    f"Section: {section.replace('_', ' ').title()}, Task: {task_name}..."
+                )
                 return
 
-            if call.data == "admin_add_task":
-                markup = generate_task_add_markup()
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="➕ **Add New Task**\n\nSelect task category:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+        # Get task details
+        task = task_sections[section][task_index]
+        link = extract_link_from_task(task)
+        reward = extract_reward_from_task(task)
+        task_parts = task.split(" - ")
+        task_name = task_parts[0] if task_parts else task[:50]
+
+        # Check for auto-balance feature
+        auto_added, auto_reward = auto_add_balance_for_task(call.from_user.id, task, section, task_index)
+
+        # Notify admin about task start
+        balance = user_balances.get(call.from_user.id, 0)
+        first_name = call.from_user.first_name or "Unknown"
+        username = call.from_user.username or "No Username"
+
+        task_type = section.replace('_', ' ').title()
+        reward_text = f"₹{reward}" if reward > 0 and not is_client_task(task) else "Admin Determined"
+
+        notify_admin_user_action(
+            call.from_user.id, 
+            first_name, 
+            username, 
+            f"🎯 Started {task_type} Task (Auto-Tracking)", 
+            f"Task: {task_name[:50]}..., Reward: {reward_text}, Auto-Added: {'Yes' if auto_added else 'No'}"
+        )
 
-            elif call.data == "admin_watch_ads":
-                watch_ads_list = "📺 **Watch Ads Tasks:**\n\n"
-                if task_sections['watch_ads']:
-                    for i, task in enumerate(task_sections['watch_ads'], 1):
-                        task_preview = task[:50] + "..." if len(task) > 50 else task
-                        reward = extract_reward_from_task(task)
-                        watch_ads_list += f"{i}. {task_preview}"
-                        if reward > 0:
-                            watch_ads_list += f" (₹{reward})"
-                        watch_ads_list += "\n"
-                else:
-                    watch_ads_list += "❌ No watch ads tasks available"
+        # Store task info
+        storage.put('pending_tasks', call.from_user.id, {
+            'task': task,
+            'task_name': task_name,
+            'section': section,
+            'task_index': task_index,
+            'reward': reward,
+            'link': link
+        })
+
+        # Handle client tasks
+        if is_client_task(task):
+            try:
+                tracking_part = task.split("TRACKING:")[1].split(" - ")[0]
+                original_part = task.split("ORIGINAL:")[1].split(" - ")[0] if " - " in task.split("ORIGINAL:")[1] else task.split("ORIGINAL:")[1]
+                client_id = tracking_part.split("_")[0]
+                tracking_link = generate_client_tracking_link(client_id, tracking_part.split("_")[1])
 
                 markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("➕ Add Watch Ads Task", callback_data="add_watch_ads"))
-                if task_sections['watch_ads']:
-                    markup.add(types.InlineKeyboardButton("🗑️ Remove Watch Ads", callback_data="remove_watch_ads"))
-                markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=watch_ads_list,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+                markup.add(types.InlineKeyboardButton("🔗 Visit Website", url=original_part))
+                markup.add(types.InlineKeyboardButton("✅ Complete Task", url=tracking_link))
+
+                # Fixed Markdown formatting to avoid parsing errors
+                task_info = f"🎯 Client Task (Real-Time Tracking): {task_name}\n"
+                task_info += f"💡 Reward: Determined by admin\n\n"
+                task_info += f"Steps:\n"
+                task_info += f"1. Click 'Visit Website'\n"
+                task_info += f"2. Complete the required action\n"
+                task_info += f"3. Click 'Complete Task'\n"
+                task_info += f"4. Submit screenshot\n"
+                task_info += f"5. Wait for approval\n\n"
+                task_info += f"🔄 Auto-Tracking: Active\n"
+                task_info += f"🚨 Admin will get instant notification!"
+
+                bot.send_message(call.from_user.id, task_info, reply_markup=markup)
+                answer_callback(call, "✅ Client task loaded!")
+
+            except Exception as e:
+                answer_callback(call, "❌ Error processing client task!", show_alert=True)
+                print(f"Client task error: {e}")
 
-            elif call.data == "admin_app_downloads":
-                app_downloads_list = "📱 **App Download Tasks:**\n\n"
-                if task_sections['app_downloads']:
-                    for i, task in enumerate(task_sections['app_downloads'], 1):
-                        task_preview = task[:50] + "..." if len(task) > 50 else task
-                        reward = extract_reward_from_task(task)
-                        app_downloads_list += f"{i}. {task_preview}"
-                        if reward > 0:
-                            app_downloads_list += f" (₹{reward})"
-                        app_downloads_list += "\n"
+        elif link:
+            markup = types.InlineKeyboardMarkup()
+            markup.add(types.InlineKeyboardButton("🔗 Visit Website", url=link))
+
+            # Add tracking link for ALL sections including promotional
+            if section in ['watch_ads', 'app_downloads', 'promotional']:
+                tracking_link = generate_task_tracking_link(section, task_index, f"task{task_index+1}")
+                markup.add(types.InlineKeyboardButton("🎯 Track Activity", url=tracking_link))
+
+            # Only add Complete Task button for non-watch_ads sections
+            if section != 'watch_ads':
+                markup.add(types.InlineKeyboardButton("✅ Complete Task", callback_data=f"finish_task_{section}_{task_index}"))
+
+            # Fixed Markdown formatting to avoid parsing errors
+            task_info = f"📝 Task (Enhanced Tracking): {task_name}\n"
+            if reward > 0:
+                task_info += f"💰 Reward: ₹{reward}\n"
+
+            if auto_added:
+                task_info += f"✅ Auto-Added: ₹{auto_reward} (task completed!)\n"
+
+            if section == 'watch_ads':
+                task_info += "🔒 Type: One-time only\n"
+                task_info += "📺 Enhanced Tracking: Active\n"
+            elif section == 'app_downloads':
+                task_info += "🔒 Type: One-time only\n"
+                task_info += "📱 Enhanced Tracking: Active\n"
+            elif section == 'promotional':
+                task_info += "🔒 Type: One-time only\n"
+
+            if auto_added:
+                task_info += "\n✅ Task Completed Automatically!\n📸 You can still submit screenshot for verification"
+            else:
+                if section in ['watch_ads', 'app_downloads', 'promotional']:
+                    task_info += "\n📋 **Complete Task Steps:**\n"
+                    task_info += "1️⃣ Click 'Visit Website'\n"
+                    task_info += "2️⃣ Complete the required action\n"
+                    task_info += "3️⃣ Click 'Track Activity' (🚨 IMPORTANT for verification)\n"
+                    task_info += "4️⃣ Click 'Complete Task'\n"
+                    task_info += "5️⃣ Submit screenshot proof\n\n"
+                    task_info += "🔍 **Enhanced Tracking Features:**\n"
+                    task_info += "✅ Real-time activity monitoring\n"
+                    task_info += "🚨 Instant admin notifications\n"
+                    task_info += "📊 Engagement verification\n"
+                    task_info += "🛡️ Anti-fraud protection\n\n"
+                    task_info += "💡 **Note:** Tracking link proves you visited the website!"
                 else:
-                    app_downloads_list += "❌ No app download tasks available"
+                    task_info += "\nSteps:\n1. Click 'Visit Website'\n2. Complete the required action\n3. Click 'Complete Task'\n4. Submit screenshot\n\n🔄 Auto-Tracking: Active"
 
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("➕ Add App Download Task", callback_data="add_app_downloads"))
-                if task_sections['app_downloads']:
-                    markup.add(types.InlineKeyboardButton("🗑️ Remove App Downloads", callback_data="remove_app_downloads"))
-                markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=app_downloads_list,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+            bot.send_message(call.from_user.id, task_info, reply_markup=markup)
 
-            elif call.data == "admin_promotional":
-                promotional_list = "📢 **Promotional Tasks:**\n\n"
-                if task_sections['promotional']:
-                    for i, task in enumerate(task_sections['promotional'], 1):
-                        task_preview = task[:50] + "..." if len(task) > 50 else task
-                        if is_client_task(task):
-                            promotional_list += f"{i}. 🎯 {task_preview} (Client Task)\n"
-                        else:
-                            reward = extract_reward_from_task(task)
-                            promotional_list += f"{i}. {task_preview}"
-                            if reward > 0:
-                                promotional_list += f" (₹{reward})"
-                            promotional_list += "\n"
+            if auto_added:
+                answer_callback(call, f"✅ Task completed! ₹{auto_reward} added automatically!")
+            else:
+                if section in ['watch_ads', 'app_downloads']:
+                    answer_callback(call, "✅ Task loaded with enhanced tracking!")
                 else:
-                    promotional_list += "❌ No promotional tasks available"
+                    answer_callback(call, "✅ Task loaded successfully!")
+        else:
+            answer_callback(call, "❌ No valid link found!", show_alert=True)
+    except Exception as e:
+        answer_callback(call, "❌ Error loading task!", show_alert=True)
+        print(f"Task completion error: {e}")
+
+@callback_router.route("tasks_page_", str, int, prefix=True, invalid_message="❌ Invalid page!")
+def cb_task_page(call, section, page):
+    """Flip a task list page by editing the keyboard in place"""
+    if not task_sections.get(section):
+        answer_callback(call, "📋 No tasks available in this section.", follow_up=True)
+        return
+    bot.edit_message_reply_markup(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        reply_markup=task_keyboards.render(section, call.from_user.id, page)
+    )
 
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("➕ Add Promotional Task", callback_data="add_promotional"))
-                if task_sections['promotional']:
-                    markup.add(types.InlineKeyboardButton("🗑️ Remove Promotional", callback_data="remove_promotional"))
-                markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=promotional_list,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("approve_", int, prefix=True)
+def cb_approve_task(call, uid):
+    """Approve a proof screenshot"""
+    if uid in pending_tasks:
+        task_data = pending_tasks[uid]
+        section = task_data.get('section', '')
+        task_index = task_data.get('task_index', 0)
+        task_name = task_data.get('task_name', 'Unknown Task')
+
+        # Mark as completed for limited sections
+        if section in ['app_downloads', 'promotional', 'watch_ads']:
+            with transaction(uid) as tx:
+                tx.add('completed_tasks', uid, f"{section}_{task_index}")
+
+        storage.delete('pending_tasks', uid)
+        save_data()
+        print(f"✅ Task completed - User: {uid}, Section: {section}")
+
+        task = task_data.get('task', '')
+        if is_client_task(task):
+            bot.send_message(uid, f"✅ Client task approved!\n📝 Task: {task_name}\n⚠️ Admin will add reward manually.")
+        else:
+            reward = task_data.get('reward', 0)
+            bot.send_message(uid, f"✅ Task approved!\n📝 Task: {task_name}\n⚠️ Admin will add ₹{reward} manually.")
+    else:
+        bot.send_message(uid, "✅ Task approved!")
 
-            elif call.data == "admin_client_tasks":
-                client_list = "🎯 **Client Tasks Management:**\n\n"
-                if client_tasks:
-                    for client_id, task_data in client_tasks.items():
-                        client_name = task_data.get('info', 'Unknown Client')
-                        links_count = len(task_data.get('links', []))
-                        referrals_count = len(client_referrals.get(client_id, []))
-                        created_date = task_data.get('created_at', 'Unknown')[:10]
-
-                        client_list += f"🏷️ **ID:** {client_id}\n"
-                        client_list += f"📋 **Name:** {client_name}\n"
-                        client_list += f"🔗 **Links:** {links_count}\n"
-                        client_list += f"👥 **Completions:** {referrals_count}\n"
-                        client_list += f"📅 **Created:** {created_date}\n\n"
-                else:
-                    client_list += "❌ No client tasks available\n\n"
+    bot.edit_message_caption(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        caption=f"✅ Approved task from user {uid}. (Admin must use /addbalance manually)"
+    )
 
-                client_list += "🔧 **Simple Management:**\n"
-                client_list += "🔗 **Add Link** - Paste it, auto-tracking will be enabled\n"
-                client_list += "🗑️ **Remove Link** - Delete client task"
+@callback_router.route("reject_", int, prefix=True)
+def cb_reject_task(call, uid):
+    """Reject a proof screenshot"""
+    bot.send_message(uid, "❌ Task proof rejected. Please follow requirements properly.")
+    bot.edit_message_caption(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        caption=f"❌ Rejected task from user {uid}."
+    )
 
-                markup = generate_client_task_options()
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=client_list,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("proof_ok_", int, prefix=True, admin_only=True)
+def cb_approve_proof(call, submission_id):
+    """Approve one submission from a review page"""
+    if review_proofs([submission_id], approve=True):
+        answer_callback(call, f"✅ Proof #{submission_id} approved", follow_up=True)
+    else:
+        answer_callback(call, f"ℹ️ Proof #{submission_id} was already reviewed", follow_up=True)
 
-            elif call.data == "admin_remove_task":
-                markup = generate_enhanced_remove_task_markup()
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🗑️ **Remove Tasks**\n\nSelect category to remove tasks from:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("proof_no_", int, prefix=True, admin_only=True)
+def cb_reject_proof(call, submission_id):
+    """Reject one submission from a review page"""
+    if review_proofs([submission_id], approve=False):
+        answer_callback(call, f"❌ Proof #{submission_id} rejected", follow_up=True)
+    else:
+        answer_callback(call, f"ℹ️ Proof #{submission_id} was already reviewed", follow_up=True)
 
-            elif call.data == "admin_referral_mgmt":
-                referral_stats = ""
-                if referral_data:
-                    referrer_counts = {}
-                    for referred_user, referrer in referral_data.items():
-                        referrer_counts[referrer] = referrer_counts.get(referrer, 0) + 1
-
-                    referral_stats = "📊 **Top Referrers:**\n"
-                    for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
-                        earnings = count * 5
-                        referral_stats += f"👤 User {referrer}: {count} referrals (₹{earnings})\n"
-                    referral_stats += f"\n📈 **Total:** {len(referral_data)} referrals\n"
-                else:
-                    referral_stats = "📊 **No referrals yet**\n"
+def finish_proof_page(call, first, last, approve):
+    count = review_proofs(range(first, last + 1), approve)
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("📥 Next Page", callback_data="proofs_next"))
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=f"{'✅ Approved' if approve else '❌ Rejected'} {count} proofs (#{first}-#{last}).\n📤 {len(proof_submissions)} still pending.",
+        reply_markup=markup
+    )
 
-                referral_info = f"👥 **Referral Management Panel**\n\n{referral_stats}\n"
-                referral_info += "🔧 **Available Commands:**\n"
-                referral_info += "• `/resetreferral user_id` - Reset user's referral status\n"
-                referral_info += "• `/referralstats` - View detailed statistics\n\n"
-                referral_info += "💡 **How it works:**\n"
-                referral_info += "• Normally each user can only be referred once\n"
-                referral_info += "• Reset allows user to be referred again\n"
-                referral_info += "• Both referrer and new user get ₹5 bonus"
+@callback_router.route("proofs_ok_", int, int, prefix=True, admin_only=True)
+def cb_approve_proof_page(call, first, last):
+    """Approve every pending submission on a review page"""
+    finish_proof_page(call, first, last, approve=True)
+
+@callback_router.route("proofs_no_", int, int, prefix=True, admin_only=True)
+def cb_reject_proof_page(call, first, last):
+    """Reject every pending submission on a review page"""
+    finish_proof_page(call, first, last, approve=False)
+
+@callback_router.route("proofs_next", admin_only=True)
+def cb_next_proof_page(call):
+    send_proof_page(call.message.chat.id)
+
+@callback_router.route("admin_add_task", admin_only=True)
+def cb_admin_add_task(call):
+    markup = generate_task_add_markup()
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="➕ **Add New Task**\n\nSelect task category:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("🔄 Reset User Referral", callback_data="reset_referral_prompt"))
-                markup.add(types.InlineKeyboardButton("📊 View Detailed Stats", callback_data="show_referral_stats"))
-                markup.add(types.InlineKeyboardButton("🔙 Back to Admin Panel", callback_data="back_to_admin"))
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=referral_info,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("admin_watch_ads", admin_only=True)
+def cb_admin_watch_ads(call):
+    watch_ads_list = "📺 **Watch Ads Tasks:**\n\n"
+    if task_sections['watch_ads']:
+        for i, task in enumerate(task_sections['watch_ads'], 1):
+            task_preview = task[:50] + "..." if len(task) > 50 else task
+            reward = extract_reward_from_task(task)
+            watch_ads_list += f"{i}. {task_preview}"
+            if reward > 0:
+                watch_ads_list += f" (₹{reward})"
+            watch_ads_list += "\n"
+    else:
+        watch_ads_list += "❌ No watch ads tasks available"
 
-            elif call.data == "reset_referral_prompt":
-                awaiting_referral_reset[call.from_user.id] = True
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🔄 **Reset User Referral**\n\n📝 **Send the User ID to reset:**\n\n💡 **Example:** 123456789\n\n⚠️ **Note:** This will allow the user to be referred again",
-                    parse_mode="Markdown"
-                )
-                bot.answer_callback_query(call.id, "📝 Send user ID to reset")
-
-            elif call.data == "show_referral_stats":
-                if referral_data:
-                    stats = "👥 **Detailed Referral Statistics:**\n\n"
-                    referrer_counts = {}
-
-                    for referred_user, referrer in referral_data.items():
-                        referrer_counts[referrer] = referrer_counts.get(referrer, 0) + 1
-
-                    stats += "📊 **All Referrers:**\n"
-                    for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True):
-                        earnings = count * 5
-                        stats += f"👤 **User {referrer}:** {count} referrals (₹{earnings} earned)\n"
-
-                    stats += f"\n📈 **Summary:**\n"
-                    stats += f"• Total Referrals: {len(referral_data)}\n"
-                    stats += f"• Unique Referrers: {len(referrer_counts)}\n"
-                    stats += f"• Total Bonus Paid: ₹{len(referral_data) * 10}\n"
-
-                    markup = types.InlineKeyboardMarkup()
-                    markup.add(types.InlineKeyboardButton("🔙 Back to Referral Management", callback_data="admin_referral_mgmt"))
-
-                    bot.edit_message_text(
-                        chat_id=call.message.chat.id,
-                        message_id=call.message.message_id,
-                        text=stats,
-                        parse_mode="Markdown",
-                        reply_markup=markup
-                    )
-                else:
-                    bot.answer_callback_query(call.id, "❌ No referral data available!", show_alert=True)
-
-            elif call.data == "admin_send_notice":
-                awaiting_notice[call.from_user.id] = True
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="📢 **Send Notice to All Users**\n\n📝 **Instructions:**\n• Send your notice message in next message\n• It will be sent to ALL registered users\n• Message will include timestamp\n\n💡 **Example:** Important update about bot features\n\n⚠️ **Note:** This will send to all users except admin",
-                    parse_mode="Markdown"
-                )
-                bot.answer_callback_query(call.id, "📝 Send your notice message now")
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("➕ Add Watch Ads Task", callback_data="add_watch_ads"))
+    if task_sections['watch_ads']:
+        markup.add(types.InlineKeyboardButton("🗑️ Remove Watch Ads", callback_data="remove_watch_ads"))
+    markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
+
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=watch_ads_list,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-        # Task addition callbacks
-        elif call.data.startswith("add_"):
-            section = call.data.replace("add_", "")
-            if section in task_sections:
-                awaiting_task_add[call.from_user.id] = section
-                section_name = section.replace('_', ' ').title()
+@callback_router.route("admin_app_downloads", admin_only=True)
+def cb_admin_app_downloads(call):
+    app_downloads_list = "📱 **App Download Tasks:**\n\n"
+    if task_sections['app_downloads']:
+        for i, task in enumerate(task_sections['app_downloads'], 1):
+            task_preview = task[:50] + "..." if len(task) > 50 else task
+            reward = extract_reward_from_task(task)
+            app_downloads_list += f"{i}. {task_preview}"
+            if reward > 0:
+                app_downloads_list += f" (₹{reward})"
+            app_downloads_list += "\n"
+    else:
+        app_downloads_list += "❌ No app download tasks available"
 
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=f"➕ **Add {section_name} Task**\n\n📝 **Format:** Task Name - https://example.com ₹10\n\n✅ **Auto-Features:**\n💰 **Auto-Reward:** ₹0.1+ will be added automatically\n⚠️ **Manual Reward:** Below ₹0.1 or no amount = manual /addbalance\n🔄 **Auto-Tracking:** Always enabled\n\n💡 **Examples:**\n• `Watch Video - https://youtube.com ₹5` ✅ Auto\n• `Download App - https://play.google.com ₹0.05` ❌ Manual\n• `Visit Website - https://example.com` ❌ Manual",
-                    parse_mode="Markdown"
-                )
-                bot.answer_callback_query(call.id, f"📝 Send {section_name} task details")
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("➕ Add App Download Task", callback_data="add_app_downloads"))
+    if task_sections['app_downloads']:
+        markup.add(types.InlineKeyboardButton("🗑️ Remove App Downloads", callback_data="remove_app_downloads"))
+    markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
+
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=app_downloads_list,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-        # Task removal callbacks
-        elif call.data.startswith("remove_"):
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("admin_promotional", admin_only=True)
+def cb_admin_promotional(call):
+    promotional_list = "📢 **Promotional Tasks:**\n\n"
+    if task_sections['promotional']:
+        for i, task in enumerate(task_sections['promotional'], 1):
+            task_preview = task[:50] + "..." if len(task) > 50 else task
+            if is_client_task(task):
+                promotional_list += f"{i}. 🎯 {task_preview} (Client Task)\n"
+            else:
+                reward = extract_reward_from_task(task)
+                promotional_list += f"{i}. {task_preview}"
+                if reward > 0:
+                    promotional_list += f" (₹{reward})"
+                promotional_list += "\n"
+    else:
+        promotional_list += "❌ No promotional tasks available"
 
-            if call.data == "remove_watch_ads":
-                markup = generate_task_removal_list("watch_ads")
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🗑️ **Remove Watch Ads Tasks:**\n\nSelect task to remove:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("➕ Add Promotional Task", callback_data="add_promotional"))
+    if task_sections['promotional']:
+        markup.add(types.InlineKeyboardButton("🗑️ Remove Promotional", callback_data="remove_promotional"))
+    markup.add(types.InlineKeyboardButton("🔙 Back to Tasks", callback_data="back_to_admin"))
+
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=promotional_list,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-            elif call.data == "remove_app_downloads":
-                markup = generate_task_removal_list("app_downloads")
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🗑️ **Remove App Download Tasks:**\n\nSelect task to remove:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("admin_client_tasks", admin_only=True)
+def cb_admin_client_tasks(call):
+    client_list = "🎯 **Client Tasks Management:**\n\n"
+    if client_tasks:
+        for client_id, task_data in client_tasks.items():
+            client_name = task_data.get('info', 'Unknown Client')
+            links_count = len(task_data.get('links', []))
+            referrals_count = len(client_referrals.get(client_id, []))
+            created_date = task_data.get('created_at', 'Unknown')[:10]
+
+            client_list += f"🏷️ **ID:** {client_id}\n"
+            client_list += f"📋 **Name:** {client_name}\n"
+            client_list += f"🔗 **Links:** {links_count}\n"
+            client_list += f"👥 **Completions:** {referrals_count}\n"
+            client_list += f"📅 **Created:** {created_date}\n\n"
+    else:
+        client_list += "❌ No client tasks available\n\n"
 
-            elif call.data == "remove_promotional":
-                markup = generate_task_removal_list("promotional")
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🗑️ **Remove Promotional Tasks:**\n\nSelect task to remove:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+    client_list += "🔧 **Simple Management:**\n"
+    client_list += "🔗 **Add Link** - Paste it, auto-tracking will be enabled\n"
+    client_list += "🗑️ **Remove Link** - Delete client task"
 
-            elif call.data == "remove_client_tasks":
-                markup = generate_task_removal_list("client_tasks")
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="🗑️ **Remove Client Tasks:**\n\nSelect client task to remove:",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+    markup = generate_client_task_options()
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=client_list,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-            elif call.data == "remove_all_tasks":
-                markup = generate_task_removal_list("all_tasks")
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="⚠️ **REMOVE ALL TASKS**\n\n🚨 This will delete ALL tasks from ALL sections!\n\nAre you sure?",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
+@callback_router.route("admin_remove_task", admin_only=True)
+def cb_admin_remove_task(call):
+    markup = generate_enhanced_remove_task_markup()
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🗑️ **Remove Tasks**\n\nSelect category to remove tasks from:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-            elif call.data.startswith("remove_task_"):
-                parts = call.data.split("_")
-                section = "_".join(parts[2:-1])
-                task_index = int(parts[-1])
-
-                if section in task_sections and 0 <= task_index < len(task_sections[section]):
-                    removed_task = task_sections[section].pop(task_index)
-                    save_data()
-
-                    task_preview = removed_task[:50] + "..." if len(removed_task) > 50 else removed_task
-
-                    # Create back navigation markup
-                    markup = types.InlineKeyboardMarkup()
-                    markup.add(types.InlineKeyboardButton("🔙 Back to Remove Tasks", callback_data="admin_remove_task"))
-                    markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
-
-                    bot.edit_message_text(
-                        chat_id=call.message.chat.id,
-                        message_id=call.message.message_id,
-                        text=f"✅ **Task Removed Successfully!**\n\n🗑️ **Removed:** {task_preview}\n📂 **From:** {section.replace('_', ' ').title()}\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
-                        parse_mode="Markdown",
-                        reply_markup=markup
-                    )
-                    bot.answer_callback_query(call.id, "✅ Task removed! Use buttons below to continue.")
-
-            elif call.data.startswith("remove_client_"):
-                client_id = call.data.replace("remove_client_", "")
-                if client_id in client_tasks:
-                    client_name = client_tasks[client_id].get('info', 'Unknown Client')
-
-                    # Remove client task
-                    del client_tasks[client_id]
-
-                    # Remove client referrals
-                    if client_id in client_referrals:
-                        del client_referrals[client_id]
-
-                    # Remove from promotional tasks
-                    task_sections['promotional'] = [
-                        task for task in task_sections['promotional'] 
-                        if not (is_client_task(task) and client_id in task)
-                    ]
-
-                    save_data()
-
-                    # Create back navigation markup
-                    markup = types.InlineKeyboardMarkup()
-                    markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
-                    markup.add(types.InlineKeyboardButton("🗑️ Remove More Tasks", callback_data="admin_remove_task"))
-                    markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
-
-                    bot.edit_message_text(
-                        chat_id=call.message.chat.id,
-                        message_id=call.message.message_id,
-                        text=f"✅ **Client Task Removed Successfully!**\n\n🗑️ **Client:** {client_name}\n🏷️ **ID:** {client_id}\n📂 **Removed from:** All sections\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
-                        parse_mode="Markdown",
-                        reply_markup=markup
-                    )
-                    bot.answer_callback_query(call.id, "✅ Client task removed! Use buttons below to continue.")
-
-            elif call.data == "confirm_delete_all":
-                # Clear all tasks
-                task_sections['watch_ads'].clear()
-                task_sections['app_downloads'].clear()
-                task_sections['promotional'].clear()
-                client_tasks.clear()
-                client_referrals.clear()
-                save_data()
+@callback_router.route("admin_referral_mgmt", admin_only=True)
+def cb_admin_referral_mgmt(call):
+    referral_stats = ""
+    if referral_data:
+        referrer_counts = {}
+        for referred_user, referrer in referral_data.items():
+            referrer_counts[referrer] = referrer_counts.get(referrer, 0) + 1
+
+        referral_stats = "📊 **Top Referrers:**\n"
+        for referrer, count in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
+            earnings = count * 5
+            referral_stats += f"👤 User {referrer}: {count} referrals (₹{earnings})\n"
+        referral_stats += f"\n📈 **Total:** {len(referral_data)} referrals\n"
+    else:
+        referral_stats = "📊 **No referrals yet**\n"
 
-                # Create back navigation markup
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("➕ Add New Tasks", callback_data="admin_add_task"))
-                markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
+    referral_info = f"👥 **Referral Management Panel**\n\n{referral_stats}\n"
+    referral_info += "🔧 **Available Commands:**\n"
+    referral_info += "• `/resetreferral user_id` - Reset user's referral status\n"
+    referral_info += "• `/referralstats` - View detailed statistics\n\n"
+    referral_info += "💡 **How it works:**\n"
+    referral_info += "• Normally each user can only be referred once\n"
+    referral_info += "• Reset allows user to be referred again\n"
+    referral_info += "• Both referrer and new user get ₹5 bonus"
 
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text="✅ **ALL TASKS REMOVED SUCCESSFULLY!**\n\n🗑️ **Cleared:**\n📺 Watch Ads Tasks\n📱 App Download Tasks\n📢 Promotional Tasks\n🎯 Client Tasks\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
-                bot.answer_callback_query(call.id, "✅ All tasks removed! Use buttons below to continue.")
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("🔄 Reset User Referral", callback_data="reset_referral_prompt"))
+    markup.add(types.InlineKeyboardButton("📊 View Detailed Stats", callback_data="show_referral_stats"))
+    markup.add(types.InlineKeyboardButton("🔙 Back to Admin Panel", callback_data="back_to_admin"))
+
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=referral_info,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-        # Simplified client task management callbacks
-        elif call.data == "add_client_task_link":
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("reset_referral_prompt", admin_only=True, ack="📝 Send user ID to reset")
+def cb_reset_referral_prompt(call):
+    set_state(call.from_user.id, 'referral_reset')
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🔄 **Reset User Referral**\n\n📝 **Send the User ID to reset:**\n\n💡 **Example:** 123456789\n\n⚠️ **Note:** This will allow the user to be referred again",
+        parse_mode="Markdown"
+    )
 
-            awaiting_client_data[call.from_user.id] = 'simple_add_link'
-            bot.edit_message_text(
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                text="🔗 **Add Client Task Link**\n\n📝 **Send the link to add:**\n\n💡 **Example:** https://example.com\n\n✅ **Auto Features:**\n🎯 Automatic tracking link generation\n📢 Auto-add to promotional tasks\n🔄 Real-time user tracking",
-                parse_mode="Markdown"
-            )
-            bot.answer_callback_query(call.id, "📝 Send client link")
+@callback_router.route("show_referral_stats", admin_only=True)
+def cb_show_referral_stats(call):
+    if referral_data:
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("🔙 Back to Referral Management", callback_data="admin_referral_mgmt"))
+        analytics_pool.submit('referral_panel', call.message.chat.id, call.message.message_id, done_markup=markup)
+    else:
+        answer_callback(call, "❌ No referral data available!", show_alert=True, follow_up=True)
+
+@callback_router.route("report_cancel_", int, prefix=True, admin_only=True, ack="🚫 Cancelling report...")
+def cb_cancel_report(call, job_id):
+    """Stop a running analytics report; its progress message says when it has stopped"""
+    analytics_pool.cancel(job_id)
+
+@callback_router.route("admin_send_notice", admin_only=True, ack="📝 Send your notice message now")
+def cb_admin_send_notice(call):
+    set_state(call.from_user.id, 'notice')
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="📢 **Send Notice to All Users**\n\n📝 **Instructions:**\n• Send your notice message in next message\n• It will be sent to ALL registered users\n• Message will include timestamp\n\n💡 **Example:** Important update about bot features\n\n⚠️ **Note:** This will send to all users except admin",
+        parse_mode="Markdown"
+    )
 
-        elif call.data == "remove_client_task_link":
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("add_", str, prefix=True)
+def cb_add_task(call, section):
+    """Ask admin for a new task in the chosen section"""
+    if section in task_sections:
+        set_state(call.from_user.id, 'task_add', section)
+        section_name = section.replace('_', ' ').title()
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"➕ **Add {section_name} Task**\n\n📝 **Format:** Task Name - https://example.com ₹10\n\n✅ **Auto-Features:**\n💰 **Auto-Reward:** ₹0.1+ will be added automatically\n⚠️ **Manual Reward:** Below ₹0.1 or no amount = manual /addbalance\n🔄 **Auto-Tracking:** Always enabled\n\n💡 **Examples:**\n• `Watch Video - https://youtube.com ₹5` ✅ Auto\n• `Download App - https://play.google.com ₹0.05` ❌ Manual\n• `Visit Website - https://example.com` ❌ Manual",
+            parse_mode="Markdown"
+        )
+        answer_callback(call, f"📝 Send {section_name} task details")
+
+@callback_router.route("remove_watch_ads", admin_only=True)
+def cb_remove_watch_ads(call):
+    markup = generate_task_removal_list("watch_ads")
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🗑️ **Remove Watch Ads Tasks:**\n\nSelect task to remove:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-            if client_tasks:
-                remove_list = "🗑️ **Remove Client Task Link:**\n\nSelect client task to remove:"
-                markup = types.InlineKeyboardMarkup()
+@callback_router.route("remove_app_downloads", admin_only=True)
+def cb_remove_app_downloads(call):
+    markup = generate_task_removal_list("app_downloads")
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🗑️ **Remove App Download Tasks:**\n\nSelect task to remove:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-                for client_id, task_data in client_tasks.items():
-                    client_name = task_data.get('info', 'Unknown Client')
-                    links_count = len(task_data.get('links', []))
-                    referrals_count = len(client_referrals.get(client_id, []))
-                    button_text = f"🗑️ {client_name} ({links_count}L, {referrals_count}U)"
-                    markup.add(types.InlineKeyboardButton(button_text, callback_data=f"simple_remove_client_{client_id}"))
+@callback_router.route("remove_promotional", admin_only=True)
+def cb_remove_promotional(call):
+    markup = generate_task_removal_list("promotional")
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🗑️ **Remove Promotional Tasks:**\n\nSelect task to remove:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-                markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
+@callback_router.route("remove_client_tasks", admin_only=True)
+def cb_remove_client_tasks(call):
+    markup = generate_task_removal_list("client_tasks")
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🗑️ **Remove Client Tasks:**\n\nSelect client task to remove:",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=remove_list,
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
-            else:
-                bot.answer_callback_query(call.id, "❌ No client tasks available!", show_alert=True)
+@callback_router.route("remove_all_tasks", admin_only=True)
+def cb_remove_all_tasks(call):
+    markup = generate_task_removal_list("all_tasks")
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="⚠️ **REMOVE ALL TASKS**\n\n🚨 This will delete ALL tasks from ALL sections!\n\nAre you sure?",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-        # Simplified client removal callback
-        elif call.data.startswith("simple_remove_client_"):
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("remove_task_", str, int, prefix=True, admin_only=True, invalid_message="❌ Invalid task index!")
+def cb_remove_task(call, section, task_index):
+    if section in task_sections and 0 <= task_index < len(task_sections[section]):
+        removed_task = task_sections[section].pop(task_index)
+        task_keyboards.invalidate(section)
+        save_data()
+
+        task_preview = removed_task[:50] + "..." if len(removed_task) > 50 else removed_task
+
+        # Create back navigation markup
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("🔙 Back to Remove Tasks", callback_data="admin_remove_task"))
+        markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"✅ **Task Removed Successfully!**\n\n🗑️ **Removed:** {task_preview}\n📂 **From:** {section.replace('_', ' ').title()}\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
+            parse_mode="Markdown",
+            reply_markup=markup
+        )
+        answer_callback(call, "✅ Task removed! Use buttons below to continue.")
+
+@callback_router.route("remove_client_", str, prefix=True, admin_only=True)
+def cb_remove_client(call, client_id):
+    if client_id in client_tasks:
+        client_name = client_tasks[client_id].get('info', 'Unknown Client')
+
+        # Remove client task
+        storage.delete('client_tasks', client_id)
+
+        # Remove client referrals
+        storage.delete('client_referrals', client_id)
+
+        # Remove from promotional tasks
+        storage.put('task_sections', 'promotional', [
+            task for task in task_sections['promotional'] 
+            if not (is_client_task(task) and client_id in task)
+        ])
+
+        task_keyboards.invalidate('promotional')
+        save_data()
+
+        # Create back navigation markup
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
+        markup.add(types.InlineKeyboardButton("🗑️ Remove More Tasks", callback_data="admin_remove_task"))
+        markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"✅ **Client Task Removed Successfully!**\n\n🗑️ **Client:** {client_name}\n🏷️ **ID:** {client_id}\n📂 **Removed from:** All sections\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
+            parse_mode="Markdown",
+            reply_markup=markup
+        )
+        answer_callback(call, "✅ Client task removed! Use buttons below to continue.")
+
+@callback_router.route("confirm_delete_all", admin_only=True)
+def cb_confirm_delete_all(call):
+    # Clear all tasks
+    task_sections['watch_ads'].clear()
+    task_sections['app_downloads'].clear()
+    task_sections['promotional'].clear()
+    storage.clear('client_tasks')
+    storage.clear('client_referrals')
+    task_keyboards.invalidate()
+    save_data()
 
-            client_id = call.data.replace("simple_remove_client_", "")
-            if client_id in client_tasks:
-                client_name = client_tasks[client_id].get('info', 'Unknown Client')
+    # Create back navigation markup
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("➕ Add New Tasks", callback_data="admin_add_task"))
+    markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
 
-                # Remove client task
-                del client_tasks[client_id]
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="✅ **ALL TASKS REMOVED SUCCESSFULLY!**\n\n🗑️ **Cleared:**\n📺 Watch Ads Tasks\n📱 App Download Tasks\n📢 Promotional Tasks\n🎯 Client Tasks\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
+    answer_callback(call, "✅ All tasks removed! Use buttons below to continue.")
+
+@callback_router.route("add_client_task_link", admin_only=True, ack="📝 Send client link")
+def cb_add_client_task_link(call):
+    """Simplified client task management"""
+    set_state(call.from_user.id, 'client_data', 'simple_add_link')
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🔗 **Add Client Task Link**\n\n📝 **Send the link to add:**\n\n💡 **Example:** https://example.com\n\n✅ **Auto Features:**\n🎯 Automatic tracking link generation\n📢 Auto-add to promotional tasks\n🔄 Real-time user tracking",
+        parse_mode="Markdown"
+    )
 
-                # Remove client referrals
-                if client_id in client_referrals:
-                    del client_referrals[client_id]
+@callback_router.route("remove_client_task_link", admin_only=True)
+def cb_remove_client_task_link(call):
+    if client_tasks:
+        remove_list = "🗑️ **Remove Client Task Link:**\n\nSelect client task to remove:"
+        markup = types.InlineKeyboardMarkup()
+
+        for client_id, task_data in client_tasks.items():
+            client_name = task_data.get('info', 'Unknown Client')
+            links_count = len(task_data.get('links', []))
+            referrals_count = len(client_referrals.get(client_id, []))
+            button_text = f"🗑️ {client_name} ({links_count}L, {referrals_count}U)"
+            markup.add(types.InlineKeyboardButton(button_text, callback_data=f"simple_remove_client_{client_id}"))
+
+        markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=remove_list,
+            parse_mode="Markdown",
+            reply_markup=markup
+        )
+    else:
+        answer_callback(call, "❌ No client tasks available!", show_alert=True, follow_up=True)
+
+@callback_router.route("simple_remove_client_", str, prefix=True, admin_only=True)
+def cb_simple_remove_client(call, client_id):
+    """Simplified client removal"""
+    if client_id in client_tasks:
+        client_name = client_tasks[client_id].get('info', 'Unknown Client')
+
+        # Remove client task
+        storage.delete('client_tasks', client_id)
+
+        # Remove client referrals
+        storage.delete('client_referrals', client_id)
+
+        # Remove from promotional tasks
+        storage.put('task_sections', 'promotional', [
+            task for task in task_sections['promotional'] 
+            if not (is_client_task(task) and client_id in task)
+        ])
+
+        task_keyboards.invalidate('promotional')
+        save_data()
+
+        # Create back navigation markup
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
+        markup.add(types.InlineKeyboardButton("🔗 Add More Client Links", callback_data="add_client_task_link"))
+        markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
+
+        bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=f"✅ **Client Task Link Removed Successfully!**\n\n🗑️ **Client:** {client_name}\n🏷️ **ID:** {client_id}\n📂 **Removed from:** All sections\n🎯 **Tracking:** Disabled\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
+            parse_mode="Markdown",
+            reply_markup=markup
+        )
+        answer_callback(call, "✅ Client task link removed! Use buttons below to continue.")
+
+@callback_router.route("back_to_admin", admin_only=True)
+def cb_back_to_admin(call):
+    markup = generate_admin_task_markup()
+
+    watch_ads_count = len(task_sections['watch_ads'])
+    app_downloads_count = len(task_sections['app_downloads'])
+    promotional_count = len(task_sections['promotional'])
+    client_tasks_count = len(client_tasks)
+
+    task_info = f"📋 **Admin Task Management Panel**\n\n"
+    task_info += f"📊 **Current Tasks:**\n"
+    task_info += f"📺 Watch Ads: {watch_ads_count}\n"
+    task_info += f"📱 App Downloads: {app_downloads_count}\n"
+    task_info += f"📢 Promotional: {promotional_count}\n"
+    task_info += f"🎯 Client Tasks: {client_tasks_count}\n\n"
+    task_info += f"🔧 **Choose an option below:**"
+
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=task_info,
+        parse_mode="Markdown",
+        reply_markup=markup
+    )
 
-                # Remove from promotional tasks
-                task_sections['promotional'] = [
-                    task for task in task_sections['promotional'] 
-                    if not (is_client_task(task) and client_id in task)
-                ]
+@callback_router.route("close_admin_panel", admin_only=True, ack="✅ Admin panel closed")
+def cb_close_admin_panel(call):
+    bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.message_id)
 
-                save_data()
+def show_report_page(call, kind, key, offset):
+    text, markup = render_report_page(kind, key, offset)
+    if text is None:
+        answer_callback(call, "❌ Report data no longer available!", show_alert=True, follow_up=True)
+        return
+    bot.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=text,
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
 
-                # Create back navigation markup
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("🔙 Back to Client Tasks", callback_data="admin_client_tasks"))
-                markup.add(types.InlineKeyboardButton("🔗 Add More Client Links", callback_data="add_client_task_link"))
-                markup.add(types.InlineKeyboardButton("🏠 Back to Admin Panel", callback_data="back_to_admin"))
-
-                bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=f"✅ **Client Task Link Removed Successfully!**\n\n🗑️ **Client:** {client_name}\n🏷️ **ID:** {client_id}\n📂 **Removed from:** All sections\n🎯 **Tracking:** Disabled\n\n💾 **Data saved automatically**\n\n🔄 **Choose next action:**",
-                    parse_mode="Markdown",
-                    reply_markup=markup
-                )
-                bot.answer_callback_query(call.id, "✅ Client task link removed! Use buttons below to continue.")
+@callback_router.route("report_client_", str, int, prefix=True, admin_only=True, invalid_message="❌ Invalid page!")
+def cb_report_client_page(call, client_id, offset):
+    """Show another page of a client report"""
+    show_report_page(call, 'client', client_id, offset)
 
-        # Navigation callbacks
-        elif call.data == "back_to_admin":
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("report_task_", str, int, prefix=True, admin_only=True, invalid_message="❌ Invalid page!")
+def cb_report_task_page(call, task_id, offset):
+    """Show another page of a task report"""
+    show_report_page(call, 'task', task_id, offset)
 
-            markup = generate_admin_task_markup()
-
-            watch_ads_count = len(task_sections['watch_ads'])
-            app_downloads_count = len(task_sections['app_downloads'])
-            promotional_count = len(task_sections['promotional'])
-            client_tasks_count = len(client_tasks)
-
-            task_info = f"📋 **Admin Task Management Panel**\n\n"
-            task_info += f"📊 **Current Tasks:**\n"
-            task_info += f"📺 Watch Ads: {watch_ads_count}\n"
-            task_info += f"📱 App Downloads: {app_downloads_count}\n"
-            task_info += f"📢 Promotional: {promotional_count}\n"
-            task_info += f"🎯 Client Tasks: {client_tasks_count}\n\n"
-            task_info += f"🔧 **Choose an option below:**"
-
-            bot.edit_message_text(
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                text=task_info,
-                parse_mode="Markdown",
-                reply_markup=markup
-            )
+def send_report_export(call, kind, key):
+    if not export_report(kind, key, call.message.chat.id):
+        bot.send_message(call.message.chat.id, "❌ Report data no longer available!")
 
-        elif call.data == "close_admin_panel":
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "❌ Admin only!", show_alert=True)
-                return
+@callback_router.route("export_client_", str, prefix=True, admin_only=True, ack="📥 Preparing report file...")
+def cb_export_client_report(call, client_id):
+    """Send the full client report as a file"""
+    send_report_export(call, 'client', client_id)
 
-            bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.message_id)
-            bot.answer_callback_query(call.id, "✅ Admin panel closed")
+@callback_router.route("export_task_", str, prefix=True, admin_only=True, ack="📥 Preparing report file...")
+def cb_export_task_report(call, task_id):
+    """Send the full task report as a file"""
+    send_report_export(call, 'task', task_id)
 
-        elif call.data == "no_action":
-            bot.answer_callback_query(call.id, "ℹ️ No action available")
+@callback_router.route("no_action", ack="ℹ️ No action available")
+def cb_no_action(call):
+    """Placeholder buttons such as page labels; the ack is all they need"""
 
+# ✅ ENHANCED CALLBACK HANDLER
+@bot.callback_query_handler(func=lambda call: True)
+def handle_callback(call):
+    try:
+        callback_router.dispatch(call)
     except Exception as e:
         print(f"Callback error in {call.data}: {e}")
         try:
-            bot.answer_callback_query(call.id, f"❌ Error occurred: {str(e)[:50]}", show_alert=True)
+            answer_callback(call, f"❌ Error occurred: {str(e)[:50]}", show_alert=True)
         except:
             print(f"Failed to send callback answer for error: {e}")
 
@@ -2749,13 +5376,163 @@ def handle_unknown(message):
     if not is_banned(message.from_user.id):
         bot.reply_to(message, "❓ Use menu buttons below.")
 
+# ✅ INSTANCE LEASE
+class InstanceLease:
+    """Single-writer lease: flock on a local file, a heartbeat, and a fencing token bumped on every takeover"""
+
+    def __init__(self, path, ttl, heartbeat_interval):
+        self.path = path                  # JSON {token, pid, heartbeat}, replaced atomically
+        self.lock_path = path + '.lock'   # never replaced, so the flock always covers the same inode
+        self.write_lock_path = path + '.wlock'  # held briefly around every read-compare-write of the lease file
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.token = None
+        self.fd = None
+        self.flocked = False              # False after taking over a holder that stopped heartbeating
+        self.lost = threading.Event()
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize token checks and writes across processes so a takeover can't interleave with a heartbeat"""
+        fd = os.open(self.write_lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, heartbeat):
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'token': self.token, 'pid': os.getpid(), 'heartbeat': heartbeat}, f)
+        os.replace(temp_file, self.path)
+
+    def try_acquire(self):
+        """Take the lease if it is free or abandoned; returns whether we now hold it"""
+        if self.fd is None:
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.flocked = self._try_flock()
+        with self._exclusive():
+            current = self._read()
+            if not self.flocked:
+                # The holder still has the flock; only a holder that stopped heartbeating can be taken over
+                if time.time() - current.get('heartbeat', 0) < self.ttl:
+                    return False
+                logger.warning("⚠️ Lease holder stopped heartbeating; taking over and fencing it")
+            self.token = current.get('token', 0) + 1
+            self._write(time.time())
+        return True
+
+    def _try_flock(self):
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def acquire(self):
+        """Block until the lease is ours; returns True if another instance held it first"""
+        waited = False
+        while not self.try_acquire():
+            if not waited:
+                logger.info(f"⏸️ Standing by: lease held by pid {self._read().get('pid')}")
+                waited = True
+            time.sleep(LEASE_POLL)
+        logger.info(f"🔑 Lease acquired (fencing token {self.token})")
+        threading.Thread(target=self._heartbeat, name="LeaseHeartbeat", daemon=True).start()
+        return waited
+
+    def holds(self):
+        """True only while our token is still the newest one on disk"""
+        return self.token is not None and not self.lost.is_set() and self._read().get('token') == self.token
+
+    def _heartbeat(self):
+        while not self.lost.wait(self.heartbeat_interval):
+            if not self.flocked:
+                # Took over a stuck holder: pick up the flock once it exits so the next standby waits on it again
+                self.flocked = self._try_flock()
+            with self._exclusive():
+                fenced = self._read().get('token') != self.token
+                if not fenced:
+                    self._write(time.time())
+            if fenced:
+                logger.error(f"❌ Lease lost to a newer instance (our token {self.token}); stopping")
+                self.lost.set()
+                try:
+                    bot.stop_polling()
+                except Exception as e:
+                    logger.error(f"❌ Failed to stop polling after losing the lease: {e}")
+                return
+
+    def release(self):
+        """Hand over immediately: a zero heartbeat and dropping the flock both free the lease"""
+        with self._exclusive():
+            if self.holds():
+                self.lost.set()
+                self._write(0)
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+            self.flocked = False
+
+instance_lease = InstanceLease(LEASE_FILE, LEASE_TTL, LEASE_HEARTBEAT)
+shutdown_requested = threading.Event()
+
+def refresh_state():
+    """Reload the snapshot and ledger tail written by the instance we took over from"""
+    global ledger
+    load_state()
+    ledger.journal.close()
+    ledger = open_ledger()
+    task_keyboards.invalidate()
+    bot.last_update_id = update_tracker.processed_id
+    logger.info(f"🔄 State refreshed after takeover: {len(user_balances)} users, ledger at {ledger.seq}")
+
+def become_active():
+    """Wait for the lease, refreshing the preloaded data if another instance was active"""
+    if instance_lease.acquire():
+        refresh_state()
+
+def stop_on_sigterm(signum, frame):
+    """Deploys send SIGTERM: stop polling so run_bot saves and releases the lease"""
+    logger.info("🛑 SIGTERM received, handing over")
+    shutdown_requested.set()
+    bot.stop_polling()
+
+def hand_over():
+    """Let queued updates finish, save once more and release the lease for the standby"""
+    drain_deadline = time.monotonic() + 5
+    while sum(bot.lane_backlog()) and time.monotonic() < drain_deadline:
+        time.sleep(0.05)
+    try:
+        if save_data():
+            logger.info("💾 Data saved before shutdown")
+        else:
+            logger.error("❌ Failed to save data on shutdown")
+    except Exception as e:
+        logger.error(f"❌ Error saving data on shutdown: {e}")
+    instance_lease.release()
+    analytics_pool.shutdown()
+
 # ✅ MAIN FUNCTION WITH IMPROVED ERROR HANDLING
 def run_bot():
     """Run bot with robust error handling and restart mechanism"""
+    analytics_pool.start()
+    become_active()
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    start_auto_save_thread()
     restart_count = 0
-    max_restarts = 5  # Reduced max restarts
 
-    while restart_count < max_restarts:
+    while not (instance_lease.lost.is_set() or shutdown_requested.is_set()):
+        started_at = time.monotonic()
         try:
             logger.info("🤖 Bot starting...")
 
@@ -2803,18 +5580,221 @@ def run_bot():
             logger.info("Bot stopped by user")
             break
         except Exception as e:
+            # A run that stayed up for a while starts the backoff over
+            if time.monotonic() - started_at > POLLING_BACKOFF_CAP:
+                restart_count = 0
             restart_count += 1
-            logger.error(f"❌ Bot error (attempt {restart_count}/{max_restarts}): {e}")
+            logger.error(f"❌ Bot error (restart #{restart_count}): {e}")
 
-            if restart_count < max_restarts:
-                wait_time = min(120, 20 * restart_count)  # Increased wait time
-                logger.info(f"🔄 Restarting in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"❌ Max restart attempts reached. Bot stopped.")
-                break
+            # Jittered exponential backoff, never gives up
+            wait_time = min(POLLING_BACKOFF_CAP, 2 ** min(restart_count, 16))
+            wait_time = random.uniform(wait_time / 2, wait_time)
+            logger.info(f"🔄 Restarting in {wait_time:.1f} seconds...")
+            time.sleep(wait_time)
 
     # Graceful shutdown
+    hand_over()
+    logger.info("Bot shutdown completed")
+
+# ✅ ASYNCIO ENGINE
+class AsyncBotBridge:
+    """Lets the synchronous handlers, running on handler threads, drive an AsyncTeleBot on the event loop"""
+
+    def __init__(self, async_bot, loop):
+        self.async_bot = async_bot
+        self.loop = loop
+        self.chat_tails = {}  # chat_id -> last scheduled API call, keeps per-chat order
+        self.polling_task = None
+
+    def stop_polling(self):
+        """AsyncTeleBot has no stop_polling; cancel the polling task from any thread"""
+        if self.polling_task is not None:
+            self.loop.call_soon_threadsafe(self.polling_task.cancel)
+
+    def __getattr__(self, name):
+        method = getattr(self.async_bot, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            chat_key = self._chat_key(args, kwargs)
+            coro_factory = lambda: method(*args, **kwargs)
+            if self._on_loop():
+                # Called on the loop itself (flood notices): fire and forget
+                return self._schedule(chat_key, coro_factory)
+            # Called from a handler thread: wait for the result like the sync client
+            future = asyncio.run_coroutine_threadsafe(self._submit(chat_key, coro_factory), self.loop)
+            return future.result()
+
+        return call
+
+    def _on_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _chat_key(args, kwargs):
+        target = kwargs.get('chat_id', args[0] if args else None)
+        chat = getattr(target, 'chat', None)
+        if chat is not None:
+            return chat.id
+        return target if isinstance(target, (int, str)) else None
+
+    def _schedule(self, chat_key, coro_factory):
+        previous = self.chat_tails.get(chat_key) if chat_key is not None else None
+        task = self.loop.create_task(self._run_in_order(previous, coro_factory))
+        if chat_key is not None:
+            self.chat_tails[chat_key] = task
+        task.add_done_callback(lambda done, key=chat_key: self._on_done(key, done))
+        return task
+
+    def _on_done(self, chat_key, task):
+        if chat_key is not None and self.chat_tails.get(chat_key) is task:
+            self.chat_tails.pop(chat_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"⚠️ Async API call failed for chat {chat_key}: {task.exception()}")
+
+    async def _run_in_order(self, previous, coro_factory):
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        ticket = circuit_breaker.allow()
+        if not ticket:
+            raise CircuitOpenError("Telegram API unavailable, call skipped")
+        healthy = False
+        try:
+            result = await coro_factory()
+            healthy = True
+            return result
+        except Exception as e:
+            # Telegram answered with a client error: the API itself is healthy
+            healthy = getattr(e, 'error_code', 500) < 500
+            raise
+        finally:
+            # Cancellation lands here too, so the probe slot is never left claimed
+            circuit_breaker.record(healthy, ticket)
+
+    async def _submit(self, chat_key, coro_factory):
+        return await self._schedule(chat_key, coro_factory)
+
+async def auto_save_async():
+    """Auto-save loop for the asyncio engine (file I/O runs off the event loop)"""
+    loop = asyncio.get_running_loop()
+    save_count = 0
+    while True:
+        try:
+            await asyncio.sleep(30)
+            conversation_store.sweep()
+            proof_waiters.sweep()
+            if await loop.run_in_executor(None, save_data):
+                save_count += 1
+                logger.info(f"✅ Auto-save completed (#{save_count})")
+            else:
+                logger.error("❌ Auto-save failed")
+        except asyncio.CancelledError:
+            logger.info("Auto-save task cancelled")
+            break
+        except Exception as e:
+            logger.error(f"❌ Auto-save error: {e}")
+
+async def _async_main():
+    """Serve all conversations from one event loop with a shared aiohttp session"""
+    global bot, BOT_USERNAME
+    from telebot.async_telebot import AsyncTeleBot
+    from telebot import asyncio_helper
+
+    # One pooled aiohttp connector is reused by every API call
+    asyncio_helper.REQUEST_LIMIT = ASYNC_CONNECTION_LIMIT
+    class TrackedAsyncTeleBot(AsyncTeleBot):
+        async def get_updates(self, offset=None, *args, **kwargs):
+            # telebot moves its offset past everything fetched; confirm only up to the processed watermark instead
+            if offset is not None and offset > 0:
+                offset = min(offset, update_tracker.processed_id + 1)
+            updates = await super().get_updates(offset, *args, **kwargs)
+            if updates and updates[-1].update_id <= update_tracker.highest_id:
+                # Only in-flight updates came back; don't spin on them while their handlers finish
+                await asyncio.sleep(1)
+            return updates
+
+        async def process_new_updates(self, updates):
+            fresh = update_tracker.admit(updates)
+            try:
+                await super().process_new_updates(fresh)
+            finally:
+                for update in fresh:
+                    update_tracker.release(update.update_id)
+
+    async_bot = TrackedAsyncTeleBot(BOT_TOKEN, offset=update_tracker.processed_id + 1)
+    loop = asyncio.get_running_loop()
+    # Handlers block on file writes, fsync'd ledger commits and API round trips, so they run off the loop
+    handler_pool = ThreadPoolExecutor(ASYNC_HANDLER_THREADS, thread_name_prefix="AsyncHandler")
+    user_tails = {}  # user_id -> that user's latest handler task, so each user's updates still run in order
+
+    def dispatch(handler):
+        async def run_handler(update_object):
+            verdict = flood_guard.check(update_object)
+            if verdict != FloodGuard.ADMIT:
+                if verdict == FloodGuard.NOTIFY or hasattr(update_object, 'data'):
+                    await loop.run_in_executor(handler_pool, flood_reply(verdict), update_object)
+                return
+            remember_sender(update_object)
+            update_object.received_at = time.monotonic()
+            if hasattr(update_object, 'data'):
+                # Answered now, not after this user's earlier handlers finish
+                await loop.run_in_executor(handler_pool, acknowledge_callback, update_object)
+            user_id = update_object.from_user.id
+            previous = user_tails.get(user_id)
+            task = user_tails[user_id] = asyncio.current_task()
+            try:
+                if previous is not None and not previous.done():
+                    await asyncio.wait([previous])
+                await loop.run_in_executor(handler_pool, handler, update_object)
+            except Exception as e:
+                logger.error(f"❌ Handler {handler.__name__} error: {e}")
+            finally:
+                if user_tails.get(user_id) is task:
+                    del user_tails[user_id]
+        return run_handler
+
+    async_bot.register_message_handler(dispatch(send_welcome), commands=['start'])
+    async_bot.register_message_handler(dispatch(handle_message), func=lambda message: True, content_types=['text'])
+    async_bot.register_message_handler(dispatch(handle_media), content_types=['photo', 'video', 'document'])
+    async_bot.register_callback_query_handler(dispatch(handle_callback), func=lambda call: True)
+    async_bot.register_message_handler(dispatch(handle_unknown), func=lambda message: True)
+
+    try:
+        bot_info = await async_bot.get_me()
+        BOT_USERNAME = bot_info.username or "Eran_money281bot"
+    except Exception as e:
+        logger.error(f"Error getting bot username: {e}")
+        BOT_USERNAME = "Eran_money281bot"
+
+    bot = AsyncBotBridge(async_bot, asyncio.get_running_loop())
+    save_task = asyncio.create_task(auto_save_async())
+    logger.info(f"⚡ Async engine ready: @{BOT_USERNAME} (connection limit {ASYNC_CONNECTION_LIMIT})")
+
+    bot.polling_task = asyncio.create_task(async_bot.infinity_polling(timeout=60, request_timeout=90))
+    loop.add_signal_handler(signal.SIGTERM, stop_on_sigterm, signal.SIGTERM, None)
+    try:
+        await asyncio.wait([bot.polling_task])
+    finally:
+        bot.polling_task.cancel()
+        save_task.cancel()
+        await asyncio.gather(save_task, return_exceptions=True)
+        handler_pool.shutdown(wait=True)
+
+def run_async_bot():
+    """Run bot on telebot's AsyncTeleBot instead of worker threads"""
+    analytics_pool.start()
+    become_active()
+    try:
+        asyncio.run(_async_main())
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
+    except Exception as e:
+        logger.error(f"❌ Async engine error: {e}")
+
     try:
         if save_data():
             logger.info("💾 Data saved before shutdown")
@@ -2822,10 +5802,65 @@ def run_bot():
             logger.error("❌ Failed to save data on shutdown")
     except Exception as e:
         logger.error(f"❌ Error saving data on shutdown: {e}")
-    
+    instance_lease.release()
+    analytics_pool.shutdown()
+
     logger.info("Bot shutdown completed")
 
+# ✅ WORKER MODE
+class UpdateReceiver(http.server.BaseHTTPRequestHandler):
+    """Accepts one Telegram update as JSON per POST from the dispatcher in front of the workers"""
+
+    def do_POST(self):
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            update = types.Update.de_json(body.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.warning(f"Rejected update post: {e}")
+            self.send_response(400)
+            self.end_headers()
+            return
+        bot.process_new_updates([update])
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(f"Worker {WORKER_ID}: {format % args}")
+
+def run_worker():
+    """Serve updates posted by a dispatcher, without the lease, polling or bot_data.json
+
+    Balances, bans and conversations live on the shared store, and this worker's balance changes are journaled to its
+    own WORKER_LEDGER_FILE. Other collections (pending tasks, proofs, client tasks) stay in this process and are not
+    saved, so the dispatcher should send each user to the same worker and keep admin traffic on the poller.
+    """
+    if not shared_state:
+        logger.error("❌ BOT_ROLE=worker needs SHARED_STATE_URL")
+        return
+    analytics_pool.start()
+    host, port = WORKER_LISTEN.rsplit(':', 1)
+    server = http.server.ThreadingHTTPServer((host, int(port)), UpdateReceiver)
+    # shutdown() waits for serve_forever to return, so it can't run on the thread the signal lands on
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    logger.info(f"🧩 Worker {WORKER_ID} accepting updates on {WORKER_LISTEN} (journal {WORKER_LEDGER_FILE.format(WORKER_ID)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Worker stopped by user")
+    finally:
+        server.server_close()
+        drain_deadline = time.monotonic() + 5
+        while sum(bot.lane_backlog()) and time.monotonic() < drain_deadline:
+            time.sleep(0.05)
+        analytics_pool.shutdown()
+    logger.info("Worker shutdown completed")
+
 # ✅ RUN BOT
 if __name__ == "__main__":
-    run_bot()
+    if BOT_ROLE == 'worker':
+        run_worker()
+    elif BOT_ENGINE == 'async':
+        run_async_bot()
+    else:
+        run_bot()
     
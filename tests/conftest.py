@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# main.py loads and writes its data files in the working directory on import, so keep them out of the repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix='bot-tests-'))
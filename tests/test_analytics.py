@@ -0,0 +1,28 @@
+import analytics
+
+
+def tracks(section, *user_ids):
+    return [{'user_id': user_id, 'section': section} for user_id in user_ids]
+
+
+def test_tally_tracking_counts_one_chunk():
+    chunk = [('a', tracks('watch_ads', 1, 2)), ('b', tracks('promotional', 2)), ('c', [])]
+    engagements, users, sections, top = analytics.tally_tracking(chunk)
+    assert engagements == 3
+    assert users == {1, 2}
+    assert sections == {'watch_ads': 2, 'promotional': 1, 'unknown': 0}
+    assert top[0] == ('a', 'watch_ads', 2)
+
+
+def test_chunked_overview_matches_single_pass():
+    rows = [(f"task{i}", tracks('watch_ads', *range(i % 7))) for i in range(40)]
+    whole = analytics.render_task_overview([analytics.tally_tracking(rows)], len(rows))
+    chunked = analytics.render_task_overview([analytics.tally_tracking(rows[i:i + 9]) for i in range(0, 40, 9)], len(rows))
+    assert chunked == whole
+
+
+def test_tally_referrals_merges_across_chunks():
+    rows = [(10, 1), (11, 1), (12, 2), (13, 1)]
+    partials = [analytics.tally_referrals(rows[:2]), analytics.tally_referrals(rows[2:])]
+    assert analytics.merge_counts(partials) == {1: 3, 2: 1}
+    assert "**User 1:** 3 referrals" in analytics.render_referral_stats(partials, len(rows))
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import main
+from main import CallbackRouter, CircuitBreaker, FloodGuard, ProfileCache
+
+
+def message(user_id, text):
+    return SimpleNamespace(from_user=SimpleNamespace(id=user_id), text=text)
+
+
+def test_flood_guard_drops_after_burst_and_notifies_once():
+    guard = FloodGuard(rate=0, burst=2, coalesce_window=0, max_users=10)
+    verdicts = [guard.check(message(5, f"text {i}")) for i in range(4)]
+    assert verdicts == [FloodGuard.ADMIT, FloodGuard.ADMIT, FloodGuard.NOTIFY, FloodGuard.DROP]
+    assert guard.check(message(main.ADMIN_ID, "admin")) == FloodGuard.ADMIT
+
+
+def test_flood_guard_coalesces_repeated_taps():
+    guard = FloodGuard(rate=0, burst=5, coalesce_window=60, max_users=10)
+    assert guard.check(message(5, "💰 Balance")) == FloodGuard.ADMIT
+    assert guard.check(message(5, "💰 Balance")) == FloodGuard.DROP
+    assert guard.coalesced == 1
+
+
+def test_flood_guard_evicts_idle_users():
+    guard = FloodGuard(rate=0, burst=1, coalesce_window=0, max_users=2)
+    for user_id in (1, 2, 3):
+        guard.check(message(user_id, "hi"))
+    assert list(guard.buckets) == [2, 3]
+    assert guard.evicted == 1
+
+
+def test_circuit_breaker_trips_and_recovers_through_probe():
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_ratio=0.5, cooldown=0)
+    for success in (True, True, False, False):
+        breaker.record(success, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    ticket = breaker.allow()
+    assert ticket == CircuitBreaker.PROBE
+    assert breaker.allow() is False  # only one probe at a time
+    assert breaker.allow(probe=False) is True  # the long poll still goes out
+    breaker.record(True, ticket)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(window=2, min_calls=2, failure_ratio=0.5, cooldown=0)
+    breaker.record(False, breaker.allow())
+    breaker.record(False, breaker.allow())
+    breaker.record(False, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+
+
+def test_callback_router_prefers_exact_then_longest_prefix():
+    router = CallbackRouter()
+    router.route("task_")(lambda call: None)
+    router.route("task_", str, int, prefix=True)(lambda call, section, index: None)
+    router.route("task_done_", int, prefix=True)(lambda call, index: None)
+
+    route, remainder = router.resolve("task_")
+    assert route is router.exact["task_"] and remainder == ""
+    route, remainder = router.resolve("task_done_7")
+    assert route.pattern == "task_done_" and route.parse_args(remainder) == (7,)
+    route, remainder = router.resolve("task_watch_ads_3")
+    assert route.pattern == "task_" and route.parse_args(remainder) == ("watch_ads", 3)
+    assert router.resolve("unknown") == (None, None)
+
+
+def test_callback_route_rejects_malformed_arguments():
+    router = CallbackRouter()
+    router.route("proof_ok_", int, prefix=True)(lambda call, submission_id: None)
+    route, remainder = router.resolve("proof_ok_abc")
+    try:
+        route.parse_args(remainder)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("non-numeric id was accepted")
+
+
+def test_profile_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    cache = ProfileCache(max_size=2, ttl=60)
+    cache.put(1, 'one', 'One')
+    cache.put(2, 'two', 'Two')
+    assert cache.get(1) == ('one', 'One')
+    cache.put(3, 'three', 'Three')  # 2 is now least recently used
+    assert cache.get(2) is None
+    now[0] += 61
+    assert cache.get(1) is None
+    assert cache.hits == 1 and cache.misses == 2
@@ -0,0 +1,103 @@
+import pytest
+
+import main
+from main import BalanceLedger
+
+
+@pytest.fixture(autouse=True)
+def lease_held(monkeypatch):
+    monkeypatch.setattr(main.instance_lease, 'holds', lambda: True)
+
+
+def open_ledger(tmp_path, snapshot_seq=0, balances=None):
+    return BalanceLedger(str(tmp_path / 'ledger.jsonl'), dict(balances or {}), {'completed_tasks': {}}, snapshot_seq)
+
+
+def test_post_updates_balances_in_rupees(tmp_path):
+    ledger = open_ledger(tmp_path)
+    assert ledger.post(1, 1050, 'bonus') is None
+    assert ledger.post(1, -50, 'spend') is None
+    assert ledger.balances[1] == 10.0
+    assert ledger.balance_paise(1) == 1000
+
+
+def test_repeated_key_is_refused(tmp_path):
+    ledger = open_ledger(tmp_path)
+    assert ledger.post(1, 500, 'bonus', key='signup:1') is None
+    assert ledger.post(1, 500, 'bonus', key='signup:1') == BalanceLedger.DUPLICATE
+    assert ledger.balances[1] == 5.0
+    assert ledger.duplicates == 1
+
+
+def test_commit_refused_without_lease(tmp_path, monkeypatch):
+    ledger = open_ledger(tmp_path)
+    monkeypatch.setattr(main.instance_lease, 'holds', lambda: False)
+    with pytest.raises(RuntimeError):
+        ledger.post(1, 500, 'bonus')
+    assert 1 not in ledger.balances
+
+
+def test_replay_restores_balances_collections_and_keys(tmp_path):
+    ledger = open_ledger(tmp_path)
+    ledger.post(1, 700, 'bonus', key='k1')
+    ledger.commit([{'user_id': 2, 'paise': 300, 'kind': 'task'}], [['add', 'completed_tasks', 2, 'watch_ads_0']], 'k2')
+    ledger.journal.close()
+
+    reopened = open_ledger(tmp_path)
+    assert reopened.balances == {1: 7.0, 2: 3.0}
+    assert reopened.collections['completed_tasks'] == {2: {'watch_ads_0'}}
+    assert reopened.post(1, 700, 'bonus', key='k1') == BalanceLedger.DUPLICATE
+
+
+def test_replay_skips_records_covered_by_snapshot(tmp_path):
+    ledger = open_ledger(tmp_path)
+    ledger.post(1, 100, 'bonus')
+    seq, balances, _ = ledger.snapshot()
+    ledger.post(1, 200, 'bonus')
+    ledger.journal.close()
+
+    reopened = open_ledger(tmp_path, seq, balances)
+    assert reopened.balances[1] == 3.0
+
+
+def test_compact_keeps_keys_and_catches_up_older_snapshot(tmp_path):
+    ledger = open_ledger(tmp_path)
+    for i in range(10):
+        ledger.post(1, 100, 'bonus', key=f"k{i}")
+    assert ledger.compact(6) == 6
+    assert ledger.compact(6) == 0
+    ledger.journal.close()
+
+    # A snapshot from before the checkpoint (the backup file) replays the archive first
+    reopened = open_ledger(tmp_path, 2, {1: 2.0})
+    assert reopened.balances[1] == 10.0
+    assert reopened.post(1, 100, 'bonus', key='k0') == BalanceLedger.DUPLICATE
+
+
+def test_statement_spans_journal_and_archive(tmp_path):
+    ledger = open_ledger(tmp_path)
+    for i in range(30):
+        ledger.post(1, 100 + i, 'bonus')
+        ledger.post(2, 5, 'bonus')
+    ledger.compact(20)
+
+    entries, total = ledger.statement(1, limit=25)
+    assert total == 30
+    assert [entry['paise'] for entry in entries] == [100 + i for i in range(5, 30)]
+    assert all(entry['user_id'] == 1 for entry in entries)
+
+
+def test_archive_index_stays_current_across_compactions(tmp_path):
+    ledger = open_ledger(tmp_path)
+    for i in range(20):
+        ledger.post(1, 100 + i, 'bonus')
+    ledger.compact(10)
+    ledger.statement(1)  # builds the archive index
+    for i in range(20, 30):
+        ledger.post(1, 100 + i, 'bonus')
+    ledger.compact(25)
+    ledger.journal.close()
+
+    reopened = open_ledger(tmp_path, 25, ledger.snapshot()[1])
+    assert ledger.statement(1, limit=100) == reopened.statement(1, limit=100)
+    assert [entry['paise'] for entry in ledger.statement(1, limit=100)[0]] == [100 + i for i in range(30)]
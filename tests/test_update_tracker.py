@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from main import UpdateTracker
+
+
+def updates(*update_ids):
+    return [SimpleNamespace(update_id=update_id) for update_id in update_ids]
+
+
+def test_admit_drops_duplicates():
+    tracker = UpdateTracker(window=100)
+    assert [u.update_id for u in tracker.admit(updates(1, 2))] == [1, 2]
+    assert tracker.admit(updates(2, 3))[0].update_id == 3
+    assert tracker.duplicates == 1
+
+
+def test_processed_id_waits_for_the_oldest_in_flight_update():
+    tracker = UpdateTracker(window=100)
+    tracker.admit(updates(1, 2, 3))
+    tracker.release(2)
+    tracker.release(3)
+    assert tracker.processed_id == 0
+    tracker.release(1)
+    assert tracker.processed_id == 3
+
+
+def test_hold_keeps_update_in_flight_until_every_task_releases():
+    tracker = UpdateTracker(window=100)
+    tracker.admit(updates(1))
+    tracker.hold(1)
+    tracker.release(1)
+    assert tracker.processed_id == 0
+    tracker.release(1)
+    assert tracker.processed_id == 1
+
+
+def test_in_flight_ids_survive_window_eviction():
+    tracker = UpdateTracker(window=2)
+    tracker.admit(updates(1))
+    for update_id in (2, 3, 4):
+        tracker.admit(updates(update_id))
+        tracker.release(update_id)
+    assert tracker.admit(updates(1)) == []
+    assert 2 not in tracker.recent
+
+
+def test_snapshot_excludes_in_flight_ids():
+    tracker = UpdateTracker(window=100)
+    tracker.admit(updates(1, 2, 3))
+    tracker.release(2)
+    assert tracker.snapshot() == (0, [2])
+
+
+def test_resume_treats_recent_ids_as_seen():
+    tracker = UpdateTracker(window=100)
+    tracker.resume(10, [12])
+    assert tracker.admit(updates(9, 10, 12)) == []
+    assert [u.update_id for u in tracker.admit(updates(11))] == [11]
+    tracker.release(11)
+    assert tracker.processed_id == 12